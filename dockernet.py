@@ -115,7 +115,7 @@ def startShell( self ):
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
-        self.readbuf = ''
+        self.readbuf.clear()
         self.waiting = False
 
         while True:
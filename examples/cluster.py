@@ -84,6 +84,7 @@
 from mininet.examples.clustercli import CLI
 from mininet.log import setLogLevel, debug, info, error
 from mininet.clean import addCleanupCallback
+from mininet.probe import ProbeFailed
 
 from signal import signal, SIGINT, SIG_IGN
 from subprocess import Popen, PIPE, STDOUT
@@ -286,6 +287,43 @@ def popen( self, *args, **kwargs ):
         "Override: disable -tt"
         return super( RemoteMixin, self).popen( *args, tt=False, **kwargs )
 
+    def netlinkSocket( self ):
+        "Override: we can only open local namespaces"
+        if self.isRemote:
+            return None
+        return super( RemoteMixin, self ).netlinkSocket()
+
+    def linkState( self ):
+        "Override: we can only open local namespaces"
+        if self.isRemote:
+            return None
+        return super( RemoteMixin, self ).linkState()
+
+    def netnsKey( self ):
+        "Override: namespaces (and pids) are per server"
+        key = super( RemoteMixin, self ).netnsKey()
+        return ( self.server, key ) if self.isRemote else key
+
+    def canConnect( self, ip, port, timeout=1 ):
+        "Override: we can only open local namespaces, so ask our shell"
+        if not self.isRemote:
+            return super( RemoteMixin, self ).canConnect(
+                ip, port, timeout=timeout )
+        # pylint: disable=not-callable
+        result = self.cmd(
+            'timeout %s bash -c "exec 3<>/dev/tcp/%s/%d" 2>&1 && '
+            'echo Connected' % ( timeout, ip, port ) )
+        if 'No route' in result or 'unreachable' in result:
+            raise ProbeFailed( 'no route to %s' % ip )
+        return 'Connected' in result
+
+    def resources( self ):
+        """Override: a remote node's resources are on its server, so
+           our (local) journal can't remove them"""
+        if self.isRemote:
+            return []
+        return super( RemoteMixin, self ).resources()
+
     def addIntf( self, *args, **kwargs ):
         "Override: use RemoteLink.moveIntf"
         # kwargs.update( moveIntfFn=RemoteLink.moveIntf )
@@ -307,6 +345,9 @@ class RemoteOVSSwitch( RemoteMixin, OVSSwitch ):
 
     OVSVersions = {}
 
+    # Our ovsdb-server is on our server, so use ovs-vsctl there
+    useOVSDB = False
+
     def __init__( self, *args, **kwargs ):
         # No batch startup yet
         kwargs.update( batch=True )
@@ -324,6 +365,18 @@ def isOldOVS( self ):
         return ( StrictVersion( cls.OVSVersions[ self.server ] ) <
                  StrictVersion( '1.10' ) )
 
+    def addFlows( self, flows, bundle=None ):
+        "Override: run ovs-ofctl on our server, using our shell"
+        if not self.isRemote:
+            return super( RemoteOVSSwitch, self ).addFlows( flows, bundle )
+        if not flows:
+            return ''
+        # Quote flows, since our shell runs printf
+        # pylint: disable=not-callable
+        return self.cmd( "printf '%s\\n'",
+                         ' '.join( "'%s'" % flow for flow in flows ),
+                         '|', ' '.join( self.addFlowsArgs( bundle ) ) )
+
     @classmethod
     def batchStartup( cls, switches, **_kwargs ):
         "Start up switches in per-server batches"
@@ -335,6 +388,11 @@ def batchStartup( cls, switches, **_kwargs ):
             OVSSwitch.batchStartup( group, run=switch.cmd )
         return switches
 
+    @classmethod
+    def batchConnected( cls, switches, **_kwargs ):
+        "Check each switch on its own server"
+        return [ switch for switch in switches if switch.connected() ]
+
     @classmethod
     def batchShutdown( cls, switches, **_kwargs ):
         "Stop switches in per-server batches"
@@ -362,6 +420,13 @@ def __init__( self, node1, node2, **kwargs ):
         self.cmd = None  # satisfy pylint
         Link.__init__( self, node1, node2, **kwargs )
 
+    def resources( self ):
+        "Override: only journal interfaces on our own server"
+        remote = set( intf.name for intf in ( self.intf1, self.intf2 )
+                      if intf and getattr( intf.node, 'isRemote', False ) )
+        return [ resource for resource in Link.resources( self )
+                 if resource[ 1 ] not in remote ]
+
     def stop( self ):
         "Stop this link"
         if self.tunnel:
@@ -68,7 +68,7 @@ def bwtest( cpuLimits, period_us=100000, seconds=10 ):
             # the client's buffer fill rate
             popen = server.popen( 'iperf -yc -s -p 5001' )
             waitListening( client, server, 5001 )
-            # ignore empty result from waitListening/telnet
+            # ignore empty result from waitListening's connection
             popen.stdout.readline()
             client.cmd( 'iperf -yc -t %s -c %s' % ( seconds, server.IP() ) )
             result = decode( popen.stdout.readline() ).split( ',' )
@@ -13,10 +13,9 @@
 from mininet.node import Node
 from mininet.link import Link
 from mininet.log import setLogLevel, info
+from mininet.probe import waitFor
 from mininet.util import quietRun
 
-from time import sleep
-
 def scratchNet( cname='controller', cargs='-v ptcp:' ):
     "Create network from scratch using Open vSwitch."
 
@@ -48,9 +47,8 @@ def scratchNet( cname='controller', cargs='-v ptcp:' ):
     switch.cmd( 'ovs-vsctl set-controller dp0 tcp:127.0.0.1:6633' )
 
     info( '*** Waiting for switch to connect to controller' )
-    while 'is_connected' not in quietRun( 'ovs-vsctl show' ):
-        sleep( 1 )
-        info( '.' )
+    waitFor( lambda: 'is_connected' in quietRun( 'ovs-vsctl show' ),
+             maximum=1 )
     info( '\n' )
 
     info( "*** Running test\n" )
@@ -0,0 +1,99 @@
+"""
+asyncio support for Mininet nodes (Python 3 only)
+
+Node.cmd() and Node.pexec() block the calling thread until the
+command completes. The coroutines in this module instead register
+node file descriptors with the running asyncio event loop, so that
+commands on many nodes can be awaited at once:
+
+    results = await net.gather( 'ping -c1 10.0.0.1' )
+
+Node.acmd(), Node.apexec() and Mininet.gather() return these
+coroutines, so it is not normally necessary to import this module.
+Synchronous and asynchronous calls may be freely mixed as long as they
+are made on different nodes (or a node is not busy with a command).
+"""
+
+import asyncio
+import os
+
+from mininet.log import debug
+from mininet.util import getincrementaldecoder, ReadBuffer
+
+
+async def waitReadable( *fds ):
+    """Wait until any of a set of file descriptors is readable.
+       fds: file descriptors"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def ready():
+        "Wake up waiter"
+        if not future.done():
+            future.set_result( None )
+
+    for fd in fds:
+        loop.add_reader( fd, ready )
+    try:
+        await future
+    finally:
+        for fd in fds:
+            loop.remove_reader( fd )
+
+
+async def acmd( node, *args, **kwargs ):
+    """Send a command to a node and await its output.
+       node: node to run command on
+       args: command and arguments, or string
+       kwargs: sendCmd() keyword args
+       returns: output of command"""
+    debug( '*** %s : acmd %s\n' % ( node.name, args ) )
+    node.sendCmd( *args, **kwargs )
+    output = []
+    while node.waiting:
+        if not node.readbuf:
+            await waitReadable( node.stdout.fileno() )
+        output.append( node.monitor( timeoutms=0 ) )
+    return ''.join( output )
+
+
+async def apexec( node, *args, **kwargs ):
+    """Execute a command in a node using popen and await its results.
+       node: node to run command on
+       args: Popen() args, single list, or string
+       kwargs: Popen() keyword args
+       returns: out, err, exitcode"""
+    popen = node.popen( *args, **kwargs )
+    pipes = [ f for f in ( popen.stdout, popen.stderr ) if f ]
+    chunks = { f: [] for f in pipes }
+    decoders = { f: getincrementaldecoder() for f in pipes }
+    for f in pipes:
+        os.set_blocking( f.fileno(), False )
+    while pipes:
+        await waitReadable( *[ f.fileno() for f in pipes ] )
+        for f in list( pipes ):
+            try:
+                data = os.read( f.fileno(), ReadBuffer.readSize )
+            except BlockingIOError:
+                continue
+            chunks[ f ].append( decoders[ f ].decode( data ) )
+            if not data:
+                pipes.remove( f )
+                f.close()
+    # Output is closed, so the process should be exiting
+    while popen.poll() is None:
+        await asyncio.sleep( .01 )
+    out = ''.join( chunks.get( popen.stdout, [] ) )
+    err = ''.join( chunks.get( popen.stderr, [] ) )
+    return out, err, popen.returncode
+
+
+async def gather( nodes, *args, **kwargs ):
+    """Send a command to each of a set of nodes and await their output.
+       nodes: list of nodes
+       args: command and arguments, or string
+       kwargs: sendCmd() keyword args
+       returns: dict of node to output"""
+    outputs = await asyncio.gather( *[ acmd( node, *args, **kwargs )
+                                       for node in nodes ] )
+    return dict( zip( nodes, outputs ) )
@@ -12,9 +12,11 @@
 
 from subprocess import ( Popen, PIPE, check_output as co,
                          CalledProcessError )
-import time
+import os
 
+from mininet.journal import journals, replay
 from mininet.log import info
+from mininet.probe import waitFor
 from mininet.term import cleanUpScreens
 from mininet.util import decode
 
@@ -24,20 +26,42 @@ def sh( cmd ):
     result = Popen( [ '/bin/sh', '-c', cmd ], stdout=PIPE ).communicate()[ 0 ]
     return decode( result )
 
+def pgrep( pattern ):
+    "Return pids of processes matching a pattern (including args)"
+    try:
+        return co( [ 'pgrep', '-f', pattern ] )
+    except CalledProcessError:
+        return ''
+
 def killprocs( pattern ):
     "Reliably terminate processes matching a pattern (including args)"
     sh( 'pkill -9 -f %s' % pattern )
+
     # Make sure they are gone
-    while True:
+    def gone():
+        "Kill any survivors; are they all gone?"
+        if not pgrep( pattern ):
+            return True
+        sh( 'pkill -9 -f %s' % pattern )
+        return False
+    waitFor( gone )
+
+def running( names ):
+    "Return names of running processes which are in names"
+    # /proc/pid/comm is truncated to 15 characters
+    names = set( name[ :15 ] for name in names )
+    found = set()
+    for pid in os.listdir( '/proc' ):
+        if not pid.isdigit():
+            continue
         try:
-            pids = co( [ 'pgrep', '-f', pattern ] )
-        except CalledProcessError:
-            pids = ''
-        if pids:
-            sh( 'pkill -9 -f %s' % pattern )
-            time.sleep( .5 )
-        else:
-            break
+            with open( '/proc/%s/comm' % pid ) as f:
+                comm = f.read().strip()
+        except ( IOError, OSError ):
+            continue
+        if comm in names:
+            found.add( comm )
+    return found
 
 class Cleanup( object ):
     "Wrapper for cleanup()"
@@ -45,9 +69,28 @@ class Cleanup( object ):
     callbacks = []
 
     @classmethod
-    def cleanup( cls):
+    def cleanup( cls, force=False ):
         """Clean up junk which might be left over from old runs;
-           do fast stuff before slow dp and link removal!"""
+           do fast stuff before slow dp and link removal!
+           If Mininet left journals of what it created, remove that
+           first; then, unless a running Mininet's journal remains,
+           search for anything else that looks like ours (e.g. from
+           a run without a journal).
+           force: also remove what running Mininets have created"""
+
+        paths = journals()
+        if paths:
+            info( "*** Removing resources recorded in %d journal(s)\n" %
+                  len( paths ) )
+            replayed = replay( paths, force=force )
+            if len( replayed ) < len( paths ):
+                # A running Mininet's resources look just like junk
+                info( "*** Removing old X11 tunnels\n" )
+                cleanUpScreens()
+                for callback in cls.callbacks:
+                    callback()
+                info( "*** Cleanup complete.\n" )
+                return
 
         info( "*** Removing excess controllers/ofprotocols/ofdatapaths/"
               "pings/noxes\n" )
@@ -59,8 +102,10 @@ def cleanup( cls):
         # you can't connect to them either, so they're mostly harmless.
         # Send SIGTERM first to give processes a chance to shutdown cleanly.
         sh( 'killall ' + zombies + ' 2> /dev/null' )
-        time.sleep( 1 )
-        sh( 'killall -9 ' + zombies + ' 2> /dev/null' )
+        # Give them up to a second to exit before we use SIGKILL
+        names = zombies.split()
+        if not waitFor( lambda: not running( names ), timeout=1 ):
+            sh( 'killall -9 ' + zombies + ' 2> /dev/null' )
 
         # And kill off sudo mnexec
         sh( 'pkill -9 -f "sudo mnexec"')
@@ -28,7 +28,7 @@
 from subprocess import call
 from cmd import Cmd
 from os import isatty
-from select import poll, POLLIN
+from select import POLLIN
 import select
 import errno
 import sys
@@ -39,7 +39,7 @@
 from mininet.log import info, output, error
 from mininet.term import makeTerms, runX11
 from mininet.util import ( quietRun, dumpNodeConnections,
-                           dumpPorts )
+                           dumpPorts, reactor )
 
 class CLI( Cmd ):
     "Simple command-line interface to talk to nodes."
@@ -56,8 +56,6 @@ def __init__( self, mininet, stdin=sys.stdin, script=None,
         # Local variable bindings for py command
         self.locals = { 'net': mininet }
         # Attempt to handle input
-        self.inPoller = poll()
-        self.inPoller.register( stdin )
         self.inputFile = script
         Cmd.__init__( self, *args, stdin=stdin, **kwargs )
         info( '*** Starting CLI:\n' )
@@ -428,19 +426,17 @@ def default( self, line ):
 
     def waitForNode( self, node ):
         "Wait for a node to finish, and print its output."
-        # Pollers
-        nodePoller = poll()
-        nodePoller.register( node.stdout )
-        bothPoller = poll()
-        bothPoller.register( self.stdin, POLLIN )
-        bothPoller.register( node.stdout, POLLIN )
+        inFd, nodeFd = self.stdin.fileno(), node.stdout.fileno()
+        reactor.register( inFd, owner=self )
         if self.isatty():
             # Buffer by character, so that interactive
             # commands sort of work
             quietRun( 'stty -icanon min 1' )
         while True:
             try:
-                bothPoller.poll()
+                # Node may already have output buffered
+                ready = {} if node.readbuf else dict(
+                    reactor.wait( ( inFd, nodeFd ) ) )
                 # XXX BL: this doesn't quite do what we want.
                 if False and self.inputFile:
                     key = self.inputFile.read( 1 )
@@ -448,10 +444,11 @@ def waitForNode( self, node ):
                         node.write( key )
                     else:
                         self.inputFile = None
-                if isReadable( self.inPoller ):
+                if inFd in ready:
                     key = self.stdin.read( 1 )
+                    reactor.consume( inFd )
                     node.write( key )
-                if isReadable( nodePoller ):
+                if nodeFd in ready or node.readbuf:
                     data = node.monitor()
                     output( data )
                 if not node.waiting:
@@ -468,6 +465,7 @@ def waitForNode( self, node ):
                 if errno_ != errno.EINTR:
                     error( "select.error: %d, %s" % (errno_, errmsg) )
                     node.sendInt()
+        reactor.unregister( inFd )
 
     def precmd( self, line ):
         "allow for comments in the cli"
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+
+"""
+Fork server for fast popen() in Mininet nodes (Python 3 only)
+
+Node.popen() normally runs mnexec, which attaches to the node's
+namespaces (and possibly cgroup) and then execs the command, so every
+short command costs two execs and a setns(). A fork server is a small
+Python process which is started once, using node.popen(), so that it
+already sits in the node's namespaces; it then forks and execs
+commands on request, and their children inherit them. Commands which
+need other mnexec options (such as a cgroup or a real-time priority)
+still run via mnexec.
+
+The saving is modest: Python's own overhead dominates, and in our
+measurements a short pexec() took 1.5-1.65 ms with a fork server
+against 1.65-1.9 ms without, a gain of roughly 10-15%. It matters
+most for workloads which run many short commands on many nodes.
+
+ForkServer: client which starts a server for a node and spawns
+    commands using it.
+
+ForkPopen: subprocess.Popen() work-alike for a command spawned
+    by a fork server.
+
+The client and server talk over a SOCK_SEQPACKET socketpair which
+the server inherits. Each request is a JSON message
+
+    { "id": n, "args": [ cmd, ... ], "cwd": dir, "env": dict }
+
+accompanied (via SCM_RIGHTS) by the command's stdin, stdout and
+stderr. The server replies with { "id": n, "pid": pid } or
+{ "id": n, "errno": errno }, and reports { "exit": pid, "status":
+waitstatus } when a command exits, since only it can wait() for its
+children; the client forgets the exit status of commands which
+nobody can wait for any more. When the client closes its socket the
+server exits, leaving any running commands alone.
+
+This file is run directly by the server, so it must not import
+anything from mininet at module level.
+"""
+
+import array
+import json
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+from threading import Condition
+from weakref import WeakValueDictionary
+
+
+MaxMessage = 1 << 20  # bytes; large enough for an environment
+
+
+def sendMsg( sock, msg, fds=() ):
+    """Send a JSON message and optional file descriptors.
+       sock: socket
+       msg: message (dict)
+       fds: file descriptors to send"""
+    data = json.dumps( msg ).encode()
+    anc = ( [ ( socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                array.array( 'i', fds ) ) ] if fds else [] )
+    sock.sendmsg( [ data ], anc )
+
+
+def recvMsg( sock, maxfds=0 ):
+    """Receive a JSON message and any file descriptors.
+       sock: socket
+       maxfds: maximum number of file descriptors
+       returns: message (dict) or None at EOF, list of fds"""
+    fdsize = array.array( 'i' ).itemsize
+    data, anc, _flags, _addr = sock.recvmsg(
+        MaxMessage, socket.CMSG_SPACE( maxfds * fdsize ) if maxfds else 0,
+        socket.MSG_CMSG_CLOEXEC )
+    fds = array.array( 'i' )
+    for level, kind, payload in anc:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes( payload[ :len( payload ) -
+                                    len( payload ) % fdsize ] )
+    if not data:
+        return None, list( fds )
+    return json.loads( data.decode() ), list( fds )
+
+
+# Server
+
+def spawn( request, fds ):
+    """Spawn a command.
+       request: request message
+       fds: stdin, stdout and stderr for command
+       returns: Popen() object, or raises OSError"""
+    # Popen() uses vfork() where it can, which is much faster than
+    # os.fork() for a Python process; like mnexec -d, we detach the
+    # command into its own session
+    try:
+        return subprocess.Popen( request[ 'args' ], stdin=fds[ 0 ],
+                                 stdout=fds[ 1 ], stderr=fds[ 2 ],
+                                 cwd=request.get( 'cwd' ),
+                                 env=request.get( 'env' ),
+                                 start_new_session=True )
+    finally:
+        for fd in fds:
+            os.close( fd )
+
+
+def reap( sock, children ):
+    """Wait for exited children and report them.
+       sock: client socket
+       children: dict of pid to Popen() object"""
+    while True:
+        try:
+            pid, status = os.waitpid( -1, os.WNOHANG )
+        except ChildProcessError:
+            return
+        if not pid:
+            return
+        popen = children.pop( pid, None )
+        if popen:
+            # We reaped it, so Popen() shouldn't try to
+            popen.returncode = status
+        sendMsg( sock, { 'exit': pid, 'status': status } )
+
+
+def serve( sock ):
+    """Serve requests until the client goes away.
+       sock: client socket"""
+    # Turn SIGCHLD into a readable wakeup fd
+    wakeRead, wakeWrite = os.pipe2( os.O_NONBLOCK | os.O_CLOEXEC )
+    signal.set_wakeup_fd( wakeWrite )
+    signal.signal( signal.SIGCHLD, lambda _sig, _frame: None )
+    poller = select.poll()
+    poller.register( sock, select.POLLIN )
+    poller.register( wakeRead, select.POLLIN )
+    children = {}
+    while True:
+        for fd, _event in poller.poll():
+            if fd == wakeRead:
+                try:
+                    while os.read( wakeRead, 1024 ):
+                        pass
+                except BlockingIOError:
+                    pass
+                reap( sock, children )
+                continue
+            request, fds = recvMsg( sock, maxfds=3 )
+            if request is None:
+                return
+            try:
+                popen = spawn( request, fds )
+                children[ popen.pid ] = popen
+                reply = { 'id': request[ 'id' ], 'pid': popen.pid }
+            except OSError as e:
+                reply = { 'id': request[ 'id' ], 'errno': e.errno }
+            sendMsg( sock, reply )
+
+
+# Client
+
+class ForkServer( object ):
+    """Fork server client for a node"""
+
+    # Popen() keyword args we know how to handle
+    popenArgs = ( 'stdin', 'stdout', 'stderr', 'cwd', 'env', 'mncmd' )
+
+    def __init__( self, node ):
+        """Start a fork server in node's namespaces
+           node: Node to start fork server in"""
+        self.node = node
+        # What we reproduce for our commands: node's namespaces (-a)
+        # and a new session (-d)
+        self.mncmd = [ 'mnexec', '-da', str( node.pid ) ]
+        self.sock, remote = socket.socketpair( socket.AF_UNIX,
+                                               socket.SOCK_SEQPACKET )
+        self.server = node.popen(
+            [ sys.executable, os.path.abspath( __file__ ),
+              str( remote.fileno() ) ], mncmd=list( self.mncmd ),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=None, pass_fds=( remote.fileno(), ) )
+        remote.close()
+        # The lock protects our state but is not held while reading,
+        # so a blocking wait() doesn't hold up spawn() or poll()
+        self.lock = Condition()
+        self.reading = False
+        self.lastId = 0
+        self.pending = {}  # request id -> ForkPopen awaiting its pid
+        self.replies = {}  # request id -> reply
+        # pid -> running command; commands which nobody can wait for
+        # any more are forgotten, as is their exit status
+        self.running = WeakValueDictionary()
+
+    def canSpawn( self, kwargs ):
+        """Can we handle these Popen() keyword args? Any other mnexec
+           options in mncmd (e.g. -g cgroup, -r rtprio) need mnexec."""
+        return ( set( kwargs ).issubset( self.popenArgs ) and
+                 kwargs.get( 'mncmd', self.mncmd ) == self.mncmd )
+
+    def handle( self, msg ):
+        """Internal method: handle a message; call with lock held
+           msg: message"""
+        if 'exit' in msg:
+            popen = self.running.pop( msg[ 'exit' ], None )
+            if popen:
+                popen._setStatus( msg[ 'status' ] )  # pylint: disable=W0212
+            return
+        popen = self.pending.pop( msg[ 'id' ] )
+        if 'pid' in msg:
+            self.running[ msg[ 'pid' ] ] = popen
+        self.replies[ msg[ 'id' ] ] = msg
+
+    def readable( self ):
+        "Internal method: is a message waiting for us?"
+        poller = select.poll()
+        poller.register( self.sock, select.POLLIN )
+        return bool( poller.poll( 0 ) )
+
+    def waitFor( self, done, block=True ):
+        """Internal method: read messages until done() returns a value;
+           call with lock held
+           done: function returning a value, or None if not done
+           block: wait until done
+           returns: done()'s value, or None if not done"""
+        while True:
+            result = done()
+            if result is not None:
+                return result
+            if self.reading:
+                # Another thread is reading: let it tell us what it read
+                if not block:
+                    return None
+                self.lock.wait()
+                continue
+            if not block and not self.readable():
+                return None
+            self.reading = True
+            self.lock.release()
+            try:
+                msg, _fds = recvMsg( self.sock )
+            finally:
+                self.lock.acquire()
+                self.reading = False
+                self.lock.notify_all()
+            if msg is None:
+                raise OSError( 'fork server for %s has exited' % self.node )
+            self.handle( msg )
+
+    def spawn( self, popen, args, fds, cwd=None, env=None ):
+        """Spawn a command
+           popen: ForkPopen for command
+           args: command and arguments (list)
+           fds: stdin, stdout and stderr file descriptors
+           cwd: working directory
+           env: environment (dict)
+           returns: pid"""
+        with self.lock:
+            self.lastId += 1
+            requestId = self.lastId
+            request = { 'id': requestId, 'args': args, 'cwd': cwd,
+                        'env': dict( env ) if env is not None else None }
+            self.pending[ requestId ] = popen
+            sendMsg( self.sock, request, fds )
+            reply = self.waitFor(
+                lambda: self.replies.pop( requestId, None ) )
+        if 'errno' in reply:
+            raise OSError( reply[ 'errno' ], os.strerror( reply[ 'errno' ] ),
+                           args[ 0 ] )
+        return reply[ 'pid' ]
+
+    def wait( self, popen, block=True ):
+        """Wait for a command to exit
+           popen: ForkPopen for command
+           block: wait for command to exit
+           returns: returncode, or None if still running"""
+        with self.lock:
+            return self.waitFor( lambda: popen.returncode, block=block )
+
+    def popen( self, cmd, **kwargs ):
+        """Spawn a command using Popen()-style args
+           cmd: command and arguments (list)
+           kwargs: Popen() keyword args (see popenArgs)
+           returns: ForkPopen"""
+        return ForkPopen( self, cmd, **kwargs )
+
+    def stop( self ):
+        "Stop fork server; commands it has started continue to run"
+        self.sock.close()
+        self.server.wait()
+
+
+class ForkPopen( object ):
+    """subprocess.Popen() work-alike for commands spawned by a
+       ForkServer: pid, stdin, stdout, stderr, returncode, poll(),
+       wait(), communicate(), send_signal(), terminate() and kill()"""
+
+    def __init__( self, server, args, stdin=None, stdout=None, stderr=None,
+                  cwd=None, env=None, mncmd=None ):
+        "mncmd is ignored: see ForkServer.canSpawn()"
+        self.server = server
+        self.args = args
+        self.returncode = None
+        self.stdin = self.stdout = self.stderr = None
+        ours, theirs = [], []
+        try:
+            fds = []
+            for i, spec in enumerate( ( stdin, stdout, stderr ) ):
+                if spec is None:
+                    fd = i
+                elif spec == subprocess.PIPE:
+                    r, w = os.pipe2( os.O_CLOEXEC )
+                    mine, fd = ( w, r ) if i == 0 else ( r, w )
+                    ours.append( mine )
+                    theirs.append( fd )
+                    f = os.fdopen( mine, 'wb' if i == 0 else 'rb' )
+                    setattr( self, ( 'stdin', 'stdout', 'stderr' )[ i ], f )
+                elif spec == subprocess.STDOUT:
+                    fd = fds[ 1 ]
+                elif spec == subprocess.DEVNULL:
+                    fd = os.open( os.devnull, os.O_RDWR | os.O_CLOEXEC )
+                    theirs.append( fd )
+                elif isinstance( spec, int ):
+                    fd = spec
+                else:
+                    fd = spec.fileno()
+                fds.append( fd )
+            self.pid = server.spawn( self, args, fds, cwd=cwd, env=env )
+        except Exception:
+            for f in self.stdin, self.stdout, self.stderr:
+                if f:
+                    f.close()
+            raise
+        finally:
+            for fd in theirs:
+                os.close( fd )
+
+    def _setStatus( self, status ):
+        "Internal method: set returncode from wait status"
+        if os.WIFSIGNALED( status ):
+            self.returncode = -os.WTERMSIG( status )
+        else:
+            self.returncode = os.WEXITSTATUS( status )
+
+    def poll( self ):
+        "Return returncode, or None if command is still running"
+        if self.returncode is None:
+            self.server.wait( self, block=False )
+        return self.returncode
+
+    def wait( self ):
+        "Wait for command to exit and return returncode"
+        if self.returncode is None:
+            self.server.wait( self )
+        return self.returncode
+
+    def communicate( self, input=None ):  # pylint: disable=redefined-builtin
+        """Send input, read output until EOF, and wait for command
+           input: bytes to send to stdin
+           returns: stdout, stderr (bytes or None)"""
+        if self.stdin:
+            if input:
+                self.stdin.write( input )
+            self.stdin.close()
+        chunks = {}
+        poller = select.poll()
+        fdToFile = {}
+        for f in self.stdout, self.stderr:
+            if f:
+                fdToFile[ f.fileno() ] = f
+                chunks[ f ] = []
+                poller.register( f, select.POLLIN )
+        while fdToFile:
+            for fd, _event in poller.poll():
+                data = os.read( fd, 65536 )
+                chunks[ fdToFile[ fd ] ].append( data )
+                if not data:
+                    poller.unregister( fd )
+                    fdToFile.pop( fd ).close()
+        self.wait()
+        return tuple( b''.join( chunks[ f ] ) if f in chunks else None
+                      for f in ( self.stdout, self.stderr ) )
+
+    def send_signal( self, sig ):  # pylint: disable=invalid-name
+        "Send a signal to command"
+        if self.returncode is None:
+            os.kill( self.pid, sig )
+
+    def terminate( self ):
+        "Send SIGTERM to command"
+        self.send_signal( signal.SIGTERM )
+
+    def kill( self ):
+        "Send SIGKILL to command"
+        self.send_signal( signal.SIGKILL )
+
+
+if __name__ == '__main__':
+    clientSock = socket.socket( fileno=int( sys.argv[ 1 ] ) )
+    clientSock.set_inheritable( False )
+    serve( clientSock )
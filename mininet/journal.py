@@ -0,0 +1,254 @@
+"""
+Resource journal for mn -c
+
+As it builds a network, Mininet appends each resource it creates
+(node processes and their network namespaces, OVS bridges, interfaces
+in the root namespace, cgroups and temporary files) to a journal file
+in journalDir, and it removes the journal when the network is
+stopped. If Mininet crashes or is killed, mn -c (see mininet.clean)
+replays any journals it finds, removing exactly those resources, in
+bulk, rather than searching for things that look like Mininet's.
+Journals of Mininets which are still running are left alone.
+
+Each journal line is a resource kind followed by its arguments:
+
+    pid 1234 98765              process 1234 (and its process group,
+                                if it leads one) which started at
+                                98765 (in clock ticks since boot)
+    netns net:[4026532890] 1234 98765
+                                network namespace of process 1234
+                                (started at 98765), whose processes
+                                are killed
+    bridge s1                   OVS bridge
+    intf s1-eth1                interface in the root namespace
+    cgroup cpu,cpuacct:/h1      cgroup
+    file /tmp/c0.log            file
+
+Resources may well have been removed already; replay() ignores
+those, and checks process start times so that it doesn't kill
+processes which have reused a recorded pid (or namespaces which have
+reused a recorded namespace's inode).
+"""
+
+import glob
+import os
+import signal
+from subprocess import Popen, PIPE, STDOUT
+
+from mininet.log import info, debug
+from mininet.util import netnsPids, ipBatch
+
+journalDir = '/var/run/mininet'
+
+
+def startTime( pid ):
+    """Return start time of process pid (in clock ticks since boot)
+       pid: process id
+       returns: start time or None if pid doesn't exist"""
+    try:
+        with open( '/proc/%d/stat' % pid ) as f:
+            stat = f.read()
+    except ( IOError, OSError ):
+        return None
+    # Skip pid and (command), which may contain spaces
+    return int( stat.rsplit( ')', 1 )[ 1 ].split()[ 19 ] )
+
+
+def pidResource( pid ):
+    "Return journal resource for process pid"
+    return ( 'pid', pid, startTime( pid ) )
+
+
+def netnsResource( pid ):
+    """Return journal resource for process pid's network namespace
+       returns: resource, or None if pid is (still) in our namespace"""
+    try:
+        ns = os.readlink( '/proc/%d/ns/net' % pid )
+    except OSError:
+        return None
+    if ns == os.readlink( '/proc/self/ns/net' ):
+        return None
+    return ( 'netns', ns, pid, startTime( pid ) )
+
+
+class Journal( object ):
+    "Append-only journal of resources created by a Mininet"
+
+    def __init__( self, directory=None ):
+        """directory: where to keep the journal (journalDir)"""
+        self.directory = directory or journalDir
+        self.path = None
+        self.fd = None
+        self.recorded = set()
+
+    def open( self ):
+        "Create our journal file"
+        if not os.path.isdir( self.directory ):
+            os.makedirs( self.directory )
+        # Our pid and id() keep journals for multiple networks apart,
+        # and our start time tells replay() whether we're still running
+        pid = os.getpid()
+        self.path = os.path.join( self.directory, 'journal-%d-%s-%x' %
+                                  ( pid, startTime( pid ), id( self ) ) )
+        self.fd = os.open( self.path, os.O_WRONLY | os.O_CREAT |
+                           os.O_APPEND, 0o600 )
+
+    def record( self, resources ):
+        """Append resources to our journal
+           resources: list of ( kind, arg, ... )"""
+        lines = []
+        for resource in resources:
+            if resource not in self.recorded:
+                self.recorded.add( resource )
+                lines.append( ' '.join( str( arg ) for arg in resource ) )
+        if not lines:
+            return
+        try:
+            if self.fd is None:
+                self.open()
+            # O_APPEND writes survive our process dying
+            os.write( self.fd, ( '\n'.join( lines ) + '\n' ).encode() )
+        except ( IOError, OSError ) as e:
+            debug( '*** Error writing journal: %s\n' % e )
+
+    def close( self ):
+        "Remove our journal, since our resources are gone"
+        if self.fd is not None:
+            os.close( self.fd )
+            self.fd = None
+            try:
+                os.unlink( self.path )
+            except OSError:
+                pass
+        self.recorded = set()
+
+
+def journals( directory=None ):
+    "Return paths of journals in directory (journalDir)"
+    return sorted( glob.glob( os.path.join( directory or journalDir,
+                                            'journal-*' ) ) )
+
+
+def ownerAlive( path ):
+    "Is the process which wrote journal path still running?"
+    fields = os.path.basename( path ).split( '-' )
+    try:
+        pid, start = int( fields[ 1 ] ), fields[ 2 ]
+    except ( IndexError, ValueError ):
+        return False
+    return str( startTime( pid ) ) == start
+
+
+def readJournals( paths ):
+    """Read resources from journals
+       returns: { kind: [ args ] }, in the order they were recorded"""
+    resources, seen = {}, set()
+    for path in paths:
+        try:
+            with open( path ) as f:
+                lines = f.read().splitlines()
+        except ( IOError, OSError ):
+            continue
+        for line in lines:
+            fields = line.split()
+            if fields and line not in seen:
+                seen.add( line )
+                resources.setdefault( fields[ 0 ], [] ).append(
+                    fields[ 1: ] )
+    return resources
+
+
+def killProcesses( pids, netns ):
+    """Kill recorded processes and all processes in recorded network
+       namespaces, checking that they are the ones we recorded
+       pids: list of [ pid, start time ]
+       netns: list of [ namespace, pid, start time ]
+       returns: set of pids killed"""
+    killed = set()
+    def alive( pid, start ):
+        "Is process pid the one that started at start?"
+        return start != 'None' and str( startTime( int( pid ) ) ) == start
+    # A namespace is the one we recorded only if its process is,
+    # and we certainly don't want to kill everything in ours
+    ourns = os.readlink( '/proc/self/ns/net' )
+    namespaces = set( ns for ns, pid, start in netns
+                      if alive( pid, start ) and ns != ourns )
+    for pid, start in pids:
+        if not alive( pid, start ):
+            continue
+        pid = int( pid )
+        try:
+            if os.getpgid( pid ) == pid:
+                os.killpg( pid, signal.SIGKILL )
+            else:
+                os.kill( pid, signal.SIGKILL )
+            killed.add( pid )
+        except OSError:
+            pass
+    if namespaces:
+        for ns, nspids in netnsPids().items():
+            if ns not in namespaces:
+                continue
+            for pid in nspids:
+                try:
+                    os.kill( pid, signal.SIGKILL )
+                    killed.add( pid )
+                except OSError:
+                    pass
+    return killed
+
+
+def run( cmd ):
+    "Run cmd quietly, logging it and its output at debug level"
+    debug( ' '.join( cmd ) + '\n' )
+    try:
+        output = Popen( cmd, stdout=PIPE,
+                        stderr=STDOUT ).communicate()[ 0 ]
+        debug( output.decode( 'utf-8', 'replace' ) )
+    except OSError as e:
+        debug( '%s\n' % e )
+
+
+def replay( paths, force=False ):
+    """Remove the resources recorded in journals, in bulk, and then
+       the journals themselves
+       paths: journal paths (see journals())
+       force: also replay journals of Mininets which are still running
+       returns: paths of journals replayed"""
+    if not force:
+        live = [ path for path in paths if ownerAlive( path ) ]
+        if live:
+            info( '*** Skipping %d journal(s) of running Mininets: %s\n' %
+                  ( len( live ), ' '.join( live ) ) )
+        paths = [ path for path in paths if path not in live ]
+    resources = readJournals( paths )
+    info( '*** Killing %d recorded processes and namespaces\n' %
+          len( resources.get( 'pid', [] ) ) )
+    killProcesses( resources.get( 'pid', [] ),
+                   resources.get( 'netns', [] ) )
+    bridges = [ args[ 0 ] for args in resources.get( 'bridge', [] ) ]
+    if bridges:
+        info( '*** Removing %d recorded OVS bridges\n' % len( bridges ) )
+        run( [ 'ovs-vsctl', '--timeout=5' ] +
+             ' -- '.join( '--if-exists del-br %s' % bridge
+                          for bridge in bridges ).split() )
+    intfs = [ args[ 0 ] for args in resources.get( 'intf', [] ) ]
+    if intfs:
+        info( '*** Removing %d recorded interfaces\n' % len( intfs ) )
+        # Interfaces which have gone away just produce errors
+        debug( ipBatch( [ 'link del %s' % intf for intf in intfs ] ) )
+    cgroups = [ args[ 0 ] for args in resources.get( 'cgroup', [] ) ]
+    if cgroups:
+        info( '*** Removing %d recorded cgroups\n' % len( cgroups ) )
+        run( [ 'cgdelete', '-r' ] + cgroups )
+    for args in resources.get( 'file', [] ):
+        try:
+            os.unlink( args[ 0 ] )
+        except OSError:
+            pass
+    for path in paths:
+        try:
+            os.unlink( path )
+        except OSError:
+            pass
+    return paths
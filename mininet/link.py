@@ -21,11 +21,21 @@
 Intf: basic interface object that can configure itself
 TCIntf: interface with bandwidth limiting and delay via tc
 
+NetlinkIntf: interface which configures itself via rtnetlink
+
 Link: basic link class for creating veth pairs
+
+NetlinkLink: link which creates veth pairs via rtnetlink
+
+OVSInternalLink: link which uses an OVS internal port, rather than
+    a veth pair, as a host's interface
 """
 
 from mininet.log import info, error, debug
-from mininet.util import makeIntfPair
+from mininet.util import makeIntfPair, moveIntf, tcBatch, ipBatch
+from mininet.netlink import NetlinkError, rootNetlink, ignoreMissing
+import json
+import os
 import re
 
 class Intf( object ):
@@ -93,8 +103,20 @@ def setMAC( self, macstr ):
     _ipMatchRegex = re.compile( r'\d+\.\d+\.\d+\.\d+' )
     _macMatchRegex = re.compile( r'..:..:..:..:..:..' )
 
+    # Our node's LinkCache, if it has one, lets us look up our state
+    # without running ifconfig; otherwise we fall back to ifconfig
+
+    def linkCache( self ):
+        "Return our node's LinkCache (see Node.linkState()), or None"
+        return self.node.linkState() if self.node else None
+
     def updateIP( self ):
-        "Return updated IP address based on ifconfig"
+        "Return updated IP address based on netlink or ifconfig"
+        cache = self.linkCache()
+        if cache:
+            addrs = cache.addrs( self.name )
+            self.ip = addrs[ 0 ][ 0 ] if addrs else None
+            return self.ip
         # use pexec instead of node.cmd so that we dont read
         # backgrounded output from the cli.
         ifconfig, _err, _exitCode = self.node.pexec(
@@ -104,7 +126,12 @@ def updateIP( self ):
         return self.ip
 
     def updateMAC( self ):
-        "Return updated MAC address based on ifconfig"
+        "Return updated MAC address based on netlink or ifconfig"
+        cache = self.linkCache()
+        if cache:
+            link = cache.link( self.name )
+            self.mac = link[ 'mac' ] if link else None
+            return self.mac
         ifconfig = self.ifconfig()
         macs = self._macMatchRegex.findall( ifconfig )
         self.mac = macs[ 0 ] if macs else None
@@ -115,7 +142,9 @@ def updateMAC( self ):
     # This saves an ifconfig command, which improves performance.
 
     def updateAddr( self ):
-        "Return IP address and MAC address based on ifconfig."
+        "Return IP address and MAC address based on netlink or ifconfig."
+        if self.linkCache():
+            return self.updateIP(), self.updateMAC()
         ifconfig = self.ifconfig()
         ips = self._ipMatchRegex.findall( ifconfig )
         macs = self._macMatchRegex.findall( ifconfig )
@@ -134,6 +163,10 @@ def MAC( self ):
     def isUp( self, setUp=False ):
         "Return whether interface is up"
         if setUp:
+            cache = self.linkCache()
+            link = cache.link( self.name ) if cache else None
+            if link and link[ 'up' ]:
+                return True
             cmdOutput = self.ifconfig( 'up' )
             # no output indicates success
             if cmdOutput:
@@ -142,6 +175,10 @@ def isUp( self, setUp=False ):
             else:
                 return True
         else:
+            cache = self.linkCache()
+            if cache:
+                link = cache.link( self.name )
+                return bool( link and link[ 'up' ] )
             return "UP" in self.ifconfig()
 
     def rename( self, newname ):
@@ -210,12 +247,20 @@ def delete( self ):
 
     def status( self ):
         "Return intf status as a string"
+        cache = self.linkCache()
+        if cache:
+            return "OK" if cache.link( self.name ) else "MISSING"
         links, _err, _result = self.node.pexec( 'ip link show' )
         if self.name in links:
             return "OK"
         else:
             return "MISSING"
 
+    def setHostRoute( self, ip ):
+        """Add route to host via this interface.
+           ip: IP address as dotted decimal"""
+        return self.cmd( 'route add -host', ip, 'dev', self.name )
+
     def __repr__( self ):
         return '<%s %s>' % ( self.__class__.__name__, self.name )
 
@@ -232,6 +277,16 @@ class TCIntf( Intf ):
     # For higher data rates, we will probably need to change them.
     bwParamMax = 1000
 
+    # tc commands (from bwCmds() and delayCmds()) which we installed,
+    # or None if we don't know what is installed, and offload settings
+    # we applied; config() only applies changes to these
+    tcCmds = None
+    offloads = None
+
+    # Which qdisc or class a tc command adds, and where
+    _tcShapeRe = re.compile( r'(qdisc|class) add dev %s\s+(root|parent \S+)'
+                             r'\s+(?:handle|classid) (\S+) (\w+)' )
+
     def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
                 latency_ms=None, enable_ecn=False, enable_red=False ):
         "Return tc commands to set bandwidth"
@@ -311,6 +366,91 @@ def tc( self, cmd, tc='tc' ):
         debug(" *** executing command: %s\n" % c)
         return self.cmd( c )
 
+    def shapeCmds( self, bw=None, delay=None, jitter=None, loss=None,
+                   speedup=0, use_hfsc=False, use_tbf=False,
+                   latency_ms=None, enable_ecn=False, enable_red=False,
+                   max_queue_size=None ):
+        """Return tc commands to add our qdiscs and classes
+           (see config() for parameters)
+           returns: cmds, parent of last qdisc"""
+        # Bandwidth limits via various methods
+        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
+                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
+                                      latency_ms=latency_ms,
+                                      enable_ecn=enable_ecn,
+                                      enable_red=enable_red )
+        # Delay/jitter/loss/max_queue_size using netem
+        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
+                                            loss=loss,
+                                            max_queue_size=max_queue_size,
+                                            parent=parent )
+        return bwcmds + delaycmds, parent
+
+    def batchLines( self, cmds ):
+        """Format tc commands for tc -batch
+           cmds: tc commands with %s for tc and our name"""
+        return [ ( cmd % ( '', self ) ).strip() for cmd in cmds ]
+
+    def invalidateTC( self ):
+        """Forget which tc configuration is installed, so that the next
+           config() reinstalls it (e.g. after a switch has replaced our
+           qdiscs)"""
+        self.tcCmds = None
+
+    def tcChanges( self, cmds ):
+        """Return tc commands to get from our installed configuration
+           to cmds: if cmds add the same qdiscs and classes, change
+           those whose parameters differ, leaving their queues alone;
+           otherwise, delete the root qdisc (if any) and add cmds
+           cmds: tc add commands from bwCmds() and delayCmds()
+           returns: list of tc commands"""
+        old = self.tcCmds
+        if old is not None and len( old ) == len( cmds ) and all(
+                self._tcShapeRe.search( a ).groups() ==
+                self._tcShapeRe.search( b ).groups()
+                for a, b in zip( old, cmds ) ):
+            return [ b.replace( ' add ', ' change ', 1 )
+                     for a, b in zip( old, cmds ) if a != b ]
+        if old is None:
+            # We don't know what is installed, so look
+            tcoutput = self.tc( '%s qdisc show dev %s' )
+            clear = "priomap" not in tcoutput and "noqueue" not in tcoutput
+        else:
+            clear = bool( old )
+        return ( [ '%s qdisc del dev %s root' ] if clear else [] ) + cmds
+
+    @staticmethod
+    def _tcId( tcid ):
+        "Normalize a tc handle or class id (e.g. 5:0 -> 5:)"
+        major, minor = tcid.split( ':', 1 )
+        return major + ':' + ( '' if minor in ( '', '0' ) else minor )
+
+    def tcIntact( self, qdiscs ):
+        """Are the qdiscs we installed still in place?
+           qdiscs: { dev: [ qdisc ] } from tcQdiscs(), or None
+           returns: True if qdiscs show our configuration installed"""
+        params = self.params
+        if ( params.get( 'bw' ) is None and not params.get( 'delay' ) and
+             not params.get( 'loss' ) and
+             params.get( 'max_queue_size' ) is None ):
+            # config() leaves unshaped interfaces alone
+            return True
+        if self.tcCmds is None or qdiscs is None:
+            return False
+        installed = set(
+            ( 'root' if q.get( 'root' ) else self._tcId( q[ 'parent' ] ),
+              self._tcId( q[ 'handle' ] ), q[ 'kind' ] )
+            for q in qdiscs.get( self.name, [] ) )
+        for cmd in self.tcCmds:
+            kind, parent, handle, qdisc = self._tcShapeRe.search(
+                cmd ).groups()
+            if parent != 'root':
+                parent = self._tcId( parent.split()[ 1 ] )
+            if ( kind == 'qdisc' and
+                 ( parent, self._tcId( handle ), qdisc ) not in installed ):
+                return False
+        return True
+
     def config( self, bw=None, delay=None, jitter=None, loss=None,
                 gro=False, txo=True, rxo=True,
                 speedup=0, use_hfsc=False, use_tbf=False,
@@ -341,11 +481,14 @@ def on( isOn ):
             "Helper method: bool -> 'on'/'off'"
             return 'on' if isOn else 'off'
 
-        # Set offload parameters with ethool
-        self.cmd( 'ethtool -K', self,
-                  'gro', on( gro ),
-                  'tx', on( txo ),
-                  'rx', on( rxo ) )
+        # Set offload parameters with ethool, if they have changed
+        offloads = ( gro, txo, rxo )
+        if offloads != self.offloads:
+            self.cmd( 'ethtool -K', self,
+                      'gro', on( gro ),
+                      'tx', on( txo ),
+                      'rx', on( rxo ) )
+            self.offloads = offloads
 
         # Optimization: return if nothing else to configure
         # Question: what happens if we want to reset things?
@@ -353,27 +496,14 @@ def on( isOn ):
              and max_queue_size is None ):
             return
 
-        # Clear existing configuration
-        tcoutput = self.tc( '%s qdisc show dev %s' )
-        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
-            cmds = [ '%s qdisc del dev %s root' ]
-        else:
-            cmds = []
+        shapecmds, parent = self.shapeCmds(
+            bw=bw, delay=delay, jitter=jitter, loss=loss, speedup=speedup,
+            use_hfsc=use_hfsc, use_tbf=use_tbf, latency_ms=latency_ms,
+            enable_ecn=enable_ecn, enable_red=enable_red,
+            max_queue_size=max_queue_size )
 
-        # Bandwidth limits via various methods
-        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
-                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
-                                      latency_ms=latency_ms,
-                                      enable_ecn=enable_ecn,
-                                      enable_red=enable_red )
-        cmds += bwcmds
-
-        # Delay/jitter/loss/max_queue_size using netem
-        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
-                                            loss=loss,
-                                            max_queue_size=max_queue_size,
-                                            parent=parent )
-        cmds += delaycmds
+        # Only apply what has changed
+        cmds = self.tcChanges( shapecmds )
 
         # Ugly but functional: display configuration info
         stuff = ( ( [ '%.2fMbit' % bw ] if bw is not None else [] ) +
@@ -384,12 +514,18 @@ def on( isOn ):
                     if enable_red else [] ) )
         info( '(' + ' '.join( stuff ) + ') ' )
 
-        # Execute all the commands in our node
+        # Execute all the commands in our node using one tc -batch
         debug("at map stage w/cmds: %s\n" % cmds)
-        tcoutputs = [ self.tc(cmd) for cmd in cmds ]
+        tcoutputs = []
+        if cmds:
+            tcoutputs = [ tcBatch( self.batchLines( cmds ), self.node ) ]
+        self.tcCmds = shapecmds
         for output in tcoutputs:
             if output != '':
                 error( "*** Error: %s" % output )
+            if 'Command failed' in output:
+                # Some commands failed, so we're not sure what we have
+                self.tcCmds = None
         debug( "cmds:", cmds, '\n' )
         debug( "outputs:", tcoutputs, '\n' )
         result[ 'tcoutputs'] = tcoutputs
@@ -398,6 +534,140 @@ def on( isOn ):
         return result
 
 
+def tcQdiscs( node ):
+    """Return the qdiscs in node's namespace, using one tc -j qdisc show
+       node: node to run tc in
+       returns: { dev: [ qdisc ] }, or None if tc can't output JSON"""
+    try:
+        qdiscs = json.loads( node.cmd( 'tc -j qdisc show' ) )
+    except ValueError:
+        return None
+    result = {}
+    for qdisc in qdiscs:
+        result.setdefault( qdisc.get( 'dev' ), [] ).append( qdisc )
+    return result
+
+
+def overwrittenTC( intfs ):
+    """Return the TCIntfs whose qdiscs are not (or may not be) the
+       ones we installed, e.g. because a switch replaced them,
+       reading qdiscs using one tc -j qdisc show per namespace
+       intfs: interfaces to check (non-TCIntfs are ignored)
+       returns: list of TCIntfs needing config() to reinstall"""
+    namespaces = {}
+    for intf in intfs:
+        if isinstance( intf, TCIntf ):
+            namespaces.setdefault( intf.node.netnsKey(), [] ).append( intf )
+    overwritten = []
+    for group in namespaces.values():
+        qdiscs = tcQdiscs( group[ 0 ].node )
+        overwritten += [ intf for intf in group
+                         if not intf.tcIntact( qdiscs ) ]
+    return overwritten
+
+
+class NetlinkIntf( Intf ):
+    """Interface which configures itself using rtnetlink rather than
+       ifconfig and ip, saving a process spawn per operation.
+       Falls back to Intf's commands if the node has no netlink
+       socket (see Node.netlinkSocket()). Like the commands they
+       replace, methods return an error string ('' for success)
+       rather than raising exceptions."""
+
+    def netlink( self ):
+        "Return our node's Netlink, or None"
+        return self.node.netlinkSocket() if self.node else None
+
+    def setIP( self, ipstr, prefixLen=None ):
+        """Set our IP address"""
+        nl = self.netlink()
+        if not nl:
+            return Intf.setIP( self, ipstr, prefixLen )
+        up = '/' in ipstr
+        if up:
+            ipstr, prefixLen = ipstr.split( '/' )
+        elif prefixLen is None:
+            raise Exception( 'No prefix length set for IP address %s'
+                             % ( ipstr, ) )
+        self.ip, self.prefixLen = ipstr, prefixLen
+        try:
+            nl.setAddr( self.name, ipstr, prefixLen )
+            if up:
+                nl.setLink( self.name, up=True )
+        except NetlinkError as e:
+            return str( e )
+        return ''
+
+    def setMAC( self, macstr ):
+        """Set the MAC address for an interface.
+           macstr: MAC address as string"""
+        nl = self.netlink()
+        if not nl:
+            return Intf.setMAC( self, macstr )
+        self.mac = macstr
+        try:
+            nl.setLink( self.name, up=False )
+            nl.setLink( self.name, mac=macstr )
+            nl.setLink( self.name, up=True )
+        except NetlinkError as e:
+            return str( e )
+        return ''
+
+    def isUp( self, setUp=False ):
+        "Return whether interface is up"
+        nl = self.netlink()
+        if not nl or not setUp:
+            return Intf.isUp( self, setUp )
+        try:
+            nl.setLink( self.name, up=True )
+            return True
+        except NetlinkError as e:
+            error( "Error setting %s up: %s " % ( self.name, e ) )
+            return False
+
+    def rename( self, newname ):
+        "Rename interface"
+        nl = self.netlink()
+        if not nl:
+            return Intf.rename( self, newname )
+        if self.node and self.name in self.node.nameToIntf:
+            # rename intf in node's nameToIntf
+            self.node.nameToIntf[newname] = self.node.nameToIntf.pop(self.name)
+        result = ''
+        try:
+            nl.setLink( self.name, up=False )
+            nl.setLink( self.name, newName=newname )
+        except NetlinkError as e:
+            result = str( e )
+        self.name = newname
+        self.isUp( setUp=True )
+        return result
+
+    def delete( self ):
+        "Delete interface"
+        nl = self.netlink()
+        if not nl:
+            return Intf.delete( self )
+        try:
+            ignoreMissing( nl.delLink, self.name )
+        except NetlinkError as e:
+            error( '*** Error deleting %s: %s\n' % ( self.name, e ) )
+        self.node.delIntf( self )
+        self.link = None
+
+    def setHostRoute( self, ip ):
+        """Add route to host via this interface.
+           ip: IP address as dotted decimal"""
+        nl = self.netlink()
+        if not nl:
+            return Intf.setHostRoute( self, ip )
+        try:
+            nl.addRoute( ip, 32, self.name )
+        except NetlinkError as e:
+            return str( e )
+        return ''
+
+
 class Link( object ):
 
     """A basic link is just a veth pair.
@@ -407,7 +677,7 @@ class Link( object ):
     def __init__( self, node1, node2, port1=None, port2=None,
                   intfName1=None, intfName2=None, addr1=None, addr2=None,
                   intf=Intf, cls1=None, cls2=None, params1=None,
-                  params2=None, fast=True, **params ):
+                  params2=None, fast=True, created=False, **params ):
         """Create veth link to another node, making two new interfaces.
            node1: first node
            node2: second node
@@ -419,6 +689,8 @@ def __init__( self, node1, node2, port1=None, port2=None,
            intfName2: node2  interface name (optional)
            params1: parameters for interface 1 (optional)
            params2: parameters for interface 2 (optional)
+           created: interfaces already exist in their nodes
+               (e.g. created by Mininet.addLinks())
            **params: additional parameters for both interfaces"""
 
         # This is a bit awkward; it seems that having everything in
@@ -444,7 +716,10 @@ def __init__( self, node1, node2, port1=None, port2=None,
         params2.update( params )
 
         self.fast = fast
-        if fast:
+        if created:
+            params1.setdefault( 'moveIntfFn', self._ignore )
+            params2.setdefault( 'moveIntfFn', self._ignore )
+        elif fast:
             params1.setdefault( 'moveIntfFn', self._ignore )
             params2.setdefault( 'moveIntfFn', self._ignore )
             self.makeIntfPair( intfName1, intfName2, addr1, addr2,
@@ -478,6 +753,17 @@ def intfName( self, node, n ):
         assert self
         return node.name + '-eth' + repr( n )
 
+    @classmethod
+    def isVethLink( cls ):
+        """Do we use Link.makeIntfPair(), so that Mininet.addLinks()
+           may create our veth pair for us?"""
+        for klass in cls.__mro__:
+            if klass is Link:
+                return True
+            if 'makeIntfPair' in vars( klass ):
+                return False
+        return False
+
     @classmethod
     def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
                       node1=None, node2=None, deleteIntfs=True ):
@@ -506,6 +792,14 @@ def stop( self ):
         "Override to stop and clean up link as needed"
         self.delete()
 
+    def resources( self ):
+        """Return resources we have created, for Mininet's journal
+           (see mininet.journal): interfaces in the root namespace,
+           other than OVS ports, which go away with their bridges"""
+        return [ ( 'intf', intf.name ) for intf in ( self.intf1, self.intf2 )
+                 if intf and not intf.node.inNamespace and
+                 not isinstance( intf, ( OVSIntf, OVSInternalIntf ) ) ]
+
     def status( self ):
         "Return link status as a string"
         return "(%s %s)" % ( self.intf1.status(), self.intf2.status() )
@@ -549,6 +843,124 @@ def makeIntfPair( self, *args, **kwargs ):
             return Link.makeIntfPair( *args, **kwargs )
 
 
+class OVSInternalIntf( Intf ):
+    """Node interface which is an OVS internal port (see
+       OVSInternalLink). The port doesn't exist until its switch
+       starts, so until then we save commands (e.g. to set our IP
+       address) and run them once the switch has created the port
+       and moved it to our node (see moveOVSInternalIntfs())."""
+
+    def __init__( self, *args, **kwargs ):
+        self.pending = []  # saved commands, or None once we exist
+        Intf.__init__( self, *args, **kwargs )
+
+    def cmd( self, *args, **kwargs ):
+        "Run a command in our owning node, or save it for later"
+        if self.pending is None:
+            return Intf.cmd( self, *args, **kwargs )
+        self.pending.append( ( args, kwargs ) )
+        return ''
+
+    def realize( self ):
+        "Our port now exists: run any saved commands"
+        pending, self.pending = self.pending or [], None
+        for args, kwargs in pending:
+            Intf.cmd( self, *args, **kwargs )
+
+    def delete( self ):
+        "Forget interface; our switch deletes its port"
+        self.node.delIntf( self )
+        self.link = None
+
+
+class OVSPortIntf( OVSIntf ):
+    """Switch end of an OVSInternalLink: the OVS internal port
+       which is our peer's interface, and has our peer's name"""
+
+    def peer( self ):
+        "Return the OVSInternalIntf that this port becomes"
+        intf1, intf2 = self.link.intf1, self.link.intf2
+        return intf1 if intf1 is not self else intf2
+
+    def config( self, **_params ):
+        """Nothing to configure: we are our peer's interface, which
+           doesn't exist until our switch creates it, and which our
+           peer configures (see moveOVSInternalIntfs())"""
+        return {}
+
+    def delete( self ):
+        "Delete our OVS port, and hence our peer's interface"
+        self.cmd( 'ovs-vsctl --if-exists del-port', self.node, self )
+        self.node.delIntf( self )
+        self.link = None
+
+
+def moveOVSInternalIntfs( ports ):
+    """Move OVS internal ports created by their switches into their
+       nodes' namespaces, setting their MAC addresses, using a single
+       ip -batch, and run the nodes' saved commands for them
+       ports: OVSPortIntfs whose ports have been created"""
+    cmds = []
+    for port in ports:
+        intf = port.peer()
+        cmd = 'link set dev %s' % port
+        if intf.mac:
+            cmd += ' address %s' % intf.mac
+        if intf.node.inNamespace:
+            cmd += ' netns %d' % intf.node.pid
+        cmds.append( cmd )
+    if cmds:
+        output = ipBatch( cmds )
+        if output:
+            error( '*** Error moving OVS internal ports: %s\n' % output )
+    for port in ports:
+        port.peer().realize()
+
+
+class OVSInternalLink( Link ):
+    """Link which makes a host's (or other node's) interface an OVS
+       internal port on an OVSSwitch, moved into the host's namespace,
+       rather than a veth pair whose other end is an OVS port; this
+       saves a netdev per host, and a hop for every packet. The
+       switch creates the port, which keeps the host interface's name,
+       when it starts (and uses ofport_request as usual to set its
+       port number). Links between switches, or involving switches
+       with userspace datapaths, are ordinary veth pairs."""
+
+    def __init__( self, node1, node2, **kwargs ):
+        "See Link.__init__() for options"
+        from mininet.node import OVSSwitch
+
+        def isSwitch( node ):
+            "Is node a (kernel datapath) OVSSwitch?"
+            return ( isinstance( node, OVSSwitch ) and
+                     node.datapath != 'user' )
+
+        self.isInternalLink = isSwitch( node1 ) != isSwitch( node2 )
+        if self.isInternalLink:
+            # The switch port has the host interface's name
+            h, s = ( 1, 2 ) if isSwitch( node2 ) else ( 2, 1 )
+            host = ( node1, node2 )[ h - 1 ]
+            if kwargs.get( 'port%d' % h ) is None:
+                kwargs[ 'port%d' % h ] = host.newPort()
+            name = ( kwargs.get( 'intfName%d' % h ) or
+                     self.intfName( host, kwargs[ 'port%d' % h ] ) )
+            kwargs[ 'intfName%d' % h ] = kwargs[ 'intfName%d' % s ] = name
+            kwargs.update( { 'cls%d' % h: OVSInternalIntf,
+                             'cls%d' % s: OVSPortIntf } )
+            for i in h, s:
+                params = dict( kwargs.get( 'params%d' % i ) or {} )
+                params.setdefault( 'moveIntfFn', self._ignore )
+                kwargs[ 'params%d' % i ] = params
+        Link.__init__( self, node1, node2, **kwargs )
+
+    def makeIntfPair( self, *args, **kwargs ):
+        "Internal ports are created by their switches"
+        if self.isInternalLink:
+            return None
+        return Link.makeIntfPair( *args, **kwargs )
+
+
 class TCLink( Link ):
     "Link with TC interfaces"
     def __init__( self, *args, **kwargs):
@@ -570,3 +982,71 @@ class TCULink( TCLink ):
     def __init__( self, *args, **kwargs ):
         kwargs.update( txo=False, rxo=False )
         TCLink.__init__( self, *args, **kwargs )
+
+
+class NetlinkLink( Link ):
+    """Link which creates its veth pair using rtnetlink, directly in
+       the namespaces of its nodes, and uses NetlinkIntfs by default.
+       Falls back to ip if netlink is unavailable."""
+
+    def __init__( self, node1, node2, **kwargs ):
+        "See Link.__init__() for options"
+        kwargs.setdefault( 'cls1', NetlinkIntf )
+        kwargs.setdefault( 'cls2', NetlinkIntf )
+        if not kwargs.get( 'fast', True ):
+            for key in 'params1', 'params2':
+                params = dict( kwargs.get( key ) or {} )
+                params.setdefault( 'moveIntfFn', self.moveIntf )
+                kwargs[ key ] = params
+        Link.__init__( self, node1, node2, **kwargs )
+
+    @staticmethod
+    def nodeNetlink( node ):
+        "Return Netlink for node's namespace (root if node is None)"
+        return node.netlinkSocket() if node else rootNetlink()
+
+    @classmethod
+    def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
+                      node1=None, node2=None, deleteIntfs=True ):
+        """Create pair of interfaces
+           intfname1: name for interface 1
+           intfname2: name for interface 2
+           addr1: MAC address for interface 1 (optional)
+           addr2: MAC address for interface 2 (optional)
+           node1: home node for interface 1 (optional)
+           node2: home node for interface 2 (optional)
+           deleteIntfs: delete intfs before creating them"""
+        nl1, nl2 = cls.nodeNetlink( node1 ), cls.nodeNetlink( node2 )
+        if not nl1 or not nl2:
+            return Link.makeIntfPair( intfname1, intfname2, addr1, addr2,
+                                      node1, node2, deleteIntfs=deleteIntfs )
+        try:
+            if deleteIntfs:
+                # Delete any old interfaces with the same names
+                ignoreMissing( nl1.delLink, intfname1 )
+                ignoreMissing( nl2.delLink, intfname2 )
+            pid2 = node2.pid if node2 else os.getpid()
+            nl1.addVeth( intfname1, intfname2, addr1, addr2, pid2=pid2 )
+        except NetlinkError as e:
+            raise Exception( "Error creating interface pair (%s,%s): %s " %
+                             ( intfname1, intfname2, e ) )
+        return None
+
+    @staticmethod
+    def moveIntf( intf, dstNode, printError=True ):
+        """Move interface from root namespace to node
+           intf: string, interface
+           dstNode: destination Node
+           printError: if true, print error"""
+        nl = rootNetlink()
+        if not nl:
+            return moveIntf( intf, dstNode, printError=printError )
+        try:
+            nl.setLink( str( intf ), pid=dstNode.pid )
+        except NetlinkError as e:
+            if printError:
+                error( '*** Error: moveIntf: ' + str( intf ) +
+                       ' not successfully moved to ' + dstNode.name +
+                       ':\n', e )
+            return False
+        return True
@@ -0,0 +1,269 @@
+"""
+Trace-driven link emulation
+
+LinkTraceScheduler replays traces of link conditions (bandwidth,
+delay, loss, ...) on TCIntfs, e.g. to emulate measured cellular or
+WAN links:
+
+    scheduler = LinkTraceScheduler()
+    scheduler.add( link.intf1, 'uplink.trace' )
+    scheduler.add( link.intf2, 'downlink.trace' )
+    scheduler.run()
+    scheduler.report()
+
+A trace file has one change per line, giving a time in seconds
+(relative to the start of the replay) followed by the TCIntf.config()
+parameters that change at that time:
+
+    # time  params
+    0       bw=10 delay=20ms loss=0
+    0.010   bw=8
+    0.020   bw=12 delay=25ms
+
+Parameters not named on a line keep their previous values; initial
+values come from the interface's own parameters (intf.params).
+
+Calling intf.config() for each change costs several processes and
+Python work which is both slow and jittery at 10 ms granularity.
+Instead, the scheduler computes every tc command up front (using
+TCIntf.tcChanges(), so that an unchanged qdisc shape becomes a
+'change' rather than a reinstall) and keeps a single 'tc -batch'
+process per node, to which it writes all of the changes that fall
+due at the same time. Its timer sleeps until just before each
+change is due and then spins.
+
+Since tc -batch doesn't acknowledge commands, drift is measured
+as the difference between when each set of changes was due and
+when it was written to the tc processes; stats() and report()
+summarize it.
+"""
+
+from subprocess import PIPE, STDOUT
+from threading import Thread, Event
+
+from mininet.log import info, error, debug
+from mininet.util import makeNumeric, monotonic
+
+# TCIntf.shapeCmds() parameters which a trace may set
+SHAPEPARAMS = ( 'bw', 'delay', 'jitter', 'loss', 'speedup', 'use_hfsc',
+                'use_tbf', 'latency_ms', 'enable_ecn', 'enable_red',
+                'max_queue_size' )
+
+
+def parseParam( value ):
+    "Convert trace parameter value to bool, int or float if possible"
+    if value in ( 'True', 'False' ):
+        return value == 'True'
+    return makeNumeric( value )
+
+
+def parseTrace( lines ):
+    """Parse trace lines
+       lines: iterable of 'time param=value ...' strings
+       returns: [ ( time, { param: value } ) ] sorted by time"""
+    trace = []
+    for lineno, line in enumerate( lines, 1 ):
+        line = line.split( '#' )[ 0 ].strip()
+        if not line:
+            continue
+        fields = line.split()
+        params = {}
+        try:
+            t = float( fields[ 0 ] )
+            for field in fields[ 1: ]:
+                key, value = field.split( '=', 1 )
+                if key not in SHAPEPARAMS:
+                    raise ValueError( 'unknown parameter %s' % key )
+                params[ key ] = parseParam( value )
+        except ValueError as e:
+            raise ValueError( 'trace line %d: %s: %s' %
+                              ( lineno, line, e ) )
+        trace.append( ( t, params ) )
+    # Stable sort, so later lines win for equal times
+    trace.sort( key=lambda event: event[ 0 ] )
+    return trace
+
+
+def loadTrace( filename ):
+    """Load a trace file
+       filename: trace file name
+       returns: [ ( time, { param: value } ) ] sorted by time"""
+    with open( filename ) as f:
+        return parseTrace( f )
+
+
+class LinkTraceScheduler( object ):
+    """Replay traces of link parameters on TCIntfs using one
+       tc -batch process per node and a precise timer"""
+
+    def __init__( self, spin=.002 ):
+        """spin: busy-wait for the last spin seconds before each
+           change rather than sleeping"""
+        self.spin = spin
+        self.traces = {}  # intf -> trace
+        self.procs = {}  # node -> tc -batch process
+        self.readers = []
+        self.failed = set()  # nodes whose tc commands failed
+        self.records = []  # ( due, dispatched ) times
+        self.stopped = Event()
+        self.thread = None
+
+    def add( self, intf, trace ):
+        """Add a trace for an interface
+           intf: TCIntf
+           trace: trace file name or [ ( time, params ) ]"""
+        if isinstance( trace, str ):
+            trace = loadTrace( trace )
+        else:
+            trace = sorted( trace, key=lambda event: event[ 0 ] )
+        self.traces[ intf ] = trace
+
+    def schedule( self ):
+        """Compute the tc commands for all of our traces
+           returns: [ ( time, { node: [ lines ] },
+                        [ ( intf, params, cmds ) ] ) ] sorted by time"""
+        changes = {}  # time -> [ ( intf, params ) ]
+        for intf, trace in self.traces.items():
+            params = dict( ( key, value )
+                           for key, value in intf.params.items()
+                           if key in SHAPEPARAMS )
+            for t, update in trace:
+                params = dict( params, **update )
+                changes.setdefault( t, [] ).append( ( intf, params ) )
+        # Walk through the changes, as config() would, tracking the
+        # tc commands installed on each intf
+        installed = dict( ( intf, intf.tcCmds ) for intf in self.traces )
+        events = []
+        for t in sorted( changes ):
+            lines, updates = {}, []
+            for intf, params in changes[ t ]:
+                cmds, _parent = intf.shapeCmds( **params )
+                saved, intf.tcCmds = intf.tcCmds, installed[ intf ]
+                try:
+                    tccmds = intf.tcChanges( cmds )
+                finally:
+                    intf.tcCmds = saved
+                installed[ intf ] = cmds
+                if tccmds:
+                    lines.setdefault( intf.node, [] ).extend(
+                        intf.batchLines( tccmds ) )
+                updates.append( ( intf, params, cmds ) )
+            events.append( ( t, lines, updates ) )
+        return events
+
+    def startTC( self, nodes ):
+        "Start a tc -batch process for each node"
+        for node in nodes:
+            if node in self.procs:
+                continue
+            proc = node.popen( [ 'tc', '-force', '-batch', '-' ],
+                               stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+            self.procs[ node ] = proc
+            reader = Thread( target=self.readTC, args=( node, proc ) )
+            reader.daemon = True
+            reader.start()
+            self.readers.append( reader )
+
+    def readTC( self, node, proc ):
+        "Report errors from a tc -batch process"
+        for line in iter( proc.stdout.readline, b'' ):
+            line = line.decode( 'utf-8', 'replace' )
+            error( '*** Error: %s: tc: %s' % ( node, line ) )
+            if 'Command failed' in line:
+                self.failed.add( node )
+
+    def stopTC( self ):
+        "Stop our tc -batch processes"
+        for proc in self.procs.values():
+            proc.stdin.close()
+        for proc in self.procs.values():
+            proc.wait()
+        for reader in self.readers:
+            reader.join()
+        for intf in self.traces:
+            if intf.node in self.failed:
+                # We're not sure what is installed
+                intf.invalidateTC()
+        self.procs, self.readers = {}, []
+
+    def sleepUntil( self, due ):
+        """Sleep until just before due, then spin until due
+           returns: False if we were stopped"""
+        while True:
+            remaining = due - monotonic()
+            if remaining <= 0:
+                return not self.stopped.is_set()
+            if remaining > self.spin:
+                if self.stopped.wait( remaining - self.spin ):
+                    return False
+            elif self.stopped.is_set():
+                return False
+
+    def apply( self, lines ):
+        """Send tc commands to our nodes
+           lines: { node: [ tc -batch lines ] }"""
+        for node, nodelines in lines.items():
+            stdin = self.procs[ node ].stdin
+            stdin.write( ( '\n'.join( nodelines ) + '\n' ).encode() )
+            stdin.flush()
+
+    def run( self ):
+        "Replay our traces, returning when done or stopped"
+        events = self.schedule()
+        self.startTC( set( intf.node for intf in self.traces ) )
+        self.records, self.failed = [], set()
+        info( '*** Replaying %d link changes on %d interfaces\n' %
+              ( len( events ), len( self.traces ) ) )
+        try:
+            start = monotonic()
+            for t, lines, updates in events:
+                due = start + t
+                if not self.sleepUntil( due ):
+                    break
+                self.apply( lines )
+                self.records.append( ( due, monotonic() ) )
+                for intf, params, cmds in updates:
+                    intf.tcCmds = cmds
+                    intf.params.update( params )
+        finally:
+            self.stopTC()
+        debug( 'link trace drift: %s\n' % self.stats() )
+
+    def start( self ):
+        "Replay our traces in the background"
+        self.stopped.clear()
+        self.thread = Thread( target=self.run )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def wait( self ):
+        "Wait for a background replay to finish"
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def stop( self ):
+        "Stop a background replay"
+        self.stopped.set()
+        self.wait()
+
+    def stats( self ):
+        """Return drift statistics for the last replay
+           returns: { count, mean, max, p99 } (drift in seconds)"""
+        drifts = sorted( dispatched - due
+                         for due, dispatched in self.records )
+        if not drifts:
+            return { 'count': 0, 'mean': 0, 'max': 0, 'p99': 0 }
+        p99 = drifts[ min( len( drifts ) - 1,
+                           int( .99 * len( drifts ) ) ) ]
+        return { 'count': len( drifts ),
+                 'mean': sum( drifts ) / len( drifts ),
+                 'max': drifts[ -1 ], 'p99': p99 }
+
+    def report( self ):
+        "Print drift statistics for the last replay"
+        stats = self.stats()
+        info( '*** Applied %d link changes; drift from trace: '
+              'mean %.3f ms, p99 %.3f ms, max %.3f ms\n' %
+              ( stats[ 'count' ], stats[ 'mean' ] * 1000,
+                stats[ 'p99' ] * 1000, stats[ 'max' ] * 1000 ) )
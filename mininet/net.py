@@ -101,11 +101,16 @@
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
                            Controller )
 from mininet.nodelib import NAT
-from mininet.link import Link, Intf
+from mininet.link import Link, Intf, OVSIntf
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
                            macColonHex, ipStr, ipParse, netParse, ipAdd,
-                           waitListening, BaseString )
+                           waitListening, BaseString, makeNamespaces,
+                           reactor, ipBatch, runBatches, IndexedList,
+                           waitAll, netnsPids, monotonic,
+                           runParallel )
 from mininet.term import cleanUpScreens, makeTerms
+from mininet.journal import Journal, pidResource
+from mininet.probe import FuncProbe, waitFor
 
 # Mininet version: should be consistent with README and LICENSE
 VERSION = "2.3.0d6"
@@ -118,7 +123,9 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False,
+                  pipelineStartup=False, bulkNamespaces=False,
+                  bulkLinks=False, journal=True ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -135,7 +142,16 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            autoStaticArp: set all-pairs static MAC addrs?
            autoPinCpus: pin hosts to (real) cores (requires CPULimitedHost)?
            listenPort: base listening port to open; will be incremented for
-               each additional switch in the net if inNamespace=False"""
+               each additional switch in the net if inNamespace=False
+           waitConnected: wait for switches to connect after start?
+           pipelineStartup: when building from topo, start all node
+               shells before waiting for any of them?
+           bulkNamespaces: when building from topo, create all host
+               namespaces using a single mnexec?
+           bulkLinks: when building from topo, create links using
+               ip -batch (see addLinks())?
+           journal: record the resources we create so that mn -c
+               can remove them if we crash (see mininet.journal)?"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -157,11 +173,17 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.nextCore = 0  # next core for pinning hosts to CPUs
         self.listenPort = listenPort
         self.waitConn = waitConnected
-
-        self.hosts = []
-        self.switches = []
-        self.controllers = []
-        self.links = []
+        self.pipelineStartup = pipelineStartup
+        self.bulkNamespaces = bulkNamespaces
+        self.bulkLinks = bulkLinks
+        self.journal = Journal() if journal else None
+
+        # IndexedLists allow O(1) removal of nodes and links
+        self.hosts = IndexedList()
+        self.switches = IndexedList()
+        self.controllers = IndexedList()
+        self.links = IndexedList()
+        self.linkIndex = {}  # { node1, node2 } -> links between them
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
 
@@ -173,35 +195,61 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         if topo and build:
             self.build()
 
+    @staticmethod
+    def connectedSwitches( switches ):
+        """Return the switches which are connected to a controller,
+           checking each switch class with batchConnected() in bulk
+           switches: switches to check
+           returns: list of connected switches"""
+        connected = []
+        for swclass, group in groupby(
+                sorted( switches, key=lambda s: str( type( s ) ) ), type ):
+            group = tuple( group )
+            if hasattr( swclass, 'batchConnected' ):
+                connected += swclass.batchConnected( group )
+            else:
+                connected += [ s for s in group if s.connected() ]
+        return connected
+
+    def connectionEvents( self, switches ):
+        """Return a probe whose sleep() wakes up when switches'
+           controller connections may have changed, or None"""
+        for swclass, group in groupby(
+                sorted( switches, key=lambda s: str( type( s ) ) ), type ):
+            if hasattr( swclass, 'connectionEvents' ):
+                events = swclass.connectionEvents( tuple( group ) )
+                if events:
+                    return events
+        return None
+
     def waitConnected( self, timeout=None, delay=.5 ):
-        """wait for each switch to connect to a controller,
-           up to 5 seconds
+        """wait for each switch to connect to a controller
            timeout: time to wait, or None to wait indefinitely
-           delay: seconds to sleep per iteration
+           delay: maximum seconds to sleep per iteration; we check
+               again quickly at first, backing off to delay, and
+               sooner if ovsdb tells us a connection has changed
            returns: True if all switches are connected"""
         info( '*** Waiting for switches to connect\n' )
-        time = 0
         remaining = list( self.switches )
-        while True:
-            for switch in tuple( remaining ):
-                if switch.connected():
+
+        def allConnected():
+            "Report newly connected switches; are they all connected?"
+            connected = set( self.connectedSwitches( remaining ) )
+            for switch in remaining:
+                if switch in connected:
                     info( '%s ' % switch )
-                    remaining.remove( switch )
-            if not remaining:
-                info( '\n' )
-                return True
-            if timeout is not None and time > timeout:
-                break
-            sleep( delay )
-            time += delay
-        warn( 'Timed out after %d seconds\n' % time )
+            remaining[ : ] = [ s for s in remaining if s not in connected ]
+            return not remaining
+        probe = FuncProbe( allConnected, maximum=delay,
+                           events=self.connectionEvents( remaining ) )
+        if probe.wait( timeout ):
+            info( '\n' )
+            return True
+        warn( 'Timed out after %d seconds\n' % timeout )
         for switch in remaining:
-            if not switch.connected():
-                warn( 'Warning: %s is not connected to a controller\n'
-                      % switch.name )
-            else:
-                remaining.remove( switch )
-        return not remaining
+            warn( 'Warning: %s is not connected to a controller\n'
+                  % switch.name )
+        return False
 
     def addHost( self, name, cls=None, **params ):
         """Add host.
@@ -226,6 +274,7 @@ def addHost( self, name, cls=None, **params ):
         h = cls( name, **defaults )
         self.hosts.append( h )
         self.nameToNode[ name ] = h
+        self.record( h )
         return h
 
     def delNode( self, node, nodes=None):
@@ -262,6 +311,7 @@ def addSwitch( self, name, cls=None, **params ):
             self.listenPort += 1
         self.switches.append( sw )
         self.nameToNode[ name ] = sw
+        self.record( sw )
         return sw
 
     def delSwitch( self, switch ):
@@ -287,6 +337,7 @@ def addController( self, name='c0', controller=None, **params ):
         if controller_new:  # allow controller-less setups
             self.controllers.append( controller_new )
             self.nameToNode[ name ] = controller_new
+            self.record( controller_new )
         return controller_new
 
     def delController( self, controller ):
@@ -398,17 +449,130 @@ def addLink( self, node1, node2, port1=None, port2=None,
         options.setdefault( 'addr2', self.randMac() )
         cls = self.link if cls is None else cls
         link = cls( node1, node2, **options )
-        self.links.append( link )
+        self.indexLink( link )
+        node1.closeLinkState()
+        node2.closeLinkState()
         return link
 
+    @staticmethod
+    def linkKey( node1, node2 ):
+        "Return linkIndex key for links between node1 and node2"
+        return frozenset( ( node1, node2 ) )
+
+    def indexLink( self, link ):
+        "Add link to self.links and self.linkIndex"
+        self.links.append( link )
+        key = self.linkKey( link.intf1.node, link.intf2.node )
+        self.linkIndex.setdefault( key, IndexedList() ).append( link )
+        self.record( link )
+
+    def record( self, *objects ):
+        """Record resources created by nodes or links in our journal
+           objects: nodes and/or links"""
+        if self.journal:
+            self.journal.record( chain.from_iterable(
+                obj.resources() for obj in objects ) )
+
+    def addLinks( self, linkParams ):
+        """Add links in bulk: create all of their veth pairs using a
+           single ip -batch in the root namespace, then bring their
+           interfaces up using one ip -batch per namespace. Links
+           whose class creates its own interfaces (e.g. OVSLink), or
+           which are not fast, are added one at a time by addLink().
+           linkParams: list of addLink() keyword args, e.g. from
+               topo.links( withInfo=True ); ports and intf names
+               are allocated as addLink() would allocate them
+           returns: list of links"""
+        pending = []  # ( link or None, options )
+        nextPort = {}  # node -> next free port
+        created = []  # ip link add commands
+        upCmds = {}  # node (or None for root namespace) -> commands
+        for params in linkParams:
+            options = dict( params )
+            node1, node2 = options.pop( 'node1' ), options.pop( 'node2' )
+            node1 = node1 if not isinstance( node1, BaseString ) else (
+                self[ node1 ] )
+            node2 = node2 if not isinstance( node2, BaseString ) else (
+                self[ node2 ] )
+            options.update( node1=node1, node2=node2 )
+            cls = options.pop( 'cls', None ) or self.link
+            if self.intf is not None:
+                options.setdefault( 'intf', self.intf )
+            options.setdefault( 'addr1', self.randMac() )
+            options.setdefault( 'addr2', self.randMac() )
+            # Allocate ports now, since nodes only learn of
+            # them when links are initialized below
+            for port, node in ( 'port1', node1 ), ( 'port2', node2 ):
+                if node not in nextPort:
+                    nextPort[ node ] = node.newPort()
+                if options.get( port ) is None:
+                    options[ port ] = nextPort[ node ]
+                nextPort[ node ] = max( nextPort[ node ],
+                                        options[ port ] + 1 )
+            if not ( isinstance( cls, type ) and issubclass( cls, Link )
+                     and cls.isVethLink() and options.get( 'fast', True ) ):
+                pending.append( ( None, dict( options, cls=cls ) ) )
+                continue
+            # Allocate link now so that we can ask it for intf names
+            link = cls.__new__( cls )
+            ends = []
+            for i, node in ( 1, node1 ), ( 2, node2 ):
+                name = options.get( 'intfName%d' % i ) or link.intfName(
+                    node, options[ 'port%d' % i ] )
+                options[ 'intfName%d' % i ] = name
+                addr = options[ 'addr%d' % i ]
+                ends.append( 'name %s%s%s' % (
+                    name, ' address %s' % addr if addr else '',
+                    ' netns %d' % node.pid if node.inNamespace else '' ) )
+                # Bring intf up here rather than in Intf.config()
+                key = 'params%d' % i
+                intfParams = dict( options.get( key ) or {} )
+                up = intfParams.get( 'up', True )
+                if up is True and 'up' not in options:
+                    intfParams[ 'up' ] = None
+                    upCmds.setdefault( node if node.inNamespace else None,
+                                       [] ).append( 'link set %s up' % name )
+                options[ key ] = intfParams
+            created.append( 'link add %s type veth peer %s' % tuple( ends ) )
+            pending.append( ( link, options ) )
+        if created:
+            output = ipBatch( created )
+            if output:
+                raise Exception( 'Error creating interface pairs: %s' %
+                                 output )
+        links = []
+        for link, options in pending:
+            if link is None:
+                links.append( self.addLink( **options ) )
+                continue
+            node1, node2 = options.pop( 'node1' ), options.pop( 'node2' )
+            link.__init__( node1, node2, created=True, **options )
+            self.indexLink( link )
+            node1.closeLinkState()
+            node2.closeLinkState()
+            links.append( link )
+        for node, output in runBatches( [ 'ip', '-force', '-batch', '-' ],
+                                        upCmds ).items():
+            if output:
+                error( '*** Error bringing up interfaces in %s: %s\n' %
+                       ( node or 'root namespace', output ) )
+        return links
+
     def delLink( self, link ):
         "Remove a link from this network"
+        key = self.linkKey( link.intf1.node, link.intf2.node )
+        links = self.linkIndex.get( key, () )
+        if link in links:
+            links.remove( link )
+            if not links:
+                del self.linkIndex[ key ]
         link.delete()
         self.links.remove( link )
 
     def linksBetween( self, node1, node2 ):
         "Return Links between node1 and node2"
-        return [ link for link in self.links
+        return [ link for link in self.linkIndex.get(
+                     self.linkKey( node1, node2 ), () )
                  if ( node1, node2 ) in (
                     ( link.intf1.node, link.intf2.node ),
                     ( link.intf2.node, link.intf1.node ) ) ]
@@ -435,6 +599,7 @@ def configHosts( self ):
             else:
                 # Don't configure nonexistent intf
                 host.configDefault( ip=None, mac=None )
+            host.closeLinkState()
             # You're low priority, dude!
             # BL: do we want to do this here or not?
             # May not make sense if we have CPU lmiting...
@@ -468,9 +633,26 @@ def buildFromTopo( self, topo=None ):
                 else:
                     self.addController( 'c%d' % i, cls )
 
+        # If we're pipelining startup, we don't wait for node shells
+        # to start until all of them have been launched
+        waitStart = not self.pipelineStartup
+
+        # If we're creating namespaces in bulk, hosts adopt them
+        nsHosts = [ h for h in topo.hosts()
+                    if topo.nodeInfo( h ).get( 'inNamespace', True ) ]
+        nsPids = {}
+        if self.bulkNamespaces and nsHosts:
+            info( '*** Creating %d host namespaces\n' % len( nsHosts ) )
+            nsPids = dict( zip( nsHosts, makeNamespaces( len( nsHosts ) ) ) )
+
         info( '*** Adding hosts:\n' )
         for hostName in topo.hosts():
-            self.addHost( hostName, **topo.nodeInfo( hostName ) )
+            params = topo.nodeInfo( hostName )
+            if not waitStart:
+                params = dict( params, waitStart=False )
+            if hostName in nsPids:
+                params = dict( params, nsPid=nsPids[ hostName ] )
+            self.addHost( hostName, **params )
             info( hostName + ' ' )
 
         info( '\n*** Adding switches:\n' )
@@ -480,17 +662,47 @@ def buildFromTopo( self, topo=None ):
             cls = params.get( 'cls', self.switch )
             if hasattr( cls, 'batchStartup' ):
                 params.setdefault( 'batch', True )
+            if not waitStart:
+                params = dict( params, waitStart=False )
             self.addSwitch( switchName, **params )
             info( switchName + ' ' )
 
+        if not waitStart:
+            info( '\n*** Waiting for node shells to start\n' )
+            self.waitStarted( self.hosts + self.switches )
+
         info( '\n*** Adding links:\n' )
-        for srcName, dstName, params in topo.links(
-                sort=True, withInfo=True ):
-            self.addLink( **params )
-            info( '(%s, %s) ' % ( srcName, dstName ) )
+        if self.bulkLinks:
+            for link in self.addLinks(
+                    [ params for _src, _dst, params in
+                      topo.links( sort=True, withInfo=True ) ] ):
+                info( '(%s, %s) ' % ( link.intf1.node, link.intf2.node ) )
+        else:
+            for srcName, dstName, params in topo.links(
+                    sort=True, withInfo=True ):
+                self.addLink( **params )
+                info( '(%s, %s) ' % ( srcName, dstName ) )
 
         info( '\n' )
 
+    @staticmethod
+    def waitStarted( nodes ):
+        """Wait for node shells which were started with waitStart=False,
+           using the reactor rather than waiting for each node in turn
+           nodes: nodes to wait for"""
+        fdToNode = {}
+        for node in nodes:
+            if node.shell and not node.shellStarted( block=False ):
+                fdToNode[ node.stdout.fileno() ] = node
+        while fdToNode:
+            for fd, event in reactor.wait( fdToNode ):
+                node = fdToNode[ fd ]
+                if not event & select.POLLIN:
+                    raise Exception( 'Shell for %s exited during startup'
+                                     % node )
+                if node.shellStarted( block=False ):
+                    del fdToNode[ fd ]
+
     def configureControlNetwork( self ):
         "Control net config hook: override in subclass"
         raise Exception( 'configureControlNetwork: '
@@ -520,6 +732,9 @@ def startTerms( self ):
         self.terms += makeTerms( self.controllers, 'controller' )
         self.terms += makeTerms( self.switches, 'switch' )
         self.terms += makeTerms( self.hosts, 'host' )
+        if self.journal:
+            self.journal.record( pidResource( term.pid )
+                                 for term in self.terms )
 
     def stopXterms( self ):
         "Kill each xterm."
@@ -556,11 +771,15 @@ def start( self ):
                 success = swclass.batchStartup( switches )
                 started.update( { s: s for s in success } )
         info( '\n' )
+        # Record namespaces and processes which now exist
+        self.record( *( self.controllers + self.switches + self.hosts ) )
         if self.waitConn:
             self.waitConnected()
 
-    def stop( self ):
-        "Stop the controller(s), switches and hosts"
+    def stop( self, fast=False ):
+        """Stop the controller(s), switches and hosts
+           fast: kill everything at once, skipping per-link and
+               per-node cleanup commands (see stopFast())"""
         info( '*** Stopping %i controllers\n' % len( self.controllers ) )
         for controller in self.controllers:
             info( controller.name + ' ' )
@@ -569,6 +788,9 @@ def stop( self ):
         if self.terms:
             info( '*** Stopping %i terms\n' % len( self.terms ) )
             self.stopXterms()
+        if fast:
+            self.stopFast()
+            return
         info( '*** Stopping %i links\n' % len( self.links ) )
         for link in self.links:
             info( '.' )
@@ -593,8 +815,45 @@ def stop( self ):
         for host in self.hosts:
             info( host.name + ' ' )
             host.terminate()
+        if self.journal:
+            self.journal.close()
         info( '\n*** Done\n' )
 
+    def installFlows( self, switchFlows, parallel=64 ):
+        """Install flow tables on many switches in parallel, using
+           each switch's addFlows() (e.g. one ovs-ofctl add-flows per
+           OVSSwitch), and report how long each switch took
+           switchFlows: { switch or switch name: [ flows ] }
+           parallel: maximum number of switches to program at once
+           returns: { switch: seconds } for switches which succeeded"""
+        switchFlows = [ ( self[ s ] if isinstance( s, BaseString ) else s,
+                          flows ) for s, flows in switchFlows.items() ]
+        switchFlows.sort( key=lambda item: item[ 0 ].name )
+        info( '*** Installing %d flows on %d switches\n' % (
+            sum( len( flows ) for _s, flows in switchFlows ),
+            len( switchFlows ) ) )
+
+        def install( item ):
+            "Program a switch, returning its time or error output"
+            switch, flows = item
+            start = monotonic()
+            try:
+                err = switch.addFlows( flows )
+            except Exception as e:  # pylint: disable=broad-except
+                err = '%s' % e
+            return err or monotonic() - start
+        results = runParallel( install, switchFlows, parallel )
+        times = {}
+        for ( switch, flows ), result in zip( switchFlows, results ):
+            if isinstance( result, BaseString ):
+                error( '*** Error installing flows on %s: %s\n' %
+                       ( switch, result.strip() ) )
+            else:
+                times[ switch ] = result
+                info( '%s: %d flows in %.3f s\n' %
+                      ( switch, len( flows ), result ) )
+        return times
+
     def run( self, test, *args, **kwargs ):
         "Perform a complete start/test/stop cycle."
         self.start()
@@ -611,22 +870,37 @@ def monitor( self, hosts=None, timeoutms=-1 ):
            returns: iterator which returns host, line"""
         if hosts is None:
             hosts = self.hosts
-        poller = select.poll()
-        h1 = hosts[ 0 ]  # so we can call class method fdToNode
-        for host in hosts:
-            poller.register( host.stdout )
+        fdToHost = dict( ( host.stdout.fileno(), host ) for host in hosts )
+        # Hosts which may already have complete lines buffered
+        buffered = set( host for host in hosts
+                        if host.readbuf.find( b'\n' ) >= 0 )
         while True:
-            ready = poller.poll( timeoutms )
-            for fd, event in ready:
-                host = h1.fdToNode( fd )
-                if event & select.POLLIN:
-                    line = host.readline()
-                    if line is not None:
-                        yield host, line
+            ready = reactor.wait( fdToHost, 0 if buffered else timeoutms )
+            readable = buffered.union( fdToHost[ fd ] for fd, event in ready
+                                       if event & select.POLLIN )
+            buffered = set()
+            for host in readable:
+                line = host.readline()
+                if line is not None:
+                    yield host, line
+                    if host.readbuf.find( b'\n' ) >= 0:
+                        buffered.add( host )
             # Return if non-blocking
-            if not ready and timeoutms >= 0:
+            if not readable and timeoutms >= 0:
                 yield None, None
 
+    def gather( self, cmd, hosts=None ):
+        """Return a coroutine which sends a command to a set of hosts
+           (or all hosts by default) concurrently and returns their
+           output (Python 3 only; see mininet.aio)
+           cmd: command string
+           hosts: (optional) list of hosts
+           returns: coroutine returning dict of host to output"""
+        from mininet.aio import gather
+        if hosts is None:
+            hosts = self.hosts
+        return gather( hosts, cmd )
+
     # XXX These test methods should be moved out of this class.
     # Probably we should create a tests.py for them
 
@@ -842,6 +1116,67 @@ def iperf( self, hosts=None, l4Type='TCP', udpBw='10M', fmt=None,
         output( '*** Results: %s\n' % result )
         return result
 
+    def stopFast( self ):
+        """Stop switches and hosts quickly (e.g. for large networks):
+           delete OVS bridges in one transaction per switch class,
+           delete only the veth pairs that live entirely in the root
+           namespace (the others go away with their namespaces) with
+           one ip -batch, then kill every node at once and reap them
+           concurrently"""
+        info( '*** Stopping %i switches\n' % len( self.switches ) )
+        stopped, rootLinks = set(), []
+        for swclass, switches in groupby(
+                sorted( self.switches,
+                        key=lambda s: str( type( s ) ) ), type ):
+            switches = tuple( switches )
+            if hasattr( swclass, 'batchDelete' ):
+                swclass.batchDelete( switches )
+                rootLinks += [ 'link del %s' % s for s in switches
+                               if getattr( s, 'datapath', None ) == 'user' ]
+            else:
+                for switch in switches:
+                    switch.stop()
+                    stopped.add( switch )
+        info( '*** Deleting links in root namespace\n' )
+        for link in self.links:
+            intf1, intf2 = link.intf1, link.intf2
+            if ( intf1 and intf2 and
+                 not isinstance( intf1, OVSIntf ) and
+                 not isinstance( intf2, OVSIntf ) and
+                 not intf1.node.inNamespace and
+                 not intf2.node.inNamespace ):
+                rootLinks.append( 'link del %s' % intf1 )
+        if rootLinks:
+            output = ipBatch( rootLinks )
+            if output:
+                debug( '*** stopFast: %s\n' % output )
+        nodes = [ node for node in chain( self.switches, self.hosts )
+                  if node not in stopped ]
+        info( '*** Killing %i nodes\n' % len( nodes ) )
+        # Find processes in node namespaces with one scan of /proc
+        nsPids = netnsPids() if any(
+            node.inNamespace for node in nodes ) else {}
+        shells = []
+        for node in nodes:
+            if not node.shell:
+                continue
+            shells.append( node.shell )
+            if not node.inNamespace:
+                # Let the shell pass SIGHUP on to its jobs
+                node.kill( sig=signal.SIGHUP )
+                continue
+            try:
+                ns = os.readlink( '/proc/%d/ns/net' % node.pid )
+            except OSError:
+                ns = None
+            node.kill( nsPids.get( ns, () ) )
+        waitAll( shells )
+        for node in nodes:
+            node.cleanup()
+        if self.journal:
+            self.journal.close()
+        info( '*** Done\n' )
+
     def runCpuLimitTest( self, cpu, duration=5 ):
         """run CPU limit test with 'while true' processes.
         cpu: desired CPU fraction of each host
@@ -858,8 +1193,8 @@ def runCpuLimitTest( self, cpu, duration=5 ):
         for h in hosts:
             pids[ h ] = []
             for _core in range( num_procs ):
-                h.cmd( 'while true; do a=1; done &' )
-                pids[ h ].append( h.cmd( 'echo $!' ).strip() )
+                result = h.run( 'while true; do a=1; done &' )
+                pids[ h ].append( result.pid )
         outputs = {}
         time = {}
         # get the initial cpu time for each host
@@ -974,10 +1309,12 @@ def configureRoutedControlNetwork( self, ip='192.168.123.1',
         info( controller.name + ' <->' )
         cip = ip
         snum = ipParse( ip )
+        intfs = []
         for switch in self.switches:
             info( ' ' + switch.name )
             link = self.link( switch, controller, port1=0 )
             sintf, cintf = link.intf1, link.intf2
+            intfs += [ sintf, cintf ]
             switch.controlIntf = sintf
             snum += 1
             while snum & 0xff in [ 0, 255 ]:
@@ -989,13 +1326,11 @@ def configureRoutedControlNetwork( self, ip='192.168.123.1',
             switch.setHostRoute( cip, sintf )
         info( '\n' )
         info( '*** Testing control network\n' )
-        while not cintf.isUp():
-            info( '*** Waiting for', cintf, 'to come up\n' )
-            sleep( 1 )
+        for intf in intfs:
+            if not intf.isUp():
+                info( '*** Waiting for', intf, 'to come up\n' )
+                waitFor( intf.isUp, maximum=1 )
         for switch in self.switches:
-            while not sintf.isUp():
-                info( '*** Waiting for', sintf, 'to come up\n' )
-                sleep( 1 )
             if self.ping( hosts=[ switch, controller ] ) != 0:
                 error( '*** Error: control network test failed\n' )
                 exit( 1 )
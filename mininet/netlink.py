@@ -0,0 +1,611 @@
+"""
+netlink.py: native rtnetlink client for Mininet
+
+Interface setup normally runs ip or ifconfig, either in a node's shell
+or via quietRun(), so building a large network costs tens of thousands
+of process spawns. This module instead talks rtnetlink directly, over
+a netlink socket opened inside the node's network namespace:
+
+    nl = Netlink( pid )  # or Netlink() for our own namespace
+    nl.addVeth( 'h1-eth0', 's1-eth1', pid2=switchPid )
+    nl.setAddr( 'h1-eth0', '10.0.0.1', 8 )
+    nl.setLink( 'h1-eth0', up=True )
+
+Netlink: rtnetlink socket in a network namespace
+
+LinkCache: links and addresses in a network namespace, kept
+    current by rtnetlink notifications
+
+NetlinkError: error (errno) returned by the kernel
+
+Node.netlinkSocket() returns a cached Netlink for a node, and
+link.NetlinkIntf and link.NetlinkLink use it to configure interfaces
+and create veth pairs, falling back to ip/ifconfig if netlink is not
+available. Node.linkState() returns a cached LinkCache, which
+Intf uses to look up its state without running ifconfig.
+"""
+
+import errno
+import os
+import socket
+import struct
+from threading import Lock
+
+
+# Kernel constants (linux/netlink.h, linux/rtnetlink.h, linux/if_link.h)
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+NLM_F_REPLACE = 0x100
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_SETLINK = 19
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_LINKINFO = 18
+IFLA_NET_NS_PID = 19
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+VETH_INFO_PEER = 1
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_BROADCAST = 4
+
+RTA_DST = 1
+RTA_OIF = 4
+
+IFF_UP = 0x1
+
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3fff
+
+RT_TABLE_MAIN = 254
+RTPROT_BOOT = 3
+RT_SCOPE_UNIVERSE = 0
+RT_SCOPE_LINK = 253
+RTN_UNICAST = 1
+
+CLONE_NEWNET = 0x40000000
+
+# Message headers: nlmsghdr, ifinfomsg, ifaddrmsg, rtmsg, rtattr
+nlmsghdr = struct.Struct( 'IHHII' )
+ifinfomsg = struct.Struct( 'BxHiII' )
+ifaddrmsg = struct.Struct( 'BBBBI' )
+rtmsg = struct.Struct( 'BBBBBBBBI' )
+rtattr = struct.Struct( 'HH' )
+
+
+class NetlinkError( OSError ):
+    "Error returned by the kernel in response to a netlink request"
+    pass
+
+
+# Attribute encoding and decoding
+
+def align( size ):
+    "Round size up to netlink's 4-byte alignment"
+    return ( size + 3 ) & ~3
+
+def attr( kind, data ):
+    """Encode a netlink attribute.
+       kind: attribute type
+       data: payload (bytes)"""
+    size = rtattr.size + len( data )
+    return ( rtattr.pack( size, kind ) + data +
+             b'\0' * ( align( size ) - size ) )
+
+def strAttr( kind, s ):
+    "Encode a NUL-terminated string attribute"
+    return attr( kind, s.encode() + b'\0' )
+
+def nestAttr( kind, *attrs ):
+    "Encode a nested attribute containing attrs"
+    return attr( kind | NLA_F_NESTED, b''.join( attrs ) )
+
+def parseAttrs( data, offset=0 ):
+    """Decode a sequence of netlink attributes.
+       data: message payload (bytes)
+       offset: offset of first attribute
+       returns: dict of attribute type to payload (bytes)"""
+    attrs = {}
+    while offset + rtattr.size <= len( data ):
+        size, kind = rtattr.unpack_from( data, offset )
+        if size < rtattr.size:
+            break
+        attrs[ kind & NLA_TYPE_MASK ] = data[ offset + rtattr.size:
+                                              offset + size ]
+        offset += align( size )
+    return attrs
+
+def macBytes( mac ):
+    "Convert MAC address string to bytes"
+    return bytes( bytearray( int( b, 16 ) for b in mac.split( ':' ) ) )
+
+def macStr( data ):
+    "Convert MAC address bytes to string"
+    return ':'.join( '%02x' % b for b in bytearray( data ) )
+
+def ipBroadcast( ip, prefixLen ):
+    "Return broadcast address of ip/prefixLen as bytes, as ifconfig does"
+    num = struct.unpack( '!I', socket.inet_aton( ip ) )[ 0 ]
+    hostMask = ( 1 << ( 32 - prefixLen ) ) - 1
+    return struct.pack( '!I', num | hostMask )
+
+def parseMsgs( data ):
+    """Decode the netlink messages in a datagram.
+       data: received data (bytes)
+       yields: kind, flags, seq, payload"""
+    offset = 0
+    while offset + nlmsghdr.size <= len( data ):
+        size, kind, flags, seq, _pid = nlmsghdr.unpack_from( data, offset )
+        if size < nlmsghdr.size:
+            break
+        yield kind, flags, seq, data[ offset + nlmsghdr.size: offset + size ]
+        offset += align( size )
+
+def checkError( payload ):
+    "Raise NetlinkError if a NLMSG_ERROR payload reports an error"
+    err = -struct.unpack_from( 'i', payload )[ 0 ]
+    if err:
+        raise NetlinkError( err, os.strerror( err ) )
+
+def parseLink( payload ):
+    """Decode a RTM_NEWLINK or RTM_DELLINK message
+       returns: dict with index, name, flags, up, mac and mtu"""
+    _family, _kind, index, flags, _change = ifinfomsg.unpack_from( payload )
+    attrs = parseAttrs( payload, ifinfomsg.size )
+    mtu = attrs.get( IFLA_MTU )
+    return { 'index': index,
+             'name': attrs.get( IFLA_IFNAME, b'' ).rstrip( b'\0' ).decode(),
+             'flags': flags, 'up': bool( flags & IFF_UP ),
+             'mac': ( macStr( attrs[ IFLA_ADDRESS ] )
+                      if IFLA_ADDRESS in attrs else None ),
+             'mtu': struct.unpack( 'I', mtu )[ 0 ] if mtu else None }
+
+def parseAddr( payload ):
+    """Decode a RTM_NEWADDR or RTM_DELADDR message
+       returns: index, ip, prefixLen, or None if not IPv4"""
+    family, prefixLen, _flags, _scope, index = ifaddrmsg.unpack_from(
+        payload )
+    attrs = parseAttrs( payload, ifaddrmsg.size )
+    addr = attrs.get( IFA_LOCAL, attrs.get( IFA_ADDRESS ) )
+    if family != socket.AF_INET or not addr:
+        return None
+    return index, socket.inet_ntoa( addr ), prefixLen
+
+
+# Namespace support
+
+def setns( fd ):
+    """Move the calling thread into a network namespace.
+       fd: open namespace file (/proc/<pid>/ns/net)"""
+    if hasattr( os, 'setns' ):
+        os.setns( fd, CLONE_NEWNET )
+        return
+    import ctypes
+    libc = ctypes.CDLL( None, use_errno=True )
+    if libc.setns( fd, CLONE_NEWNET ) != 0:
+        err = ctypes.get_errno()
+        raise OSError( err, os.strerror( err ) )
+
+def nsOpen( pid, family, kind, proto=0 ):
+    """Open a socket in the network namespace of a process.
+       A socket stays in the namespace it was created in,
+       so we only need to visit the namespace briefly.
+       pid: process id, or None for our own namespace
+       family, kind, proto: as for socket.socket()"""
+    ours = theirs = None
+    try:
+        if pid is not None:
+            ours = os.open( '/proc/thread-self/ns/net', os.O_RDONLY )
+            theirs = os.open( '/proc/%d/ns/net' % pid, os.O_RDONLY )
+            setns( theirs )
+        try:
+            sock = socket.socket( family, kind, proto )
+        finally:
+            if theirs is not None:
+                setns( ours )
+    finally:
+        for fd in ours, theirs:
+            if fd is not None:
+                os.close( fd )
+    return sock
+
+def nsSocket( pid, groups=0 ):
+    """Open a rtnetlink socket in the network namespace of a process.
+       pid: process id, or None for our own namespace
+       groups: multicast groups to subscribe to"""
+    sock = nsOpen( pid, socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE )
+    sock.bind( ( 0, groups ) )
+    return sock
+
+
+class Netlink( object ):
+    """rtnetlink socket in a network namespace, with methods to
+       create and configure links, addresses and routes.
+       Methods identify links by name and raise NetlinkError
+       on failure."""
+
+    recvSize = 65536
+
+    def __init__( self, pid=None, groups=0 ):
+        """pid: pid of process in namespace (None for our own)
+           groups: multicast groups to subscribe to"""
+        self.pid = pid
+        self.sock = nsSocket( pid, groups )
+        self.seq = 0
+        self.lock = Lock()
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+    def fileno( self ):
+        "Return our socket's file descriptor"
+        return self.sock.fileno()
+
+    def request( self, kind, body, flags=0 ):
+        """Send a request and wait for its reply.
+           kind: message type (e.g. RTM_NEWLINK)
+           body: message payload (bytes)
+           flags: flags in addition to NLM_F_REQUEST and NLM_F_ACK
+           returns: list of payloads of reply messages"""
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            flags |= NLM_F_REQUEST | NLM_F_ACK
+            self.sock.send( nlmsghdr.pack( nlmsghdr.size + len( body ),
+                                           kind, flags, seq, 0 ) + body )
+            replies = []
+            while True:
+                data = self.sock.recv( self.recvSize )
+                for rkind, rflags, rseq, payload in parseMsgs( data ):
+                    if rseq != seq:
+                        continue
+                    if rkind == NLMSG_ERROR:
+                        checkError( payload )
+                        return replies
+                    if rkind == NLMSG_DONE:
+                        return replies
+                    replies.append( payload )
+                    if not rflags & NLM_F_MULTI:
+                        return replies
+
+    # Links
+
+    def getLink( self, name ):
+        """Look up a link.
+           name: interface name
+           returns: link dict (see parseLink())"""
+        replies = self.request( RTM_GETLINK, ifinfomsg.pack(
+            socket.AF_UNSPEC, 0, 0, 0, 0 ) + strAttr( IFLA_IFNAME, name ) )
+        return parseLink( replies[ 0 ] )
+
+    def links( self ):
+        "Return list of link dicts for all links in namespace"
+        replies = self.request( RTM_GETLINK, ifinfomsg.pack(
+            socket.AF_UNSPEC, 0, 0, 0, 0 ), flags=NLM_F_DUMP )
+        return [ parseLink( payload ) for payload in replies ]
+
+    def index( self, name ):
+        "Return interface index of link"
+        return self.getLink( name )[ 'index' ]
+
+    def addVeth( self, name1, name2, addr1=None, addr2=None, pid2=None ):
+        """Create a veth pair in our namespace, optionally placing its
+           peer in another namespace.
+           name1: name for interface 1
+           name2: name for interface 2
+           addr1: MAC address for interface 1 (optional)
+           addr2: MAC address for interface 2 (optional)
+           pid2: pid of process in namespace for interface 2 (optional)"""
+        peer = ( ifinfomsg.pack( socket.AF_UNSPEC, 0, 0, 0, 0 ) +
+                 strAttr( IFLA_IFNAME, name2 ) )
+        if addr2:
+            peer += attr( IFLA_ADDRESS, macBytes( addr2 ) )
+        if pid2 is not None:
+            peer += attr( IFLA_NET_NS_PID, struct.pack( 'I', pid2 ) )
+        body = ( ifinfomsg.pack( socket.AF_UNSPEC, 0, 0, 0, 0 ) +
+                 strAttr( IFLA_IFNAME, name1 ) )
+        if addr1:
+            body += attr( IFLA_ADDRESS, macBytes( addr1 ) )
+        body += nestAttr( IFLA_LINKINFO,
+                          strAttr( IFLA_INFO_KIND, 'veth' ),
+                          nestAttr( IFLA_INFO_DATA,
+                                    attr( VETH_INFO_PEER, peer ) ) )
+        self.request( RTM_NEWLINK, body, flags=NLM_F_CREATE | NLM_F_EXCL )
+
+    def delLink( self, name ):
+        "Delete a link"
+        self.request( RTM_DELLINK, ifinfomsg.pack(
+            socket.AF_UNSPEC, 0, 0, 0, 0 ) + strAttr( IFLA_IFNAME, name ) )
+
+    def setLink( self, name, up=None, mac=None, newName=None, pid=None ):
+        """Change a link's settings; note that the kernel may refuse
+           to change the MAC address or name of a link which is up
+           name: interface name
+           up: bring link up (True) or down (False) (optional)
+           mac: new MAC address (optional)
+           newName: new interface name (optional)
+           pid: move link to namespace of this process (optional)"""
+        flags = change = 0
+        if up is not None:
+            change = IFF_UP
+            flags = IFF_UP if up else 0
+        # The kernel finds the link by name unless we give its index,
+        # which we need to do if we are renaming it
+        index = self.index( name ) if newName else 0
+        body = ( ifinfomsg.pack( socket.AF_UNSPEC, 0, index, flags,
+                                 change ) +
+                 strAttr( IFLA_IFNAME, newName or name ) )
+        if mac:
+            body += attr( IFLA_ADDRESS, macBytes( mac ) )
+        if pid is not None:
+            body += attr( IFLA_NET_NS_PID, struct.pack( 'I', pid ) )
+        self.request( RTM_SETLINK, body )
+
+    # Addresses
+
+    def addrs( self, name=None ):
+        """Return IPv4 addresses in namespace
+           name: only return addresses of this interface (optional)
+           returns: list of ( index, ip, prefixLen )"""
+        index = self.index( name ) if name else None
+        replies = self.request( RTM_GETADDR, ifaddrmsg.pack(
+            socket.AF_INET, 0, 0, 0, 0 ), flags=NLM_F_DUMP )
+        result = []
+        for payload in replies:
+            addr = parseAddr( payload )
+            if addr and ( index is None or addr[ 0 ] == index ):
+                result.append( addr )
+        return result
+
+    def addrMsg( self, index, ip, prefixLen, broadcast=False ):
+        "Internal method: return ifaddrmsg and attributes for address"
+        body = ( ifaddrmsg.pack( socket.AF_INET, prefixLen, 0,
+                                 RT_SCOPE_UNIVERSE, index ) +
+                 attr( IFA_LOCAL, socket.inet_aton( ip ) ) +
+                 attr( IFA_ADDRESS, socket.inet_aton( ip ) ) )
+        if broadcast and prefixLen < 31:
+            body += attr( IFA_BROADCAST, ipBroadcast( ip, prefixLen ) )
+        return body
+
+    def setAddr( self, name, ip, prefixLen ):
+        """Replace a link's IPv4 addresses with ip/prefixLen,
+           as ifconfig does
+           name: interface name
+           ip: IP address as dotted decimal
+           prefixLen: prefix length"""
+        index = self.index( name )
+        for aindex, aip, aprefixLen in self.addrs():
+            if aindex == index:
+                self.request( RTM_DELADDR,
+                              self.addrMsg( index, aip, aprefixLen ) )
+        self.request( RTM_NEWADDR,
+                      self.addrMsg( index, ip, int( prefixLen ),
+                                    broadcast=True ),
+                      flags=NLM_F_CREATE | NLM_F_REPLACE )
+
+    # Routes
+
+    def addRoute( self, dst, prefixLen, name ):
+        """Add a directly connected route, as route add -host does
+           dst: destination IP address as dotted decimal
+           prefixLen: prefix length of destination
+           name: interface name"""
+        body = ( rtmsg.pack( socket.AF_INET, int( prefixLen ), 0, 0,
+                             RT_TABLE_MAIN, RTPROT_BOOT, RT_SCOPE_LINK,
+                             RTN_UNICAST, 0 ) +
+                 attr( RTA_DST, socket.inet_aton( dst ) ) +
+                 attr( RTA_OIF, struct.pack( 'I', self.index( name ) ) ) )
+        self.request( RTM_NEWROUTE, body, flags=NLM_F_CREATE | NLM_F_EXCL )
+
+
+class LinkCache( object ):
+    """Cache of the links and IPv4 addresses in a network namespace,
+       kept current by rtnetlink notifications, including for changes
+       made outside Mininet. Each lookup first applies any pending
+       notifications, so results are never stale, and a lookup costs
+       a non-blocking recv() rather than a process."""
+
+    groups = RTMGRP_LINK | RTMGRP_IPV4_IFADDR
+    recvSize = 65536
+    rcvbuf = 1 << 20  # socket buffer; if it overflows, we resync
+
+    def __init__( self, pid=None ):
+        "pid: pid of process in namespace (None for our own)"
+        self.pid = pid
+        self.sock = nsSocket( pid, self.groups )
+        try:
+            self.sock.setsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                  self.rcvbuf )
+        except socket.error:
+            pass
+        self.seq = 0
+        self.lock = Lock()
+        self.byName = {}  # name -> link dict (see parseLink())
+        self.byIndex = {}  # index -> link dict
+        self.addrsByIndex = {}  # index -> [ ( ip, prefixLen ) ]
+        with self.lock:
+            self.sync()
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+    def fileno( self ):
+        "Return our socket's file descriptor"
+        return self.sock.fileno()
+
+    def handle( self, kind, payload ):
+        """Internal method: apply a notification or dump reply
+           kind: message type
+           payload: message payload"""
+        if kind in ( RTM_NEWLINK, RTM_DELLINK ):
+            link = parseLink( payload )
+            old = self.byIndex.pop( link[ 'index' ], None )
+            if old:
+                self.byName.pop( old[ 'name' ], None )
+            if kind == RTM_NEWLINK:
+                self.byIndex[ link[ 'index' ] ] = link
+                self.byName[ link[ 'name' ] ] = link
+            else:
+                self.addrsByIndex.pop( link[ 'index' ], None )
+        elif kind in ( RTM_NEWADDR, RTM_DELADDR ):
+            addr = parseAddr( payload )
+            if not addr:
+                return
+            index, entry = addr[ 0 ], addr[ 1: ]
+            addrs = self.addrsByIndex.setdefault( index, [] )
+            if kind == RTM_NEWADDR and entry not in addrs:
+                addrs.append( entry )
+            elif kind == RTM_DELADDR and entry in addrs:
+                addrs.remove( entry )
+
+    def dump( self, kind, body ):
+        """Internal method: request a dump, and apply its replies along
+           with any notifications, in the order they arrive
+           kind: message type (e.g. RTM_GETLINK)
+           body: message payload"""
+        self.seq += 1
+        seq = self.seq
+        self.sock.send( nlmsghdr.pack( nlmsghdr.size + len( body ), kind,
+                                       NLM_F_REQUEST | NLM_F_DUMP, seq, 0 )
+                        + body )
+        while True:
+            for rkind, _flags, rseq, payload in parseMsgs(
+                    self.sock.recv( self.recvSize ) ):
+                if rseq == seq and rkind == NLMSG_DONE:
+                    return
+                if rkind == NLMSG_ERROR:
+                    if rseq == seq:
+                        checkError( payload )
+                        return
+                    continue
+                self.handle( rkind, payload )
+
+    def sync( self ):
+        """Internal method: discard pending notifications and reload
+           all state from the kernel; call with lock held"""
+        while True:
+            self.drain( apply=False )
+            self.byName.clear()
+            self.byIndex.clear()
+            self.addrsByIndex.clear()
+            try:
+                self.dump( RTM_GETLINK,
+                           ifinfomsg.pack( socket.AF_UNSPEC, 0, 0, 0, 0 ) )
+                self.dump( RTM_GETADDR,
+                           ifaddrmsg.pack( socket.AF_INET, 0, 0, 0, 0 ) )
+                return
+            except socket.error as e:
+                # Notifications were lost during the dump
+                if e.errno != errno.ENOBUFS:
+                    raise
+
+    def drain( self, apply=True ):
+        """Internal method: read pending notifications without
+           blocking; call with lock held
+           apply: apply notifications (or discard them)
+           returns: False if notifications were lost, else True"""
+        while True:
+            try:
+                data = self.sock.recv( self.recvSize, socket.MSG_DONTWAIT )
+            except socket.error as e:
+                if e.errno in ( errno.EAGAIN, errno.EWOULDBLOCK ):
+                    return True
+                if e.errno == errno.ENOBUFS:
+                    if not apply:
+                        continue
+                    return False
+                raise
+            if apply:
+                for kind, _flags, _seq, payload in parseMsgs( data ):
+                    self.handle( kind, payload )
+
+    def update( self ):
+        "Apply pending notifications, resyncing if any were lost"
+        with self.lock:
+            if not self.drain():
+                self.sync()
+
+    def link( self, name ):
+        """Look up a link
+           name: interface name
+           returns: link dict (see parseLink()), or None"""
+        self.update()
+        return self.byName.get( name )
+
+    def links( self ):
+        "Return list of link dicts for all links in namespace"
+        self.update()
+        return list( self.byIndex.values() )
+
+    def addrs( self, name ):
+        """Look up a link's IPv4 addresses
+           name: interface name
+           returns: list of ( ip, prefixLen )"""
+        link = self.link( name )
+        if not link:
+            return []
+        return list( self.addrsByIndex.get( link[ 'index' ], [] ) )
+
+
+# Shared sockets for our own namespace
+
+_rootNetlink = None
+
+def rootNetlink():
+    """Return a shared Netlink for our own (usually root) namespace,
+       or None if netlink is unavailable"""
+    global _rootNetlink  # pylint: disable=global-statement
+    if _rootNetlink is None:
+        try:
+            _rootNetlink = Netlink()
+        except ( OSError, IOError, socket.error ):
+            _rootNetlink = False
+    return _rootNetlink or None
+
+_rootLinkCache = None
+
+def rootLinkCache():
+    """Return a shared LinkCache for our own (usually root) namespace,
+       or None if netlink is unavailable"""
+    global _rootLinkCache  # pylint: disable=global-statement
+    if _rootLinkCache is None:
+        try:
+            _rootLinkCache = LinkCache()
+        except ( OSError, IOError, socket.error ):
+            _rootLinkCache = False
+    return _rootLinkCache or None
+
+def ignoreMissing( fn, *args, **kwargs ):
+    """Call fn, ignoring errors for links which do not exist
+       returns: fn's result, or None"""
+    try:
+        return fn( *args, **kwargs )
+    except NetlinkError as e:
+        if e.errno not in ( errno.ENODEV, errno.ENOENT ):
+            raise
+    return None
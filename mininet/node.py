@@ -15,6 +15,10 @@
     hosts share the root file system, but they may also specify private
     directories.
 
+NamespaceHost: a lightweight virtual host with no shell; its namespaces
+    are held open by an idle mnexec process, and each command is run in
+    a short-lived process.
+
 CPULimitedHost: a virtual host whose CPU bandwidth is limited by
     RT or CFS bandwidth limiting.
 
@@ -52,23 +56,90 @@
 - Create proxy objects for remote nodes (Mininet: Cluster Edition)
 """
 
+import json
 import os
 import pty
 import re
 import signal
 import select
-from subprocess import Popen, PIPE
+from collections import deque
+from subprocess import Popen, PIPE, STDOUT
+from tempfile import SpooledTemporaryFile
+from threading import Lock
 from time import sleep
 
 from mininet.log import info, error, warn, debug
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
                            numCores, retry, mountCgroups, BaseString, decode,
-                           encode, getincrementaldecoder, Python3, which )
+                           encode, getincrementaldecoder, Python3, which,
+                           ReadBuffer, reactor, runParallel )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
-from mininet.link import Link, Intf, TCIntf, OVSIntf
+from mininet.link import ( Link, Intf, TCIntf, OVSIntf, OVSPortIntf,
+                           overwrittenTC, moveOVSInternalIntfs )
+from mininet.netlink import Netlink, LinkCache, rootNetlink, rootLinkCache
+from mininet.journal import pidResource, netnsResource
+from mininet.probe import FileProbe, OVSDBProbe, tcpConnect
+from mininet.ovsdb import ( OVSDBError, localOVSDB, reconfigure,
+                            namedUUID, ovsSet, ovsMap, setMembers )
 from re import findall
 from distutils.version import StrictVersion
 
+class CmdResult( object ):
+    """Result of a command run using Node.run()
+       stdout: command output
+       stderr: command error output
+       status: exit status (0 for background commands)
+       pid: pid of background command, or None"""
+
+    def __init__( self, stdout='', stderr='', status=None, pid=None ):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.status = status
+        self.pid = pid
+
+    def __repr__( self ):
+        return '<CmdResult status=%s pid=%s stdout=%r stderr=%r>' % (
+            self.status, self.pid, self.stdout, self.stderr )
+
+
+class CmdFuture( object ):
+    """Pending output of a command queued using Node.queueCmd()
+       cmd: command string
+       pid: pid of background command, or None"""
+
+    def __init__( self, node, cmd ):
+        self.node = node
+        self.cmd = cmd
+        self.pid = None
+        self.chunks = []
+        self.output = None
+
+    def done( self ):
+        "Return True if the command has completed"
+        return self.output is not None
+
+    def finish( self, pid=None ):
+        "Internal method: mark command as completed"
+        self.output = ''.join( self.chunks )
+        if pid:
+            # suppress the job and PID of a backgrounded command
+            self.output = re.sub( r'\[\d+\] \d+\r\n', '', self.output )
+        self.chunks = None
+        self.pid = pid
+
+    def result( self ):
+        """Wait for the command (and any commands queued before it)
+           to complete.
+           returns: output of command"""
+        if not self.done():
+            self.node.waitQueue( self )
+        return self.output
+
+    def __repr__( self ):
+        return '<CmdFuture %s: %r%s>' % ( self.node, self.cmd,
+                                          ' done' if self.done() else '' )
+
+
 class Node( object ):
     """A virtual network node is simply a shell in a network namespace.
        We communicate with it using pipes."""
@@ -79,6 +150,10 @@ def __init__( self, name, inNamespace=True, **params ):
         """name: name of node
            inNamespace: in network namespace?
            privateDirs: list of private directory strings or tuples
+           forkServer: start a fork server for popen()? (False)
+           nsPid: pid of process whose namespaces we should adopt
+               (e.g. from util.makeNamespaces()) instead of creating
+               our own (optional)
            params: Node parameters (see config() for details)"""
 
         # Make sure class actually works
@@ -91,6 +166,12 @@ def __init__( self, name, inNamespace=True, **params ):
         # Python 3 complains if we don't wait for shell exit
         self.waitExited = params.get( 'waitExited', Python3 )
 
+        # Wait for shell prompt in startShell(), or defer until later
+        self.waitStart = params.get( 'waitStart', True )
+
+        # Holder of namespaces to adopt (see util.makeNamespaces())
+        self.nsPid = params.get( 'nsPid' )
+
         # Stash configuration parameters for future reference
         self.params = params
 
@@ -98,21 +179,30 @@ def __init__( self, name, inNamespace=True, **params ):
         self.ports = {}  # dict of interfaces to port numbers
                          # replace with Port objects, eventually ?
         self.nameToIntf = {}  # dict of interface names to Intfs
+        self.lastPort = None  # highest port allocated so far
 
         # Make pylint happy
         ( self.shell, self.execed, self.pid, self.stdin, self.stdout,
-            self.lastPid, self.lastCmd, self.pollOut ) = (
-                None, None, None, None, None, None, None, None )
+            self.lastPid, self.lastCmd ) = (
+                None, None, None, None, None, None, None )
         self.waiting = False
-        self.readbuf = ''
+        self.readbuf = ReadBuffer()  # raw output not yet returned
+        self.cmdQueue = deque()  # CmdFutures of queued commands
+        self.cmdLock = Lock()  # protects cmdQueue and shell output
+        self.startPrompts = 0  # prompts expected before shell is ready
 
         # Incremental decoder for buffered reading
         self.decoder = getincrementaldecoder()
 
         # Start command interpreter shell
         self.master, self.slave = None, None  # pylint
+        self.forkServer = None  # optional fork server for popen()
+        self.netlink = None  # rtnetlink socket (see netlinkSocket())
+        self.linkCache = None  # link state cache (see linkState())
         self.startShell()
         self.mountPrivateDirs()
+        if params.get( 'forkServer' ):
+            self.startForkServer()
 
     # File descriptor to node mapping support
     # Class variables and methods
@@ -125,7 +215,7 @@ def fdToNode( cls, fd ):
         """Return node corresponding to given file descriptor.
            fd: file descriptor
            returns: node"""
-        node = cls.outToNode.get( fd )
+        node = reactor.owner( fd ) or cls.outToNode.get( fd )
         return node or cls.inToNode.get( fd )
 
     # Command support via shell process in namespace
@@ -137,14 +227,18 @@ def startShell( self, mnopts=None ):
         # mnexec: (c)lose descriptors, (d)etach from tty,
         # (p)rint pid, and run in (n)amespace
         opts = '-cd' if mnopts is None else mnopts
-        if self.inNamespace:
+        if self.inNamespace and not self.nsPid:
             opts += 'n'
+        cmd = [ 'mnexec', opts ]
+        if self.nsPid:
+            # (a)ttach to namespaces from makeNamespaces()
+            cmd += [ '-a', str( self.nsPid ) ]
         # bash -i: force interactive
         # -s: pass $* to shell, and make process easy to find in ps
         # prompt is set to sentinel chr( 127 )
-        cmd = [ 'mnexec', opts, 'env', 'PS1=' + chr( 127 ),
-                'bash', '--norc', '--noediting',
-                '-is', 'mininet:' + self.name ]
+        cmd += [ 'env', 'PS1=' + chr( 127 ),
+                 'bash', '--norc', '--noediting',
+                 '-is', 'mininet:' + self.name ]
 
         # Spawn a shell subprocess in a pseudo-tty, to disable buffering
         # in the subprocess and insulate it from signals (e.g. SIGINT)
@@ -157,26 +251,39 @@ def startShell( self, mnopts=None ):
         self.stdin = os.fdopen( self.master, 'r' )
         self.stdout = self.stdin
         self.pid = self.shell.pid
-        self.pollOut = select.poll()
-        self.pollOut.register( self.stdout )
         # Maintain mapping between file descriptors and nodes
         # This is useful for monitoring multiple nodes
-        # using select.poll()
+        # using select.poll() or the reactor
         self.outToNode[ self.stdout.fileno() ] = self
         self.inToNode[ self.stdin.fileno() ] = self
+        reactor.register( self.stdout.fileno(), owner=self )
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
-        self.readbuf = ''
-        # Wait for prompt
-        while True:
-            data = self.read( 1024 )
-            if data[ -1 ] == chr( 127 ):
-                break
-            self.pollOut.poll()
+        self.readbuf.clear()
         self.waiting = False
         # +m: disable job control notification
-        self.cmd( 'unset HISTFILE; stty -echo; set +m' )
+        # PS2: no continuation prompts in output of multiline commands
+        # We send this before the shell is up, so that it is pipelined
+        # with shell startup; the shell is ready after the initial
+        # prompt and the prompt which follows this command.
+        self.write( "unset HISTFILE; stty -echo; set +m; PS2=''\n" )
+        self.startPrompts = 2
+        if self.waitStart:
+            self.shellStarted()
+
+    def shellStarted( self, block=True ):
+        """Consume startup output from our shell.
+           block: wait until the shell is ready (True)
+           returns: True if the shell is ready for commands"""
+        while self.startPrompts > 0:
+            if not block and not self.waitReadable( 0 ):
+                return False
+            self.fillbuf()
+            self.startPrompts -= self.readbuf.count( self.sentinel )
+            self.readbuf.clear()
+        self.decoder = getincrementaldecoder()
+        return True
 
     def mountPrivateDirs( self ):
         "mount private directories"
@@ -221,8 +328,11 @@ def cleanup( self ):
         # for intfName in self.intfNames():
         # if self.name in intfName:
         # quietRun( 'ip link del ' + intfName )
+        self.stopForkServer()
+        self.closeNetlink()
         if self.shell:
             # Close ptys
+            reactor.unregister( self.stdout.fileno() )
             self.stdin.close()
             os.close(self.slave)
             if self.waitExited:
@@ -232,31 +342,41 @@ def cleanup( self ):
 
     # Subshell I/O, commands and control
 
+    # Output is scanned for the sentinel and pid markers as raw bytes;
+    # neither can appear inside a multibyte UTF-8 character
+
+    sentinel = b'\x7f'
+    pidMarker = b'\x01'
+    pidRe = re.compile( b'\x01(\\d+)\r\n' )
+    jobRe = re.compile( b'\\[\\d+\\] \\d+\r\n' )
+
+    def fillbuf( self ):
+        """Internal method: read available output into readbuf,
+           potentially blocking.
+           returns: number of bytes read"""
+        fd = self.stdout.fileno()
+        count = self.readbuf.fill( fd )
+        reactor.consume( fd )
+        return count
+
     def read( self, size=1024 ):
         """Buffered read from node, potentially blocking.
            size: maximum number of characters to return"""
-        count = len( self.readbuf )
-        if count < size:
-            data = os.read( self.stdout.fileno(), size - count )
-            self.readbuf += self.decoder.decode( data )
-        if size >= len( self.readbuf ):
-            result = self.readbuf
-            self.readbuf = ''
-        else:
-            result = self.readbuf[ :size ]
-            self.readbuf = self.readbuf[ size: ]
-        return result
+        if not self.readbuf:
+            self.fillbuf()
+        return self.decoder.decode( self.readbuf.take( size ) )
 
     def readline( self ):
         """Buffered readline from node, potentially blocking.
            returns: line (minus newline) or None"""
-        self.readbuf += self.read( 1024 )
-        if '\n' not in self.readbuf:
-            return None
-        pos = self.readbuf.find( '\n' )
-        line = self.readbuf[ 0: pos ]
-        self.readbuf = self.readbuf[ pos + 1: ]
-        return line
+        pos = self.readbuf.find( b'\n' )
+        if pos < 0:
+            self.fillbuf()
+            pos = self.readbuf.find( b'\n' )
+            if pos < 0:
+                return None
+        line = self.decoder.decode( self.readbuf.take( pos + 1 ) )
+        return line[ :-1 ]
 
     def write( self, data ):
         """Write data to node.
@@ -268,9 +388,64 @@ def terminate( self ):
         self.unmountPrivateDirs()
         if self.shell:
             if self.shell.poll() is None:
+                self.removeErrFile()
                 os.killpg( self.shell.pid, signal.SIGHUP )
+        if self.nsPid:
+            # Our namespaces go away with their holder
+            try:
+                os.kill( self.nsPid, signal.SIGKILL )
+            except OSError:
+                pass
         self.cleanup()
 
+    def kill( self, pids=(), sig=signal.SIGKILL ):
+        """Kill our shell's process group (and namespace holder),
+           without waiting for them or cleaning up; see
+           Mininet.stop( fast=True )
+           pids: other processes to kill (e.g. in our namespace)
+           sig: signal for our shell's process group (SIGKILL)"""
+        if self.shell and self.shell.poll() is None:
+            self.removeErrFile()
+            for pid in pids:
+                try:
+                    os.kill( pid, signal.SIGKILL )
+                except OSError:
+                    pass
+            try:
+                os.killpg( self.shell.pid, sig )
+            except OSError:
+                pass
+        if self.nsPid:
+            try:
+                os.kill( self.nsPid, signal.SIGKILL )
+            except OSError:
+                pass
+
+    def resources( self ):
+        """Return resources we have created, for Mininet's journal
+           (see mininet.journal)
+           returns: list of ( kind, arg... )"""
+        resources = []
+        for pid in self.pid, self.nsPid:
+            if pid:
+                resources.append( pidResource( pid ) )
+        if self.pid:
+            resources.append( ( 'file', self.errFile % self.pid ) )
+            if self.inNamespace:
+                netns = netnsResource( self.nsPid or self.pid )
+                if netns:
+                    resources.append( netns )
+        return resources
+
+    def removeErrFile( self ):
+        "Remove errFile if run() created one"
+        # Use our root so that we find it in our mount namespace
+        try:
+            os.unlink( '/proc/%d/root%s' % ( self.pid,
+                                             self.errFile % self.pid ) )
+        except OSError:
+            pass
+
     def stop( self, deleteIntfs=False ):
         """Stop node.
            deleteIntfs: delete interfaces? (False)"""
@@ -280,17 +455,34 @@ def stop( self, deleteIntfs=False ):
 
     def waitReadable( self, timeoutms=None ):
         """Wait until node's output is readable.
+           We use a poller of our own rather than the reactor, so
+           that different threads may wait for different nodes.
            timeoutms: timeout in ms or None to wait indefinitely.
            returns: result of poll()"""
-        if len( self.readbuf ) == 0:
-            return self.pollOut.poll( timeoutms )
+        if not self.readbuf:
+            poller = select.poll()
+            poller.register( self.stdout )
+            return poller.poll( timeoutms )
+        return True
 
     def sendCmd( self, *args, **kwargs ):
         """Send a command, followed by a command to echo a sentinel,
            and return without waiting for the command to complete.
            args: command and arguments, or string
            printPid: print command's PID? (False)"""
+        if self.cmdQueue:
+            self.waitQueue()
         assert self.shell and not self.waiting
+        if self.startPrompts > 0:
+            self.shellStarted()
+        self.write( self.formatCmd( *args, **kwargs ) )
+        self.lastPid = None
+        self.waiting = True
+
+    def formatCmd( self, *args, **kwargs ):
+        """Internal method: return shell input for a command
+           args: command and arguments, or string
+           printPid: print command's PID? (False)"""
         printPid = kwargs.get( 'printPid', False )
         # Allow sendCmd( [ list ] )
         if len( args ) == 1 and isinstance( args[ 0 ], list ):
@@ -307,13 +499,70 @@ def sendCmd( self, *args, **kwargs ):
         self.lastCmd = cmd
         # if a builtin command is backgrounded, it still yields a PID
         if len( cmd ) > 0 and cmd[ -1 ] == '&':
-            # print ^A{pid}\n so monitor() can set lastPid
-            cmd += ' printf "\\001%d\\012" $! '
+            cmd = self.formatBackground( cmd )
         elif printPid and not isShellBuiltin( cmd ):
             cmd = 'mnexec -p ' + cmd
-        self.write( cmd + '\n' )
-        self.lastPid = None
-        self.waiting = True
+        return cmd + '\n'
+
+    @staticmethod
+    def formatBackground( cmd ):
+        """Internal method: return shell input for a background command
+           cmd: command string ending in &"""
+        # print ^A{pid}\n so monitor() can set lastPid
+        return cmd + ' printf "\\001%d\\012" $! '
+
+    def queueCmd( self, *args, **kwargs ):
+        """Send a command without waiting for earlier queued commands
+           to complete. Queued commands run in order; their output is
+           read when needed, so commands must not read from stdin.
+           Thread-safe, though the sync API (cmd(), sendCmd()...) is not.
+           args: command and arguments, or string
+           printPid: print command's PID? (False)
+           returns: CmdFuture"""
+        with self.cmdLock:
+            assert self.shell and ( self.cmdQueue or not self.waiting )
+            if self.startPrompts > 0:
+                self.shellStarted()
+            data = self.formatCmd( *args, **kwargs )
+            future = CmdFuture( self, self.lastCmd )
+            self.cmdQueue.append( future )
+            self.waiting = True
+            self.writeQueued( data )
+        return future
+
+    def writeQueued( self, data ):
+        """Internal method: write data to node, reading output whenever
+           the shell is blocked writing it, so that we don't deadlock
+           data: string"""
+        data = encode( data )
+        fd = self.stdin.fileno()
+        poller = select.poll()
+        poller.register( fd, select.POLLOUT )
+        if self.stdout.fileno() == fd:
+            poller.register( fd, select.POLLOUT | select.POLLIN )
+        else:
+            poller.register( self.stdout, select.POLLIN )
+        while data:
+            for _fd, event in poller.poll():
+                if event & select.POLLIN:
+                    self.fillbuf()
+                if event & select.POLLOUT:
+                    # Write less than the pty's input buffer at a time
+                    count = os.write( fd, data[ :1024 ] )
+                    data = data[ count: ]
+
+    def waitQueue( self, future=None ):
+        """Wait for queued commands to complete.
+           future: wait only until this command is complete (None)"""
+        with self.cmdLock:
+            while self.cmdQueue and not ( future and future.done() ):
+                head = self.cmdQueue[ 0 ]
+                self.waiting = True
+                self.lastPid = None
+                while self.waiting:
+                    head.chunks.append( self.monitor() )
+                self.cmdQueue.popleft()
+                head.finish( self.lastPid )
 
     def sendInt( self, intr=chr( 3 ) ):
         "Interrupt running command."
@@ -328,29 +577,31 @@ def monitor( self, timeoutms=None, findPid=True ):
         ready = self.waitReadable( timeoutms )
         if not ready:
             return ''
-        data = self.read( 1024 )
-        pidre = r'\[\d+\] \d+\r\n'
-        # Look for PID
-        marker = chr( 1 ) + r'\d+\r\n'
-        if findPid and chr( 1 ) in data:
+        buf = self.readbuf
+        if not buf:
+            self.fillbuf()
+        # Return everything up to the sentinel, if we have it
+        end = buf.find( self.sentinel )
+        if findPid:
+            pos = buf.find( self.pidMarker, 0, end if end >= 0 else None )
+            if pos >= 0:
+                # Marker can be read in chunks; continue until all of it
+                # (and anything up to the sentinel) is read
+                while buf.find( b'\n', pos ) < 0 and self.fillbuf():
+                    pass
+                end = buf.find( self.sentinel )
+        data = buf.take( end if end >= 0 else None )
+        if end >= 0:
+            self.waiting = False
+            buf.skip( len( self.sentinel ) )
+        if findPid and self.pidMarker in data:
             # suppress the job and PID of a backgrounded command
-            if re.findall( pidre, data ):
-                data = re.sub( pidre, '', data )
-            # Marker can be read in chunks; continue until all of it is read
-            while not re.findall( marker, data ):
-                data += self.read( 1024 )
-            markers = re.findall( marker, data )
+            data = self.jobRe.sub( b'', data )
+            markers = self.pidRe.findall( data )
             if markers:
-                self.lastPid = int( markers[ 0 ][ 1: ] )
-                data = re.sub( marker, '', data )
-        # Look for sentinel/EOF
-        if len( data ) > 0 and data[ -1 ] == chr( 127 ):
-            self.waiting = False
-            data = data[ :-1 ]
-        elif chr( 127 ) in data:
-            self.waiting = False
-            data = data.replace( chr( 127 ), '' )
-        return data
+                self.lastPid = int( markers[ 0 ] )
+                data = self.pidRe.sub( b'', data )
+        return self.decoder.decode( data )
 
     def waitOutput( self, verbose=False, findPid=True ):
         """Wait for a command to complete.
@@ -359,12 +610,12 @@ def waitOutput( self, verbose=False, findPid=True ):
            the output, including trailing newline.
            verbose: print output interactively"""
         log = info if verbose else debug
-        output = ''
+        output = []
         while self.waiting:
             data = self.monitor( findPid=findPid )
-            output += data
+            output.append( data )
             log( data )
-        return output
+        return ''.join( output )
 
     def cmd( self, *args, **kwargs ):
         """Send a command, wait for output, and return it.
@@ -383,6 +634,105 @@ def cmdPrint( self, *args):
            cmd: string"""
         return self.cmd( *args, **{ 'verbose': True } )
 
+    # Framed commands: run() sends a command followed by a trailer which
+    # prints ^]{status} {pid}^^{stderr}^_ , so that a single exchange
+    # with the shell returns everything we know about the command.
+    # Stderr is collected in errFile (in the node's mount namespace).
+
+    errFile = '/tmp/mininet-%d.err'
+
+    def frameCmd( self, cmd ):
+        """Return cmd wrapped so that it reports its results.
+           cmd: command string"""
+        if cmd.rstrip().endswith( '&' ):
+            return self.frameBackground( cmd.rstrip() )
+        # The newline allows commands ending in comments
+        errFile = self.errFile % self.pid
+        return ( '{ %s\n} 2>%s; printf "\035%%d \036" $?; '
+                 '[ -s %s ] && cat %s; printf "\037"' %
+                 ( cmd, errFile, errFile, errFile ) )
+
+    def frameBackground( self, cmd ):
+        """Return background cmd wrapped so that it reports its pid
+           (as $!, so cmd must not be run in another subshell)
+           cmd: command string ending in &"""
+        # Status is 0
+        return '%s printf "\035%%d %%d\036\037" $? $!' % cmd
+
+    @staticmethod
+    def parseResult( output ):
+        """Parse output of a framed command.
+           output: output of command from frameCmd()
+           returns: CmdResult"""
+        stdout, _, trailer = output.rpartition( chr( 29 ) )
+        header, _, stderr = trailer.partition( chr( 30 ) )
+        stderr = stderr.rpartition( chr( 31 ) )[ 0 ]
+        status, _, pid = header.partition( ' ' )
+        if pid:
+            # suppress the job and PID of a backgrounded command
+            stdout = re.sub( r'\[\d+\] \d+\r\n', '', stdout )
+        return CmdResult( stdout=stdout, stderr=stderr,
+                          status=int( status ) if status else None,
+                          pid=int( pid ) if pid else None )
+
+    def stream( self, *args, **kwargs ):
+        """Send a command and yield its output as it arrives.
+           Output is only read as it is consumed, so a command which
+           produces output faster than we consume it will block.
+           If the generator is closed early, the command is interrupted.
+           args: command and arguments, or string
+           lines: yield lines rather than chunks (True)
+           yields: output lines (including newline) or chunks"""
+        lines = kwargs.pop( 'lines', True )
+        self.sendCmd( *args, **kwargs )
+        partial = ''
+        try:
+            while self.waiting:
+                data = self.monitor()
+                if not lines:
+                    if data:
+                        yield data
+                    continue
+                data = partial + data
+                end = data.rfind( '\n' ) + 1
+                partial = data[ end: ]
+                for line in data[ :end ].split( '\n' )[ :-1 ]:
+                    yield line + '\n'
+            if partial:
+                yield partial
+        finally:
+            if self.waiting:
+                self.sendInt()
+                self.waitOutput()
+
+    def run( self, *args, **kwargs ):
+        """Run a command and return its results in one exchange.
+           args: command and arguments, or string
+           verbose: print output interactively (False)
+           returns: CmdResult"""
+        verbose = kwargs.get( 'verbose', False )
+        log = info if verbose else debug
+        log( '*** %s : run %s\n' % ( self.name, args ) )
+        if not self.shell:
+            warn( '(%s exited - ignoring run%s)\n' % ( self, args ) )
+            return None
+        # Allow run( [ list ] ) and run( cmd, arg1, arg2... )
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            args = args[ 0 ]
+        cmd = ' '.join( [ str( c ) for c in args ] )
+        self.sendCmd( self.frameCmd( cmd ) )
+        result = self.parseResult( self.waitOutput( verbose,
+                                                    findPid=False ) )
+        self.lastPid = result.pid
+        return result
+
+    def acmd( self, *args, **kwargs ):
+        """Return a coroutine which sends a command and returns its
+           output (Python 3 only; see mininet.aio)
+           args: command and arguments, or string"""
+        from mininet.aio import acmd
+        return acmd( self, *args, **kwargs )
+
     def popen( self, *args, **kwargs ):
         """Return a Popen() object in our namespace
            args: Popen() args, single list, or string
@@ -406,20 +756,193 @@ def popen( self, *args, **kwargs ):
             cmd = list( args )
         if shell:
             cmd = [ os.environ[ 'SHELL' ], '-c' ] + [ ' '.join( cmd ) ]
+        if self.forkServer and self.forkServer.canSpawn( defaults ):
+            # Fork server is already in our namespace (and cgroup)
+            return self.forkServer.popen( cmd, **defaults )
         # Attach to our namespace  using mnexec -a
         cmd = defaults.pop( 'mncmd' ) + cmd
         popen = self._popen( cmd, **defaults )
         return popen
 
+    def startForkServer( self ):
+        """Start a fork server in our namespaces, so that popen() and
+           pexec() need not run mnexec (Python 3 only; see
+           mininet.forkserver)"""
+        from mininet.forkserver import ForkServer
+        if not self.forkServer:
+            self.forkServer = ForkServer( self )
+
+    def stopForkServer( self ):
+        "Stop our fork server, if any"
+        if self.forkServer:
+            self.forkServer.stop()
+            self.forkServer = None
+
+    def netlinkSocket( self ):
+        """Return a Netlink in our network namespace, opening it
+           on first use (see mininet.netlink)
+           returns: Netlink, or None if netlink is unavailable"""
+        if self.netlink is None:
+            if not self.inNamespace:
+                self.netlink = rootNetlink() or False
+            else:
+                try:
+                    self.netlink = Netlink( self.pid )
+                except ( OSError, IOError ) as e:
+                    debug( '*** %s: netlink unavailable: %s\n' %
+                           ( self.name, e ) )
+                    self.netlink = False
+        return self.netlink or None
+
+    def linkState( self ):
+        """Return a LinkCache for our network namespace, opening it
+           on first use (see mininet.netlink); Mininet closes it once
+           we (or a link) are configured, so that a large network
+           doesn't keep a subscribed socket open per node
+           returns: LinkCache, or None if netlink is unavailable"""
+        if self.linkCache is None:
+            if not self.inNamespace:
+                self.linkCache = rootLinkCache() or False
+            else:
+                try:
+                    self.linkCache = LinkCache( self.pid )
+                except ( OSError, IOError ) as e:
+                    debug( '*** %s: netlink unavailable: %s\n' %
+                           ( self.name, e ) )
+                    self.linkCache = False
+        return self.linkCache or None
+
+    def netnsKey( self ):
+        """Return a key which identifies our network namespace: nodes
+           with equal keys share one (e.g. the root namespace)"""
+        return self.pid if self.inNamespace else None
+
+    def canConnect( self, ip, port, timeout=1 ):
+        """Can we make a TCP connection? (see mininet.probe.TCPProbe)
+           ip: server's IP address
+           port: server's TCP port
+           timeout: seconds to wait for the connection
+           returns: True if we connected
+           raises: ProbeFailed if we will never connect"""
+        return tcpConnect( ip, port, pid=self.pid if self.inNamespace
+                           else None, timeout=timeout )
+
+    def closeLinkState( self ):
+        """Close our LinkCache, unless it is shared with the root
+           namespace; linkState() opens a new one if it is needed"""
+        if self.linkCache and self.inNamespace:
+            self.linkCache.close()
+            self.linkCache = None
+
+    def closeNetlink( self ):
+        """Close our Netlink and LinkCache, unless they are shared
+           with the root namespace"""
+        for nl in self.netlink, self.linkCache:
+            if nl and self.inNamespace:
+                nl.close()
+        self.netlink = self.linkCache = None
+
+    # Output of pexec( spool=True ) beyond spoolSize bytes is
+    # written to a temporary file in spoolDir (tmpfs if possible)
+    spoolSize = 1 << 20
+    spoolDir = '/dev/shm' if os.path.isdir( '/dev/shm' ) else None
+
+    @staticmethod
+    def pipeChunks( popen ):
+        """Read from popen's stdout and stderr until both are closed.
+           We use poll() rather than communicate(), because select()
+           can fail with large numbers of fds.
+           popen: Popen() object with stdout and/or stderr pipes
+           yields: pipe, data (bytes)"""
+        poller = select.poll()
+        fdToPipe = {}
+        for pipe in popen.stdout, popen.stderr:
+            if pipe:
+                fdToPipe[ pipe.fileno() ] = pipe
+                poller.register( pipe, select.POLLIN )
+        while fdToPipe:
+            for fd, _event in poller.poll():
+                pipe = fdToPipe[ fd ]
+                data = os.read( fd, ReadBuffer.readSize )
+                if not data:
+                    poller.unregister( fd )
+                    del fdToPipe[ fd ]
+                    pipe.close()
+                    continue
+                yield pipe, data
+
     def pexec( self, *args, **kwargs ):
         """Execute a command using popen
+           spool: return output as files, spilling to spoolDir
+               beyond spoolSize bytes, rather than as strings (False)
            returns: out, err, exitcode"""
+        spool = kwargs.pop( 'spool', False )
         popen = self.popen( *args, stdin=PIPE, stdout=PIPE, stderr=PIPE,
                             **kwargs )
-        # Warning: this can fail with large numbers of fds!
-        out, err = popen.communicate()
+        popen.stdin.close()
+        if spool:
+            out, err = [ SpooledTemporaryFile( max_size=self.spoolSize,
+                                               dir=self.spoolDir )
+                         for _ in range( 2 ) ]
+            for pipe, data in self.pipeChunks( popen ):
+                ( out if pipe is popen.stdout else err ).write( data )
+            out.seek( 0 )
+            err.seek( 0 )
+            return out, err, popen.wait()
+        chunks = { popen.stdout: [], popen.stderr: [] }
+        for pipe, data in self.pipeChunks( popen ):
+            chunks[ pipe ].append( data )
         exitcode = popen.wait()
-        return decode( out ), decode( err ), exitcode
+        return ( decode( b''.join( chunks[ popen.stdout ] ) ),
+                 decode( b''.join( chunks[ popen.stderr ] ) ), exitcode )
+
+    def pexecIter( self, *args, **kwargs ):
+        """Execute a command using popen, yielding output as it arrives.
+           Output is only read as it is consumed, so a command which
+           produces output faster than we consume it will block.
+           lines: yield lines rather than chunks (True)
+           raw: yield undecoded bytes rather than strings (False)
+           yields: 'stdout' or 'stderr', output; then 'exitcode', code"""
+        lines = kwargs.pop( 'lines', True )
+        raw = kwargs.pop( 'raw', False )
+        popen = self.popen( *args, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                            **kwargs )
+        popen.stdin.close()
+        names = { popen.stdout: 'stdout', popen.stderr: 'stderr' }
+        decoders = { pipe: getincrementaldecoder() for pipe in names }
+        partial = { pipe: b'' if raw else '' for pipe in names }
+        nl = b'\n' if raw else '\n'
+        try:
+            for pipe, data in self.pipeChunks( popen ):
+                if not raw:
+                    data = decoders[ pipe ].decode( data )
+                if not lines:
+                    if data:
+                        yield names[ pipe ], data
+                    continue
+                data = partial[ pipe ] + data
+                end = data.rfind( nl ) + 1
+                partial[ pipe ] = data[ end: ]
+                for line in data[ :end ].split( nl )[ :-1 ]:
+                    yield names[ pipe ], line + nl
+            for pipe, data in partial.items():
+                if data:
+                    yield names[ pipe ], data
+        finally:
+            if popen.poll() is None:
+                # We were closed early: don't leave command behind
+                popen.kill()
+            for pipe in names:
+                pipe.close()
+        yield 'exitcode', popen.wait()
+
+    def apexec( self, *args, **kwargs ):
+        """Return a coroutine which executes a command using popen
+           and returns out, err, exitcode (Python 3 only; see mininet.aio)
+           args: Popen() args, single list, or string
+           kwargs: Popen() keyword args"""
+        from mininet.aio import apexec
+        return apexec( self, *args, **kwargs )
 
     # Interface management, configuration, and routing
 
@@ -431,8 +954,8 @@ def pexec( self, *args, **kwargs ):
 
     def newPort( self ):
         "Return the next port number to allocate."
-        if len( self.ports ) > 0:
-            return max( self.ports.values() ) + 1
+        if self.lastPort is not None:
+            return self.lastPort + 1
         return self.portBase
 
     def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
@@ -444,6 +967,8 @@ def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
             port = self.newPort()
         self.intfs[ port ] = intf
         self.ports[ intf ] = port
+        if self.lastPort is None or port > self.lastPort:
+            self.lastPort = port
         self.nameToIntf[ intf.name ] = intf
         debug( '\n' )
         debug( 'added intf %s (%d) to node %s\n' % (
@@ -527,6 +1052,9 @@ def setHostRoute( self, ip, intf ):
         """Add route to host.
            ip: IP address as dotted decimal
            intf: string, interface name"""
+        intfObj = self.nameToIntf.get( str( intf ) )
+        if intfObj:
+            return intfObj.setHostRoute( ip )
         return self.cmd( 'route add -host', ip, 'dev', intf )
 
     def setDefaultRoute( self, intf=None ):
@@ -668,6 +1196,214 @@ class Host( Node ):
     "A host is simply a Node"
     pass
 
+class AdoptedProcess( object ):
+    """Popen()-like handle for a process which we did not start, such
+       as a namespace holder from util.makeNamespaces()"""
+
+    def __init__( self, pid ):
+        self.pid = pid
+        self.stdin = self.stdout = self.stderr = None
+        self.returncode = None
+
+    def poll( self ):
+        "Return 0 if process has exited (status is unknown), else None"
+        if self.returncode is None:
+            try:
+                with open( '/proc/%d/stat' % self.pid ) as f:
+                    # Zombies are only waiting for someone to reap them
+                    if f.read().rsplit( ')', 1 )[ 1 ].split()[ 0 ] == 'Z':
+                        self.returncode = 0
+            except IOError:
+                self.returncode = 0
+        return self.returncode
+
+    def wait( self ):
+        "Wait for process to exit"
+        while self.poll() is None:
+            sleep( .01 )
+        return self.returncode
+
+
+class NamespaceHost( Host ):
+    """A host without a shell. Its namespaces are held open by an
+       idle mnexec process, and each cmd() runs in a short-lived bash
+       which attaches to them. This saves a bash and a pty per host,
+       but shell state (cwd, variables, jobs for kill %1 etc.)
+       does not persist from one command to the next. Output uses
+       plain newlines rather than the pty's carriage return/newline,
+       and output of background commands is discarded."""
+
+    # We have no pty to turn \n into \r\n
+    pidRe = re.compile( b'\x01(\\d+)\r?\n' )
+
+    def __init__( self, name, **kwargs ):
+        self.cmdPopen = None  # process for current command
+        Host.__init__( self, name, **kwargs )
+
+    def startShell( self, mnopts=None ):
+        "Start a process to hold our namespaces open"
+        if self.shell:
+            error( "%s: holder is already running\n" % self.name )
+            return
+        self.execed = False
+        self.lastCmd = None
+        self.lastPid = None
+        self.readbuf.clear()
+        self.waiting = False
+        if self.nsPid:
+            # Adopt holder from makeNamespaces()
+            self.shell = AdoptedProcess( self.nsPid )
+            self.pid = self.nsPid
+            return
+        # mnexec: (c)lose descriptors, (d)etach from tty, run in
+        # (n)amespace, (p)rint pid once namespaces are ready, and
+        # (w)ait until killed; mininet:<name> makes it easy to find in ps
+        opts = '-cd' if mnopts is None else mnopts
+        if self.inNamespace:
+            opts += 'n'
+        cmd = [ 'mnexec', opts + 'pw', 'mininet:' + self.name ]
+        self.shell = self._popen( cmd, stdin=PIPE, stdout=PIPE,
+                                  stderr=STDOUT )
+        self.pid = self.shell.pid
+        # Wait for ^A{pid}, so that nobody attaches to us too early
+        line = decode( self.shell.stdout.readline() )
+        if not line.startswith( chr( 1 ) ):
+            raise Exception( 'Error starting namespace holder for %s: %s'
+                             % ( self.name, line ) )
+
+    def shellStarted( self, block=True ):
+        "We have no shell, so we are always ready"
+        return True
+
+    def sendCmd( self, *args, **kwargs ):
+        """Start a command in our namespace and return without waiting
+           for it to complete.
+           args: command and arguments, or string
+           printPid: print command's PID? (False)"""
+        assert self.shell and not self.waiting
+        cmd = self.formatCmd( *args, **kwargs )
+        self.cmdPopen = self.popen( [ 'bash', '-c', cmd ], stdin=PIPE,
+                                    stdout=PIPE, stderr=STDOUT )
+        self.stdin, self.stdout = self.cmdPopen.stdin, self.cmdPopen.stdout
+        self.outToNode[ self.stdout.fileno() ] = self
+        self.inToNode[ self.stdin.fileno() ] = self
+        reactor.register( self.stdout.fileno(), owner=self )
+        self.decoder = getincrementaldecoder()
+        self.lastPid = None
+        self.waiting = True
+
+    def queueCmd( self, *args, **kwargs ):
+        """Run a command; we have no shell to queue commands in, so
+           it has completed when we return.
+           returns: CmdFuture"""
+        with self.cmdLock:
+            output = self.cmd( *args, **kwargs )
+            future = CmdFuture( self, self.lastCmd )
+            future.chunks.append( output )
+            future.finish( self.lastPid )
+        return future
+
+    @staticmethod
+    def formatBackground( cmd ):
+        """Internal method: return input for a background command,
+           which must not hold on to our output pipe
+           cmd: command string ending in &"""
+        # The group runs in our shell, so $! is still cmd's pid
+        return Host.formatBackground(
+            '{ %s } </dev/null >/dev/null 2>&1;' % cmd )
+
+    def frameBackground( self, cmd ):
+        """Return background cmd wrapped so that it reports its pid;
+           it must not hold on to our output pipe.
+           cmd: command string ending in &"""
+        # The group runs in our shell, so $! is still cmd's pid
+        return Host.frameBackground(
+            self, '{ %s } </dev/null >/dev/null 2>&1;' % cmd )
+
+    def fillbuf( self ):
+        """Internal method: read current command's output into readbuf,
+           appending the sentinel at end of output
+           returns: number of bytes read"""
+        if not self.cmdPopen:
+            return 0
+        fd = self.stdout.fileno()
+        count = self.readbuf.fill( fd )
+        reactor.consume( fd )
+        if not count:
+            # End of output: clean up and return sentinel
+            self.finishCmd()
+            self.readbuf.append( self.sentinel )
+        return count
+
+    def finishCmd( self ):
+        "Internal method: reap current command and close its pipes"
+        popen = self.cmdPopen
+        if not popen:
+            return
+        reactor.unregister( popen.stdout.fileno() )
+        self.outToNode.pop( popen.stdout.fileno(), None )
+        self.inToNode.pop( popen.stdin.fileno(), None )
+        popen.stdin.close()
+        popen.stdout.close()
+        popen.wait()
+        self.cmdPopen = self.stdin = self.stdout = None
+
+    def write( self, data ):
+        """Write data to current command's input.
+           data: string"""
+        if self.cmdPopen:
+            os.write( self.stdin.fileno(), encode( data ) )
+
+    def sendInt( self, intr=chr( 3 ) ):
+        "Interrupt running command."
+        if self.cmdPopen and self.cmdPopen.poll() is None:
+            # mnexec -d put the command in its own process group
+            os.killpg( self.cmdPopen.pid, signal.SIGINT )
+
+    def namespacePids( self ):
+        "Return pids of other processes in our network namespace"
+        ns = os.readlink( '/proc/%d/ns/net' % self.pid )
+        pids = []
+        for entry in os.listdir( '/proc' ):
+            if not entry.isdigit() or int( entry ) == self.pid:
+                continue
+            try:
+                if os.readlink( '/proc/%s/ns/net' % entry ) == ns:
+                    pids.append( int( entry ) )
+            except OSError:
+                # Process has exited or isn't ours to look at
+                pass
+        return pids
+
+    def terminate( self ):
+        """Kill any processes left in our namespace (e.g. background
+           commands), then our holder process, and clean up."""
+        self.unmountPrivateDirs()
+        if self.shell and self.shell.poll() is None:
+            if self.inNamespace:
+                for pid in self.namespacePids():
+                    try:
+                        os.kill( pid, signal.SIGKILL )
+                    except OSError:
+                        pass
+            self.removeErrFile()
+            os.killpg( self.shell.pid, signal.SIGHUP )
+        self.cleanup()
+
+    def cleanup( self ):
+        "Help python collect its garbage."
+        self.stopForkServer()
+        self.closeNetlink()
+        self.finishCmd()
+        if self.shell:
+            if self.shell.stdout:
+                self.shell.stdin.close()
+                self.shell.stdout.close()
+            if self.waitExited:
+                debug( 'waiting for', self.pid, 'to terminate\n' )
+                self.shell.wait()
+        self.shell = None
+
 class CPULimitedHost( Host ):
 
     "CPU limited host"
@@ -740,6 +1476,11 @@ def cleanup( self ):
         super( CPULimitedHost, self ).cleanup()
         retry( retries=3, delaySecs=.1, fn=self.cgroupDel )
 
+    def resources( self ):
+        "Return resources we have created, including our cgroup"
+        return ( super( CPULimitedHost, self ).resources() +
+                 [ ( 'cgroup', self.cgroup ) ] )
+
     _rtGroupSched = False   # internal class var: Is CONFIG_RT_GROUP_SCHED set?
 
     @classmethod
@@ -894,7 +1635,10 @@ def __init__( self, name, dpid=None, opts='', listenPort=None, **params):
         self.opts = opts
         self.listenPort = listenPort
         if not self.inNamespace:
-            self.controlIntf = Intf( 'lo', self, port=0 )
+            # lo is always up in the root namespace, so there is no
+            # need to block on a shell that is still starting up
+            self.controlIntf = Intf( 'lo', self, port=0,
+                                     up=True if self.waitStart else None )
 
     def defaultDpid( self, dpid=None ):
         "Return correctly formatted dpid from dpid or switch name (s1 -> 1)"
@@ -939,6 +1683,19 @@ def connected( self ):
         debug( 'Assuming', repr( self ), 'is connected to a controller\n' )
         return True
 
+    def addFlows( self, flows ):
+        """Add flows to our flow table (override this method to add
+           them in bulk); see also Mininet.installFlows()
+           flows: list of flows, in dpctl add-flow syntax
+           returns: error output, if any"""
+        errors = ''
+        for flow in flows:
+            # Quote flow, since our shell runs dpctl
+            out = self.dpctl( 'add-flow', "'%s'" % flow )
+            if 'error' in out.lower():
+                errors += out
+        return errors
+
     def stop( self, deleteIntfs=True ):
         """Stop switch
            deleteIntfs: delete interfaces? (True)"""
@@ -1004,6 +1761,7 @@ def TCReapply( intf ):
             ifspeed = 10000000000  # 10 Gbps
             minspeed = ifspeed * 0.001
 
+            intf.invalidateTC()
             res = intf.config( **intf.params )
 
             if res is None:  # link may not have TC parameters
@@ -1029,18 +1787,26 @@ def start( self, controllers ):
         ofdlog = '/tmp/' + self.name + '-ofd.log'
         ofplog = '/tmp/' + self.name + '-ofp.log'
         intfs = [ str( i ) for i in self.intfList() if not i.IP() ]
+        sockPath = '/tmp/' + self.name
+        # Remove any stale socket, so we only see ours appear
+        if os.path.exists( sockPath ):
+            os.unlink( sockPath )
         self.cmd( 'ofdatapath -i ' + ','.join( intfs ) +
-                  ' punix:/tmp/' + self.name + ' -d %s ' % self.dpid +
+                  ' punix:' + sockPath + ' -d %s ' % self.dpid +
                   self.dpopts +
                   ' 1> ' + ofdlog + ' 2> ' + ofdlog + ' &' )
-        self.cmd( 'ofprotocol unix:/tmp/' + self.name +
+        # Wait for ofdatapath to start, so that ofprotocol can connect
+        # and we don't re-arrange qdiscs underneath it
+        if not FileProbe( sockPath ).wait( timeout=5 ):
+            warn( 'Warning: ofdatapath for %s has not created %s\n' %
+                  ( self.name, sockPath ) )
+        self.cmd( 'ofprotocol unix:' + sockPath +
                   ' ' + clist +
                   ' --fail=closed ' + self.opts +
                   ' 1> ' + ofplog + ' 2>' + ofplog + ' &' )
         if "no-slicing" not in self.dpopts:
             # Only TCReapply if slicing is enable
-            sleep(1)  # Allow ofdatapath to start before re-arranging qdisc's
-            for intf in self.intfList():
+            for intf in overwrittenTC( self.intfList() ):
                 if not intf.IP():
                     self.TCReapply( intf )
 
@@ -1051,6 +1817,13 @@ def stop( self, deleteIntfs=True ):
         self.cmd( 'kill %ofprotocol' )
         super( UserSwitch, self ).stop( deleteIntfs )
 
+    def resources( self ):
+        "Return resources we have created, including sockets and logs"
+        files = [ '/tmp/%s%s' % ( self.name, suffix ) for suffix in
+                  ( '', '.listen', '-ofd.log', '-ofp.log' ) ]
+        return ( super( UserSwitch, self ).resources() +
+                 [ ( 'file', f ) for f in files ] )
+
 
 class OVSSwitch( Switch ):
     "Open vSwitch switch. Depends on ovs-vsctl."
@@ -1077,6 +1850,7 @@ def __init__( self, name, failMode='secure', datapath='kernel',
         self._uuids = []  # controller UUIDs
         self.batch = batch
         self.commands = []  # saved commands for batch startup
+        self.pendingControllers = None  # for batch startup via ovsdb
 
     @classmethod
     def setup( cls ):
@@ -1106,10 +1880,73 @@ def isOldOVS( cls ):
         return ( StrictVersion( cls.OVSVersion ) <
                  StrictVersion( '1.10' ) )
 
+    # Talk to ovsdb-server directly (see mininet.ovsdb) if we can
+    useOVSDB = True
+
+    @classmethod
+    def ovsdb( cls ):
+        "Return shared OVSDB connection, or None to use ovs-vsctl"
+        if not cls.useOVSDB or cls.isOldOVS():
+            return None
+        return localOVSDB()
+
+    @classmethod
+    def ovsdbTransact( cls, ops ):
+        """Run an OVSDB transaction and wait for ovs-vswitchd to apply
+           it, as ovs-vsctl does
+           ops: operations
+           returns: results of ops"""
+        db = cls.ovsdb()
+        results = db.transact( *( ops + reconfigure() ) )
+        nextCfg = results[ -1 ][ 'rows' ][ 0 ][ 'next_cfg' ]
+        if not db.waitConfigured( nextCfg ):
+            warn( '*** Warning: timed out waiting for ovs-vswitchd\n' )
+        return results[ :len( ops ) ]
+
+    @classmethod
+    def bridgeUUIDs( cls, switches ):
+        "Return { name: ovsdb Bridge UUID } for existing switch bridges"
+        names = set( s.name for s in switches )
+        return dict( ( row[ 'name' ], row[ '_uuid' ] )
+                     for row in cls.ovsdb().select( 'Bridge',
+                                                    [ 'name', '_uuid' ] )
+                     if row[ 'name' ] in names )
+
     def dpctl( self, *args ):
         "Run ovs-ofctl command"
         return self.cmd( 'ovs-ofctl', args[ 0 ], self, *args[ 1: ] )
 
+    def addFlowsArgs( self, bundle=None ):
+        """Return ovs-ofctl command line to add flows from its stdin
+           bundle: add flows atomically in an OpenFlow bundle?
+               (default: if our protocols include OpenFlow14+)"""
+        args = [ 'ovs-ofctl' ]
+        if self.protocols:
+            args += [ '-O', self.protocols ]
+        if bundle is None:
+            bundle = any( version in ( self.protocols or '' )
+                          for version in ( 'OpenFlow14', 'OpenFlow15' ) )
+        if bundle:
+            args.append( '--bundle' )
+        return args + [ 'add-flows', self.name, '-' ]
+
+    def addFlows( self, flows, bundle=None ):
+        """Add flows using a single ovs-ofctl add-flows, streaming
+           them to its stdin rather than forking per flow
+           flows: list of flows, in ovs-ofctl add-flow syntax
+           bundle: see addFlowsArgs()
+           returns: error output, if any"""
+        # ovs-vswitchd is local and reachable from any namespace,
+        # so skip our shell (and mnexec)
+        popen = Popen( self.addFlowsArgs( bundle ), stdin=PIPE,
+                       stdout=PIPE, stderr=STDOUT )
+        out, _err = popen.communicate(
+            ''.join( flow + '\n' for flow in flows ).encode() )
+        out = decode( out )
+        if popen.returncode and not out:
+            out = 'ovs-ofctl exited with code %d\n' % popen.returncode
+        return out
+
     def vsctl( self, *args, **kwargs ):
         "Run ovs-vsctl command (or queue for later execution)"
         if self.batch:
@@ -1124,22 +1961,58 @@ def TCReapply( intf ):
            over tc queuing disciplines. As a quick hack/
            workaround, we clear OVS's and reapply our own."""
         if isinstance( intf, TCIntf ):
+            intf.invalidateTC()
             intf.config( **intf.params )
 
     def attach( self, intf ):
         "Connect a data port"
-        self.vsctl( 'add-port', self, intf )
+        if self.ovsdb():
+            ops = self.portOps( intf.name, self.intfSettings( intf ), 'p' )
+            ops.append( { 'op': 'mutate', 'table': 'Bridge',
+                          'where': [ [ 'name', '==', self.name ] ],
+                          'mutations': [ [ 'ports', 'insert',
+                                           ovsSet( [ namedUUID( 'p' ) ] )
+                                           ] ] } )
+            self.ovsdbTransact( ops )
+            if isinstance( intf, OVSPortIntf ):
+                moveOVSInternalIntfs( [ intf ] )
+                return
+        elif isinstance( intf, OVSPortIntf ):
+            self.vsctl( 'add-port', self, intf, self.intfOpts( intf ) )
+            moveOVSInternalIntfs( [ intf ] )
+            return
+        else:
+            self.vsctl( 'add-port', self, intf )
         self.cmd( 'ifconfig', intf, 'up' )
-        self.TCReapply( intf )
+        for tcintf in overwrittenTC( [ intf ] ):
+            self.TCReapply( tcintf )
 
     def detach( self, intf ):
         "Disconnect a data port"
-        self.vsctl( 'del-port', self, intf )
+        db = self.ovsdb()
+        if not db:
+            self.vsctl( 'del-port', self, intf )
+            return
+        ports = db.select( 'Port', [ '_uuid' ],
+                           [ [ 'name', '==', intf.name ] ] )
+        if ports:
+            self.ovsdbTransact( [ {
+                'op': 'mutate', 'table': 'Bridge',
+                'where': [ [ 'name', '==', self.name ] ],
+                'mutations': [ [ 'ports', 'delete',
+                                 ovsSet( [ ports[ 0 ][ '_uuid' ] ] ) ] ] } ] )
 
     def controllerUUIDs( self, update=False ):
         """Return ovsdb UUIDs for our controllers
            update: update cached value"""
-        if not self._uuids or update:
+        db = self.ovsdb()
+        if db and ( not self._uuids or update ):
+            rows = db.select( 'Bridge', [ 'controller' ],
+                              [ [ 'name', '==', self.name ] ] )
+            if rows:
+                self._uuids = [ uuid[ 1 ] for uuid in
+                                setMembers( rows[ 0 ][ 'controller' ] ) ]
+        elif not self._uuids or update:
             controllers = self.cmd( 'ovs-vsctl -- get Bridge', self,
                                     'Controller' ).strip()
             if controllers.startswith( '[' ) and controllers.endswith( ']' ):
@@ -1151,39 +2024,248 @@ def controllerUUIDs( self, update=False ):
 
     def connected( self ):
         "Are we connected to at least one of our controllers?"
+        if self.ovsdb():
+            return bool( self.batchConnected( [ self ] ) )
         for uuid in self.controllerUUIDs():
             if 'true' in self.vsctl( '-- get Controller',
                                      uuid, 'is_connected' ):
                 return True
         return self.failMode == 'standalone'
 
-    def intfOpts( self, intf ):
-        "Return OVS interface options for intf"
+    @classmethod
+    def batchConnected( cls, switches, run=errRun ):
+        """Check which switches are connected to at least one of their
+           controllers by reading the Bridge and Controller tables with
+           a single ovs-vsctl (rather than several per switch)
+           switches: switches to check
+           run: function to run commands (errRun)
+           returns: list of connected switches"""
+        db = cls.ovsdb()
+        if db:
+            # Both tables in one round trip
+            results = db.transact(
+                { 'op': 'select', 'table': 'Bridge', 'where': [],
+                  'columns': [ 'name', 'controller' ] },
+                { 'op': 'select', 'table': 'Controller', 'where': [],
+                  'columns': [ '_uuid', 'is_connected' ] } )
+            bridges = [ ( row[ 'name' ], row[ 'controller' ] )
+                        for row in results[ 0 ][ 'rows' ] ]
+            controllers = [ ( row[ '_uuid' ], row[ 'is_connected' ] )
+                            for row in results[ 1 ][ 'rows' ] ]
+            return cls.connectedBridges( switches, bridges, controllers )
+        out, err, exitcode = run(
+            [ 'ovs-vsctl', '--format=json',
+              '--', '--columns=name,controller', 'list', 'Bridge',
+              '--', '--columns=_uuid,is_connected', 'list', 'Controller' ] )
+        if exitcode:
+            debug( 'batchConnected: %s' % err )
+            return [ s for s in switches if s.failMode == 'standalone' ]
+        # One JSON table per command
+        decoder, tables, pos = json.JSONDecoder(), [], 0
+        out = out.strip()
+        while pos < len( out ):
+            table, pos = decoder.raw_decode( out, pos )
+            tables.append( table[ 'data' ] )
+            while pos < len( out ) and out[ pos ].isspace():
+                pos += 1
+        bridges, controllers = tables
+        return cls.connectedBridges( switches, bridges, controllers )
+
+    @staticmethod
+    def connectedBridges( switches, bridges, controllers ):
+        """Return the switches which are connected to a controller
+           switches: switches to check
+           bridges: [ ( name, controller UUID set ) ]
+           controllers: [ ( controller UUID, is_connected ) ]"""
+        isConnected = dict( ( uuid[ 1 ], status is True )
+                            for uuid, status in controllers )
+        connected = set(
+            name for name, uuids in bridges
+            if any( isConnected.get( uuid[ 1 ] )
+                    for uuid in setMembers( uuids ) ) )
+        return [ s for s in switches
+                 if s.name in connected or s.failMode == 'standalone' ]
+
+    @classmethod
+    def connectionEvents( cls, switches ):
+        """Return a probe whose sleep() wakes up when controller
+           connections change (see Mininet.waitConnected()), or None
+           switches: switches we are waiting for"""
+        db = switches[ 0 ].ovsdb() if switches else None
+        if not db:
+            return None
+        return OVSDBProbe( db, { 'Controller': [ 'is_connected' ] } )
+
+    @staticmethod
+    def vsctlOpts( settings ):
+        "Return ovs-vsctl column=value options for settings"
         opts = ''
+        for column, value in sorted( settings.items() ):
+            if isinstance( value, dict ):
+                opts += ''.join( ' %s:%s=%s' % ( column, key, val )
+                                 for key, val in sorted( value.items() ) )
+            elif isinstance( value, bool ):
+                opts += ' %s=%s' % ( column, str( value ).lower() )
+            else:
+                opts += ' %s=%s' % ( column, value )
+        return opts
+
+    @staticmethod
+    def ovsdbRow( settings ):
+        "Return OVSDB row for settings"
+        row = {}
+        for column, value in settings.items():
+            if isinstance( value, dict ):
+                value = ovsMap( value )
+            elif column == 'protocols':
+                value = ovsSet( value.split( ',' ) )
+            row[ column ] = value
+        return row
+
+    def intfSettings( self, intf ):
+        "Return OVS Interface settings for intf: { column: value }"
+        settings = {}
+        if isinstance( intf, OVSPortIntf ):
+            # Another node's interface (see OVSInternalLink)
+            settings[ 'type' ] = 'internal'
         if not self.isOldOVS():
             # ofport_request is not supported on old OVS
-            opts += ' ofport_request=%s' % self.ports[ intf ]
+            settings[ 'ofport_request' ] = self.ports[ intf ]
             # Patch ports don't work well with old OVS
-            if isinstance( intf, OVSIntf ):
+            if ( isinstance( intf, OVSIntf ) and
+                 not isinstance( intf, OVSPortIntf ) ):
                 intf1, intf2 = intf.link.intf1, intf.link.intf2
                 peer = intf1 if intf1 != intf else intf2
-                opts += ' type=patch options:peer=%s' % peer
+                settings[ 'type' ] = 'patch'
+                settings[ 'options' ] = { 'peer': str( peer ) }
+        return settings
+
+    def intfOpts( self, intf ):
+        "Return OVS interface options for intf"
+        opts = self.vsctlOpts( self.intfSettings( intf ) )
         return '' if not opts else ' -- set Interface %s' % intf + opts
 
-    def bridgeOpts( self ):
-        "Return OVS bridge options"
-        opts = ( ' other_config:datapath-id=%s' % self.dpid +
-                 ' fail_mode=%s' % self.failMode )
+    def internalPorts( self ):
+        "Return our internal ports which are other nodes' interfaces"
+        return [ intf for intf in self.intfList()
+                 if isinstance( intf, OVSPortIntf ) ]
+
+    def bridgeSettings( self ):
+        "Return OVS Bridge settings: { column: value }"
+        otherConfig = { 'datapath-id': self.dpid, 'dp-desc': self.name }
         if not self.inband:
-            opts += ' other-config:disable-in-band=true'
+            otherConfig[ 'disable-in-band' ] = 'true'
+        settings = { 'other_config': otherConfig,
+                     'fail_mode': self.failMode }
         if self.datapath == 'user':
-            opts += ' datapath_type=netdev'
+            settings[ 'datapath_type' ] = 'netdev'
         if self.protocols and not self.isOldOVS():
-            opts += ' protocols=%s' % self.protocols
+            settings[ 'protocols' ] = self.protocols
         if self.stp and self.failMode == 'standalone':
-            opts += ' stp_enable=true'
-        opts += ' other-config:dp-desc=%s' % self.name
-        return opts
+            settings[ 'stp_enable' ] = True
+        return settings
+
+    def bridgeOpts( self ):
+        "Return OVS bridge options"
+        return self.vsctlOpts( self.bridgeSettings() )
+
+    def controllerTargets( self, controllers ):
+        "Return [ ( name, target ) ] for our Controller entries"
+        clist = [ ( self.name + c.name, '%s:%s:%d' %
+                  ( c.protocol, c.IP(), c.port ) )
+                  for c in controllers ]
+        if self.listenPort:
+            clist.append( ( self.name + '-listen',
+                            'ptcp:%s' % self.listenPort ) )
+        return clist
+
+    @staticmethod
+    def portOps( name, settings, ref ):
+        """Return OVSDB operations which create a port
+           name: port (and interface) name
+           settings: Interface settings
+           ref: named UUID for the port
+           returns: list of operations"""
+        row = OVSSwitch.ovsdbRow( settings )
+        row[ 'name' ] = name
+        return [ { 'op': 'insert', 'table': 'Interface', 'row': row,
+                   'uuid-name': ref + 'i' },
+                 { 'op': 'insert', 'table': 'Port', 'uuid-name': ref,
+                   'row': { 'name': name, 'interfaces':
+                            namedUUID( ref + 'i' ) } } ]
+
+    def bridgeOps( self, controllers, ref ):
+        """Return OVSDB operations which create our bridge, as
+           ovs-vsctl add-br and start() would
+           controllers: controllers to connect to
+           ref: named UUID for the bridge (also used as a prefix)
+           returns: list of operations"""
+        ops, ports, cids = [], [], []
+        intfs = [ ( self.name, { 'type': 'internal' } ) ]
+        intfs += [ ( intf.name, self.intfSettings( intf ) )
+                   for intf in self.intfList()
+                   if self.ports[ intf ] and not intf.IP() ]
+        for i, ( name, settings ) in enumerate( intfs ):
+            ports.append( namedUUID( '%sp%d' % ( ref, i ) ) )
+            ops += self.portOps( name, settings, '%sp%d' % ( ref, i ) )
+        for i, ( _name, target ) in enumerate(
+                self.controllerTargets( controllers ) ):
+            row = { 'target': target }
+            if self.reconnectms:
+                row[ 'max_backoff' ] = self.reconnectms
+            cids.append( namedUUID( '%sc%d' % ( ref, i ) ) )
+            ops.append( { 'op': 'insert', 'table': 'Controller',
+                          'row': row, 'uuid-name': '%sc%d' % ( ref, i ) } )
+        row = self.ovsdbRow( self.bridgeSettings() )
+        row.update( name=self.name, ports=ovsSet( ports ),
+                    controller=ovsSet( cids ) )
+        ops.append( { 'op': 'insert', 'table': 'Bridge', 'row': row,
+                      'uuid-name': ref } )
+        return ops
+
+    # Maximum number of OVSDB transactions in flight at once
+    ovsdbWindow = 64
+
+    @classmethod
+    def ovsdbStartup( cls, switches ):
+        """Create switches' bridges, replacing any existing bridges
+           with the same names, using a transaction per switch, so
+           that each succeeds or fails on its own. The transactions
+           are pipelined over one connection, and we wait once for
+           ovs-vswitchd to apply all of them.
+           switches: switches with pendingControllers
+           returns: switches whose bridges were created"""
+        db = cls.ovsdb()
+        old = cls.bridgeUUIDs( switches )
+        inflight, started = deque(), []
+
+        def finish():
+            "Wait for the oldest transaction in flight"
+            switch, ops, rid = inflight.popleft()
+            try:
+                db.transactWait( rid, ops )
+                started.append( switch )
+            except OVSDBError as e:
+                error( '*** Error creating bridge %s: %s\n' % ( switch, e ) )
+        for switch in switches:
+            ops = switch.bridgeOps( switch.pendingControllers, 'br' )
+            mutations = [ [ 'bridges', 'insert',
+                            ovsSet( [ namedUUID( 'br' ) ] ) ] ]
+            if switch.name in old:
+                mutations.insert( 0, [ 'bridges', 'delete',
+                                       ovsSet( [ old[ switch.name ] ] ) ] )
+            ops.append( { 'op': 'mutate', 'table': 'Open_vSwitch',
+                          'where': [], 'mutations': mutations } )
+            switch.pendingControllers = None
+            switch.batch = False
+            if len( inflight ) >= cls.ovsdbWindow:
+                finish()
+            inflight.append( ( switch, ops, db.transactAsync( *ops ) ) )
+        while inflight:
+            finish()
+        if started:
+            cls.ovsdbTransact( [] )
+        return started
 
     def start( self, controllers ):
         "Start up a new OVS OpenFlow switch using ovs-vsctl"
@@ -1191,18 +2273,29 @@ def start( self, controllers ):
             raise Exception(
                 'OVS kernel switch does not work in a namespace' )
         int( self.dpid, 16 )  # DPID must be a hex string
+        if self.ovsdb():
+            # Create our bridge now, or in batchStartup()
+            self.pendingControllers = controllers
+            if not self.batch:
+                self.ovsdbStartup( [ self ] )
+        else:
+            self.vsctlStart( controllers )
+        if not self.batch:
+            # Move our internal ports to their nodes
+            moveOVSInternalIntfs( self.internalPorts() )
+            # If necessary, restore TC config overwritten by OVS
+            for intf in overwrittenTC( self.intfList() ):
+                self.TCReapply( intf )
+
+    def vsctlStart( self, controllers ):
+        "Create our bridge using ovs-vsctl (or queue for batchStartup)"
         # Command to add interfaces
         intfs = ''.join( ' -- add-port %s %s' % ( self, intf ) +
                          self.intfOpts( intf )
                          for intf in self.intfList()
                          if self.ports[ intf ] and not intf.IP() )
         # Command to create controller entries
-        clist = [ ( self.name + c.name, '%s:%s:%d' %
-                  ( c.protocol, c.IP(), c.port ) )
-                  for c in controllers ]
-        if self.listenPort:
-            clist.append( ( self.name + '-listen',
-                            'ptcp:%s' % self.listenPort ) )
+        clist = self.controllerTargets( controllers )
         ccmd = '-- --id=@%s create Controller target=\\"%s\\"'
         if self.reconnectms:
             ccmd += ' max_backoff=%d' % self.reconnectms
@@ -1219,61 +2312,157 @@ def start( self, controllers ):
                     ' -- set bridge %s controller=[%s]' % ( self, cids  ) +
                     self.bridgeOpts() +
                     intfs )
-        # If necessary, restore TC config overwritten by OVS
-        if not self.batch:
-            for intf in self.intfList():
-                self.TCReapply( intf )
 
     # This should be ~ int( quietRun( 'getconf ARG_MAX' ) ),
     # but the real limit seems to be much lower
     argmax = 128000
 
+    @staticmethod
+    def vsctlFailed( result ):
+        """Did ovs-vsctl fail?
+           result: errRun() result or cmd() output"""
+        if isinstance( result, tuple ):
+            return result[ 2 ] != 0
+        return 'ovs-vsctl:' in result
+
     @classmethod
-    def batchStartup( cls, switches, run=errRun ):
+    def vsctlChunks( cls, switches, chunks=1 ):
+        """Split switches' saved commands into ovs-vsctl command lines
+           switches: switches with saved commands
+           chunks: preferred number of chunks
+           returns: [ ( switches, command line ) ], keeping each
+               switch's commands together and within argmax"""
+        cmds = dict( ( switch, ' '.join( cmd.strip()
+                                         for cmd in switch.commands ) )
+                     for switch in switches )
+        total = sum( len( cmd ) for cmd in cmds.values() )
+        limit = min( cls.argmax, total // chunks + 1 )
+        result, chunk, line = [], [], 'ovs-vsctl'
+        for switch in switches:
+            if chunk and len( line ) + len( cmds[ switch ] ) >= limit:
+                result.append( ( chunk, line ) )
+                chunk, line = [], 'ovs-vsctl'
+            chunk.append( switch )
+            line += ' ' + cmds[ switch ]
+        if chunk:
+            result.append( ( chunk, line ) )
+        return result
+
+    @classmethod
+    def batchTCReapply( cls, intfs, parallel=16 ):
+        """Restore TC config which OVS overwrote, using a pool of
+           workers, each of which handles all of a node's interfaces
+           intfs: interfaces to check
+           parallel: maximum number of nodes to work on at once"""
+        byNode = {}
+        for intf in overwrittenTC( intfs ):
+            byNode.setdefault( intf.node, [] ).append( intf )
+
+        def reapply( nodeIntfs ):
+            "Reapply TC config on one node's interfaces"
+            for intf in nodeIntfs:
+                cls.TCReapply( intf )
+        runParallel( reapply, list( byNode.values() ), parallel )
+
+    @classmethod
+    def batchStartup( cls, switches, run=errRun, parallel=8 ):
         """Batch startup for OVS
            switches: switches to start up
-           run: function to run commands (errRun)"""
+           run: function to run commands (errRun)
+           parallel: number of ovs-vsctl chunks to run at once
+               (for run=errRun; otherwise they run in turn)
+           returns: switches which started"""
         info( '...' )
-        cmds = 'ovs-vsctl'
-        for switch in switches:
+        failed = set()
+        # Bridges to create over OVSDB
+        pending = [ s for s in switches
+                    if s.pendingControllers is not None ]
+        if pending:
+            started = cls.ovsdbStartup( pending )
+            failed.update( set( pending ) - set( started ) )
+        # Bridges to create using ovs-vsctl
+        queued = [ s for s in switches if s.commands ]
+        for switch in queued:
             if switch.isOldOVS():
                 # Ideally we'd optimize this also
                 run( 'ovs-vsctl del-br %s' % switch )
-            for cmd in switch.commands:
-                cmd = cmd.strip()
-                # Don't exceed ARG_MAX
-                if len( cmds ) + len( cmd ) >= cls.argmax:
-                    run( cmds, shell=True )
-                    cmds = 'ovs-vsctl'
-                cmds += ' ' + cmd
-                switch.cmds = []
-                switch.batch = False
-        if cmds:
-            run( cmds, shell=True )
+
+        def runChunk( chunk ):
+            """Run a chunk, then find any bad switches if it failed
+               returns: [ ( bad switch, error output ) ]"""
+            chunkSwitches, line = chunk
+            result = run( line, shell=True )
+            if not cls.vsctlFailed( result ):
+                return []
+            if len( chunkSwitches ) > 1:
+                # ovs-vsctl is atomic, so nothing was applied;
+                # retry each switch on its own
+                return sum( ( runChunk( cls.vsctlChunks( [ s ] )[ 0 ] )
+                              for s in chunkSwitches ), [] )
+            output = result[ 1 ] if isinstance( result, tuple ) else result
+            return [ ( chunkSwitches[ 0 ], output ) ]
+        if run is not errRun:
+            parallel = 1
+        chunks = cls.vsctlChunks( queued, parallel )
+        for bad in runParallel( runChunk, chunks, parallel ):
+            for switch, output in bad:
+                error( '*** Error creating bridge %s: %s\n' %
+                       ( switch, output.strip() ) )
+                failed.add( switch )
+        for switch in queued:
+            switch.commands = []
+            switch.batch = False
+        started = [ s for s in switches if s not in failed ]
+        # Move internal ports to their nodes
+        moveOVSInternalIntfs( [ port for switch in started
+                                for port in switch.internalPorts() ] )
         # Reapply link config if necessary...
-        for switch in switches:
-            for intf in switch.intfs.values():
-                if isinstance( intf, TCIntf ):
-                    intf.config( **intf.params )
-        return switches
+        cls.batchTCReapply( [ intf for switch in started
+                              for intf in switch.intfs.values() ] )
+        return started
 
     def stop( self, deleteIntfs=True ):
         """Terminate OVS switch.
            deleteIntfs: delete interfaces? (True)"""
-        self.cmd( 'ovs-vsctl del-br', self )
+        if self.ovsdb():
+            self.batchDelete( [ self ] )
+        else:
+            self.cmd( 'ovs-vsctl del-br', self )
         if self.datapath == 'user':
             self.cmd( 'ip link del', self )
         super( OVSSwitch, self ).stop( deleteIntfs )
 
+    def resources( self ):
+        "Return resources we have created, including our bridge"
+        resources = super( OVSSwitch, self ).resources()
+        resources.append( ( 'bridge', self.name ) )
+        if self.datapath == 'user':
+            resources.append( ( 'intf', self.name ) )
+        return resources
+
     @classmethod
-    def batchShutdown( cls, switches, run=errRun ):
-        "Shut down a list of OVS switches"
+    def batchDelete( cls, switches, run=errRun ):
+        "Delete a list of OVS switches' bridges in one transaction"
+        # ( Subclasses, e.g. remote switches, may not use ovsdb )
+        if switches and switches[ 0 ].ovsdb():
+            old = cls.bridgeUUIDs( switches ).values()
+            if old:
+                cls.ovsdbTransact( [ {
+                    'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                    'mutations': [ [ 'bridges', 'delete',
+                                     ovsSet( old ) ] ] } ] )
+            return
         delcmd = 'del-br %s'
         if switches and not switches[ 0 ].isOldOVS():
             delcmd = '--if-exists ' + delcmd
-        # First, delete them all from ovsdb
         run( 'ovs-vsctl ' +
              ' -- '.join( delcmd % s for s in switches ) )
+
+    @classmethod
+    def batchShutdown( cls, switches, run=errRun ):
+        "Shut down a list of OVS switches"
+        # First, delete them all from ovsdb
+        cls.batchDelete( switches, run=run )
         # Next, shut down all of the processes
         pids = ' '.join( str( switch.pid ) for switch in switches )
         run( 'kill -HUP ' + pids )
@@ -1306,6 +2495,16 @@ def connected( self ):
         else:
             return True
 
+    @classmethod
+    def batchConnected( cls, switches, run=errRun ):
+        "Are we forwarding yet? (STP state isn't in ovsdb)"
+        return [ s for s in switches if s.connected() ]
+
+    @classmethod
+    def connectionEvents( cls, switches ):
+        "We have no controller connections to monitor"
+        return None
+
 
 class IVSSwitch( Switch ):
     "Indigo Virtual Switch"
@@ -1361,6 +2560,11 @@ def stop( self, deleteIntfs=True ):
         self.cmd( 'wait' )
         super( IVSSwitch, self ).stop( deleteIntfs )
 
+    def resources( self ):
+        "Return resources we have created, including our log"
+        return ( super( IVSSwitch, self ).resources() +
+                 [ ( 'file', '/tmp/ivs.%s.log' % self.name ) ] )
+
     def attach( self, intf ):
         "Connect a data port"
         self.cmd( 'ivs-ctl', 'add-port', '--datapath', self.name, intf )
@@ -1387,6 +2591,7 @@ def __init__( self, name, inNamespace=False, command='controller',
         self.command = command
         self.cargs = cargs
         self.cdir = cdir
+        self.controllerPid = None
         # Accept 'ip:port' syntax as shorthand
         if ':' in ip:
             ip, port = ip.split( ':' )
@@ -1425,6 +2630,7 @@ def start( self ):
             self.cmd( 'cd ' + self.cdir )
         self.cmd( self.command + ' ' + self.cargs % self.port +
                   ' 1>' + cout + ' 2>' + cout + ' &' )
+        self.controllerPid = self.lastPid
         self.execed = False
 
     def stop( self, *args, **kwargs ):
@@ -1433,6 +2639,13 @@ def stop( self, *args, **kwargs ):
         self.cmd( 'wait %' + self.command )
         super( Controller, self ).stop( *args, **kwargs )
 
+    def resources( self ):
+        "Return resources we have created, including our controller"
+        resources = super( Controller, self ).resources()
+        if self.controllerPid:
+            resources.append( pidResource( self.controllerPid ) )
+        return resources + [ ( 'file', '/tmp/%s.log' % self.name ) ]
+
     def IP( self, intf=None ):
         "Return IP address of the Controller"
         if self.intfs:
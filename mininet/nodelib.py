@@ -53,6 +53,13 @@ def stop( self, deleteIntfs=True ):
         self.cmd( 'brctl delbr', self )
         super( LinuxBridge, self ).stop( deleteIntfs )
 
+    def resources( self ):
+        "Return resources we have created, including our bridge"
+        resources = super( LinuxBridge, self ).resources()
+        if not self.inNamespace:
+            resources.append( ( 'intf', self.name ) )
+        return resources
+
     def dpctl( self, *args ):
         "Run brctl command"
         return self.cmd( 'brctl', *args )
@@ -0,0 +1,354 @@
+"""
+ovsdb.py: native OVSDB client for Mininet
+
+OVSSwitch normally configures Open vSwitch by running ovs-vsctl, which
+costs a process (and a round trip to ovsdb-server) per command string,
+and limits batching to what fits on a command line. This module
+instead speaks OVSDB's JSON-RPC protocol (RFC 7047) directly, over
+ovsdb-server's unix socket:
+
+    db = OVSDB()  # or OVSDB( 'unix:/path/to/db.sock' )
+    bridges = db.select( 'Bridge', [ 'name', '_uuid' ] )
+    db.transact( { 'op': 'insert', 'table': 'Controller',
+                   'row': { 'target': 'tcp:127.0.0.1:6653' } }, ... )
+    db.monitor( { 'Controller': [ 'is_connected' ] } )
+    updates = db.waitUpdates( timeout=1 )
+
+OVSDB: JSON-RPC connection to an ovsdb-server, with methods to run
+    transactions and to monitor tables
+
+OVSDBError: error returned by ovsdb-server
+
+namedUUID(), ovsSet(), ovsMap(), setMembers() and mapDict() convert
+between Python values and OVSDB's JSON notation, and reconfigure()
+returns the operations which ask ovs-vswitchd to apply a transaction
+(which OVSDB.waitConfigured() waits for), as ovs-vsctl does.
+
+OVSSwitch uses localOVSDB() to start, stop, attach and detach
+switches with (batched) transactions, falling back to ovs-vsctl
+if ovsdb-server's socket is not available.
+"""
+
+import codecs
+import json
+import os
+import select
+import socket
+from collections import deque
+from threading import Lock
+
+from mininet.log import debug
+from mininet.util import monotonic
+
+
+class OVSDBError( Exception ):
+    "Error returned by ovsdb-server in response to a request"
+    pass
+
+
+def defaultSocket():
+    "Return ovsdb-server's default socket (respecting OVS_RUNDIR)"
+    rundir = os.environ.get( 'OVS_RUNDIR', '/var/run/openvswitch' )
+    return 'unix:' + os.path.join( rundir, 'db.sock' )
+
+
+# OVSDB JSON notation
+
+def namedUUID( name ):
+    "Return reference to a row inserted in the same transaction"
+    return [ 'named-uuid', name ]
+
+def ovsSet( values ):
+    "Return OVSDB set of values"
+    return [ 'set', list( values ) ]
+
+def ovsMap( d ):
+    "Return OVSDB map from dict d"
+    return [ 'map', [ [ k, v ] for k, v in sorted( d.items() ) ] ]
+
+def setMembers( value ):
+    "Return the members of an OVSDB set (or single atom)"
+    if isinstance( value, list ) and value and value[ 0 ] == 'set':
+        return value[ 1 ]
+    return [ value ]
+
+def mapDict( value ):
+    "Return dict from OVSDB map"
+    return dict( value[ 1 ] )
+
+def reconfigure():
+    """Return operations which ask ovs-vswitchd to apply a transaction
+       (the last returns the Open_vSwitch row's new next_cfg)"""
+    return [ { 'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+               'mutations': [ [ 'next_cfg', '+=', 1 ] ] },
+             { 'op': 'select', 'table': 'Open_vSwitch', 'where': [],
+               'columns': [ 'next_cfg' ] } ]
+
+
+class OVSDB( object ):
+    """JSON-RPC connection to an ovsdb-server. Requests may be
+       pipelined: request() sends a request and returns its id,
+       and wait() waits for its response, while call() does both.
+       Methods raise OVSDBError on failure."""
+
+    recvSize = 65536
+
+    def __init__( self, remote=None, db='Open_vSwitch', timeout=10,
+                  sock=None ):
+        """remote: unix:path or tcp:host:port (defaultSocket())
+           db: database name
+           timeout: seconds to wait for a response
+           sock: connected socket to use (e.g. for testing)"""
+        self.remote = remote or defaultSocket()
+        self.db = db
+        self.timeout = timeout
+        self.sock = sock
+        self.buf = ''
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder( 'utf-8' )()
+        self.nextId = 0
+        self.responses = {}  # id -> response
+        self.updates = deque()  # ( monitor id, table updates )
+        self.lock = Lock()
+
+    def connect( self ):
+        "Connect to ovsdb-server if we haven't already"
+        if self.sock is not None:
+            return
+        kind, _, address = self.remote.partition( ':' )
+        if kind == 'unix':
+            sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        elif kind == 'tcp':
+            host, port = address.rsplit( ':', 1 )
+            address = ( host, int( port ) )
+            sock = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        else:
+            raise ValueError( 'unsupported OVSDB remote %s' % self.remote )
+        try:
+            sock.connect( address )
+        except:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def close( self ):
+        "Close our connection"
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.buf = ''
+        self.utf8.reset()
+
+    def send( self, msg ):
+        "Send a JSON-RPC message"
+        self.sock.sendall( json.dumps( msg ).encode() )
+
+    def request( self, method, *params ):
+        """Send a request without waiting for its response
+           returns: request id (see wait())"""
+        with self.lock:
+            self.connect()
+            rid = self.nextId
+            self.nextId += 1
+            self.send( { 'method': method, 'params': list( params ),
+                         'id': rid } )
+        return rid
+
+    def parse( self ):
+        "Return the next complete message in our buffer, or None"
+        self.buf = self.buf.lstrip()
+        if not self.buf:
+            return None
+        try:
+            msg, end = self.decoder.raw_decode( self.buf )
+        except ValueError:
+            # Incomplete message
+            return None
+        self.buf = self.buf[ end: ]
+        return msg
+
+    def receive( self, deadline ):
+        """Receive and dispatch one message
+           deadline: monotonic() time to give up (None to block)
+           returns: False if we timed out"""
+        msg = self.parse()
+        while msg is None:
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                # poll(), since select() fails for large fds
+                poller = select.poll()
+                poller.register( self.sock, select.POLLIN )
+                if not poller.poll( remaining * 1000 ):
+                    return False
+            data = self.sock.recv( self.recvSize )
+            if not data:
+                self.close()
+                raise OVSDBError( 'connection to %s closed' % self.remote )
+            self.buf += self.utf8.decode( data )
+            msg = self.parse()
+        self.dispatch( msg )
+        return True
+
+    def dispatch( self, msg ):
+        "Handle a message from ovsdb-server"
+        method = msg.get( 'method' )
+        if method == 'echo':
+            # Keepalive: reply or ovsdb-server will disconnect us
+            self.send( { 'result': msg[ 'params' ], 'error': None,
+                         'id': msg[ 'id' ] } )
+        elif method == 'update':
+            monitorId, tableUpdates = msg[ 'params' ][ :2 ]
+            self.updates.append( ( monitorId, tableUpdates ) )
+        elif method is None:
+            self.responses[ msg.get( 'id' ) ] = msg
+
+    def wait( self, rid, timeout=None ):
+        """Wait for the response to a request
+           rid: request id from request()
+           timeout: seconds to wait (self.timeout)
+           returns: request's result"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = monotonic() + timeout
+        with self.lock:
+            while rid not in self.responses:
+                if not self.receive( deadline ):
+                    raise OVSDBError( 'timed out waiting for %s' %
+                                      self.remote )
+            response = self.responses.pop( rid )
+        if response.get( 'error' ) is not None:
+            raise OVSDBError( response[ 'error' ] )
+        return response[ 'result' ]
+
+    def call( self, method, *params ):
+        "Send a request and return its result"
+        return self.wait( self.request( method, *params ) )
+
+    @staticmethod
+    def checkResults( ops, results ):
+        """Raise OVSDBError if a transaction failed
+           returns: results"""
+        for i, result in enumerate( results ):
+            if result and 'error' in result:
+                op = ops[ i ][ 'op' ] if i < len( ops ) else 'commit'
+                raise OVSDBError( '%s: %s: %s' % (
+                    op, result[ 'error' ], result.get( 'details', '' ) ) )
+        return results
+
+    def transactAsync( self, *ops ):
+        """Send a transaction without waiting for its result
+           returns: request id (see transactWait())"""
+        return self.request( 'transact', self.db, *ops )
+
+    def transactWait( self, rid, ops, timeout=None ):
+        """Wait for the result of a transaction sent by transactAsync()
+           ops: the transaction's operations
+           returns: list of results, one per operation"""
+        return self.checkResults( ops, self.wait( rid, timeout ) )
+
+    def transact( self, *ops ):
+        """Run a transaction
+           ops: operations (dicts, see RFC 7047)
+           returns: list of results, one per operation"""
+        return self.transactWait( self.transactAsync( *ops ), ops )
+
+    def select( self, table, columns=None, where=None ):
+        """Select rows
+           table: table name
+           columns: list of columns (default all)
+           where: list of conditions (default all rows)
+           returns: list of rows (dicts)"""
+        op = { 'op': 'select', 'table': table, 'where': where or [] }
+        if columns is not None:
+            op[ 'columns' ] = list( columns )
+        return self.transact( op )[ 0 ][ 'rows' ]
+
+    def monitor( self, tables, monitorId=None ):
+        """Monitor tables for changes, which waitUpdates() returns
+           tables: { table: list of columns (or None for all) }
+           monitorId: id for this monitor (default: tables' names)
+           returns: initial table contents, as a table update:
+               { table: { uuid: { 'new': row } } }"""
+        requests = {}
+        for table, columns in tables.items():
+            requests[ table ] = {} if columns is None else {
+                'columns': list( columns ) }
+        if monitorId is None:
+            monitorId = ','.join( sorted( tables ) )
+        return self.call( 'monitor', self.db, monitorId, requests )
+
+    def cancelMonitor( self, monitorId ):
+        "Stop monitoring"
+        self.call( 'monitor_cancel', monitorId )
+
+    def waitUpdates( self, timeout=None, monitorId=None ):
+        """Wait for monitor updates
+           timeout: seconds to wait, or None to wait indefinitely
+           monitorId: only return updates for this monitor
+           returns: list of ( monitor id, table updates ), empty if
+               we timed out"""
+        deadline = None if timeout is None else monotonic() + timeout
+
+        def matching():
+            "Return and remove matching updates"
+            updates = [ u for u in self.updates
+                        if monitorId is None or u[ 0 ] == monitorId ]
+            for update in updates:
+                self.updates.remove( update )
+            return updates
+        with self.lock:
+            updates = matching()
+            while not updates and self.receive( deadline ):
+                updates = matching()
+        return updates
+
+    def waitConfigured( self, nextCfg, timeout=None ):
+        """Wait for ovs-vswitchd to apply configuration nextCfg (see
+           reconfigure()), as ovs-vsctl does unless --no-wait
+           nextCfg: next_cfg value from reconfigure()'s select
+           timeout: seconds to wait (self.timeout)
+           returns: True if ovs-vswitchd caught up in time"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = monotonic() + timeout
+        monitorId = 'cur_cfg-%d' % nextCfg
+        initial = self.monitor( { 'Open_vSwitch': [ 'cur_cfg' ] },
+                                monitorId )
+
+        def caughtUp( tableUpdates ):
+            "Has cur_cfg reached nextCfg?"
+            rows = tableUpdates.get( 'Open_vSwitch', {} ).values()
+            return any( row.get( 'new', {} ).get( 'cur_cfg', -1 ) >= nextCfg
+                        for row in rows )
+        done = caughtUp( initial )
+        try:
+            while not done:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                for _mid, tableUpdates in self.waitUpdates( remaining,
+                                                             monitorId ):
+                    done = done or caughtUp( tableUpdates )
+        finally:
+            self.cancelMonitor( monitorId )
+        return done
+
+
+# Shared connection to the local ovsdb-server
+
+_localOVSDB = None
+
+def localOVSDB():
+    """Return a shared OVSDB connection to the local ovsdb-server,
+       or None if its socket is unavailable (we try again next time,
+       since ovsdb-server may not have started yet)"""
+    global _localOVSDB  # pylint: disable=global-statement
+    if _localOVSDB is None:
+        db = OVSDB()
+        try:
+            db.connect()
+            _localOVSDB = db
+        except ( OSError, IOError, socket.error ) as e:
+            debug( '*** Cannot connect to ovsdb-server at %s (%s); '
+                   'using ovs-vsctl\n' % ( db.remote, e ) )
+    return _localOVSDB
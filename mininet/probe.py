@@ -0,0 +1,342 @@
+"""
+probe.py: readiness probes for Mininet
+
+Starting a network involves waiting for things which happen
+asynchronously: a server starts listening, a daemon creates its
+socket, a switch connects to its controller. Rather than sleeping for
+a fixed time (too long, or occasionally too short) or polling at a
+fixed rate, we wait with a probe:
+
+    if not TCPProbe( server.IP(), 80, node=client ).wait( timeout=5 ):
+        error( 'server is not listening\n' )
+
+A probe checks whether its condition is true, and if not sleeps and
+checks again, backing off exponentially from initial to maximum
+seconds between checks, until its condition is true or its deadline
+passes. Where possible, a probe's sleep wakes up early when an event
+tells us that its condition may have changed.
+
+Probe: base class; subclasses override ready() and optionally
+    start(), sleep() and close()
+
+FuncProbe: waits for a function to return True, optionally waking up
+    on another probe's events
+
+TCPProbe: waits until a TCP connection succeeds, connecting from
+    inside a node's network namespace
+
+tcpConnect: tries a TCP connection from a network namespace
+
+FileProbe: waits for a file (such as a unix socket) to exist,
+    using inotify to notice it as soon as it is created
+
+OVSDBProbe: waits for rows in ovsdb-server to satisfy a predicate,
+    using an OVSDB monitor to notice changes
+
+ProbeFailed: raised by ready() if the condition can never become true
+"""
+
+import errno
+import os
+import select
+import socket
+from time import sleep
+
+from mininet.log import debug
+from mininet.netlink import nsOpen
+from mininet.ovsdb import OVSDBError
+from mininet.util import monotonic
+
+
+class ProbeFailed( Exception ):
+    "A probe's condition can never become true (e.g. no route to host)"
+    pass
+
+
+class Probe( object ):
+    """Wait for a condition, with a deadline and exponential backoff.
+       Each probe is good for one wait()."""
+
+    def __init__( self, initial=.01, maximum=.5 ):
+        """initial: seconds to sleep after the first check
+           maximum: maximum seconds to sleep between checks"""
+        self.initial = min( initial, maximum )
+        self.maximum = maximum
+        self.failure = None
+
+    def start( self ):
+        "Prepare to wait (e.g. subscribe to events) before the first check"
+        pass
+
+    def ready( self ):
+        """Check our condition
+           returns: True if it is true
+           raises: ProbeFailed if it can never become true"""
+        raise NotImplementedError
+
+    def sleep( self, timeout ):
+        """Sleep for up to timeout seconds; subclasses may return
+           early when an event may have made us ready"""
+        sleep( timeout )
+
+    def close( self ):
+        "Release anything we used to wait"
+        pass
+
+    def wait( self, timeout=None ):
+        """Wait until we are ready
+           timeout: seconds to wait, or None to wait indefinitely
+           returns: True if we became ready in time; if not, failure
+               is set to the ProbeFailed exception, if any"""
+        deadline = None if timeout is None else monotonic() + timeout
+        interval = self.initial
+        try:
+            self.start()
+            while not self.ready():
+                pause = interval
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        return False
+                    pause = min( pause, remaining )
+                self.sleep( pause )
+                interval = min( interval * 2, self.maximum )
+            return True
+        except ProbeFailed as e:
+            debug( 'probe failed: %s\n' % e )
+            self.failure = e
+            return False
+        finally:
+            self.close()
+
+
+class FuncProbe( Probe ):
+    "Wait for a function to return True"
+
+    def __init__( self, fn, events=None, **kwargs ):
+        """fn: function to call, which may raise ProbeFailed
+           events: probe whose sleep() wakes us when fn's result
+               may have changed (optional)
+           kwargs: see Probe"""
+        Probe.__init__( self, **kwargs )
+        self.fn = fn
+        self.events = events
+
+    def start( self ):
+        "Start listening for events"
+        if self.events:
+            self.events.start()
+
+    def ready( self ):
+        "Does fn() return True?"
+        return bool( self.fn() )
+
+    def sleep( self, timeout ):
+        "Sleep until timeout or an event"
+        if self.events:
+            self.events.sleep( timeout )
+        else:
+            sleep( timeout )
+
+    def close( self ):
+        "Stop listening for events"
+        if self.events:
+            self.events.close()
+
+
+def waitFor( fn, timeout=None, **kwargs ):
+    """Wait for fn() to return True
+       timeout: seconds to wait, or None to wait indefinitely
+       kwargs: see FuncProbe
+       returns: True if fn() returned True in time"""
+    return FuncProbe( fn, **kwargs ).wait( timeout )
+
+
+# Errors which mean we will never connect (as telnet's "No route to
+# host"); ENETUNREACH may just mean routes aren't set up yet
+unreachable = ( errno.EHOSTUNREACH, )
+
+def tcpConnect( ip, port, pid=None, timeout=1 ):
+    """Try to make a TCP connection from a network namespace, without
+       forking a client
+       ip: server's IP address
+       port: server's TCP port
+       pid: pid of a process in the namespace (default: root namespace)
+       timeout: seconds to wait for the connection
+       returns: True if we connected
+       raises: ProbeFailed if we will never connect"""
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    sock = nsOpen( pid, family, socket.SOCK_STREAM )
+    try:
+        sock.settimeout( timeout )
+        sock.connect( ( ip, port ) )
+        return True
+    except socket.timeout:
+        return False
+    except socket.error as e:
+        if e.errno in unreachable:
+            raise ProbeFailed( 'no route to %s' % ip )
+        if e.errno in ( errno.ECONNREFUSED, errno.ECONNRESET,
+                        errno.ETIMEDOUT, errno.ENETUNREACH ):
+            return False
+        raise
+    finally:
+        sock.close()
+
+
+class TCPProbe( Probe ):
+    "Wait until a TCP server accepts connections"
+
+    def __init__( self, ip, port, node=None, connectTimeout=1, **kwargs ):
+        """ip: server's IP address
+           port: server's TCP port
+           node: node to connect from (default: root namespace);
+               see Node.canConnect()
+           connectTimeout: seconds to wait for each connection
+           kwargs: see Probe"""
+        Probe.__init__( self, **kwargs )
+        self.ip = ip
+        self.port = port
+        self.node = node
+        self.connectTimeout = connectTimeout
+
+    def ready( self ):
+        "Can we connect?"
+        if self.node:
+            return self.node.canConnect( self.ip, self.port,
+                                         timeout=self.connectTimeout )
+        return tcpConnect( self.ip, self.port, timeout=self.connectTimeout )
+
+
+# inotify (see inotify(7)); Python has no binding, so we use ctypes
+
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+def inotifyWatch( path, mask ):
+    """Watch a directory with inotify
+       path: directory to watch
+       mask: events to watch for
+       returns: inotify fd, or None if unavailable"""
+    try:
+        import ctypes
+        libc = ctypes.CDLL( None, use_errno=True )
+        fd = libc.inotify_init1( IN_NONBLOCK | IN_CLOEXEC )
+    except ( OSError, AttributeError ):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch( fd, path.encode(), mask ) < 0:
+        debug( 'inotify_add_watch %s: %s\n' % (
+            path, os.strerror( ctypes.get_errno() ) ) )
+        os.close( fd )
+        return None
+    return fd
+
+
+class FileProbe( Probe ):
+    """Wait for a file (e.g. a daemon's unix socket) to exist,
+       waking up as soon as it appears if inotify is available"""
+
+    def __init__( self, path, **kwargs ):
+        """path: file to wait for
+           kwargs: see Probe"""
+        Probe.__init__( self, **kwargs )
+        self.path = path
+        self.fd = None
+
+    def start( self ):
+        "Watch our directory before the first check, so we can't miss it"
+        directory = os.path.dirname( os.path.abspath( self.path ) )
+        self.fd = inotifyWatch( directory, IN_CREATE | IN_MOVED_TO )
+
+    def ready( self ):
+        "Does our file exist?"
+        return os.path.exists( self.path )
+
+    def sleep( self, timeout ):
+        "Sleep until timeout or something is created in our directory"
+        if self.fd is None:
+            sleep( timeout )
+            return
+        poller = select.poll()
+        poller.register( self.fd, select.POLLIN )
+        if poller.poll( timeout * 1000 ):
+            # Discard the events; ready() will check our file
+            try:
+                while os.read( self.fd, 4096 ):
+                    pass
+            except OSError:
+                pass
+
+    def close( self ):
+        "Stop watching"
+        if self.fd is not None:
+            os.close( self.fd )
+            self.fd = None
+
+
+class OVSDBProbe( Probe ):
+    """Wait for rows in ovsdb-server to satisfy a predicate, waking up
+       when an OVSDB monitor reports changes. With no predicate, this
+       is useful as FuncProbe's events."""
+
+    def __init__( self, db, tables, predicate=None, **kwargs ):
+        """db: OVSDB connection
+           tables: { table: list of columns } to monitor
+           predicate: function of rows, { table: { uuid: row } }
+           kwargs: see Probe"""
+        Probe.__init__( self, **kwargs )
+        self.db = db
+        self.tables = tables
+        self.predicate = predicate
+        self.rows = {}
+        self.monitorId = None
+
+    def start( self ):
+        "Start monitoring"
+        monitorId = 'probe-%x' % id( self )
+        try:
+            initial = self.db.monitor( self.tables, monitorId )
+        except ( OVSDBError, OSError, IOError, socket.error ) as e:
+            # Fall back to polling
+            debug( 'OVSDBProbe: %s\n' % e )
+            return
+        self.monitorId = monitorId
+        self.update( initial )
+
+    def update( self, tableUpdates ):
+        "Apply a monitor update to our rows"
+        for table, rows in tableUpdates.items():
+            ours = self.rows.setdefault( table, {} )
+            for uuid, change in rows.items():
+                if change.get( 'new' ) is None:
+                    ours.pop( uuid, None )
+                else:
+                    ours.setdefault( uuid, {} ).update( change[ 'new' ] )
+
+    def ready( self ):
+        "Do our rows satisfy our predicate?"
+        return bool( self.predicate( self.rows ) ) if self.predicate else True
+
+    def sleep( self, timeout ):
+        "Sleep until timeout or an update"
+        if self.monitorId is None:
+            sleep( timeout )
+            return
+        for _mid, tableUpdates in self.db.waitUpdates( timeout,
+                                                       self.monitorId ):
+            self.update( tableUpdates )
+
+    def close( self ):
+        "Stop monitoring, and discard any updates we didn't read"
+        if self.monitorId is None:
+            return
+        try:
+            self.db.cancelMonitor( self.monitorId )
+            self.db.waitUpdates( 0, self.monitorId )
+        except ( OVSDBError, OSError, IOError, socket.error ) as e:
+            debug( 'OVSDBProbe: %s\n' % e )
+        self.monitorId = None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test asyncio coroutines for running commands on nodes."""
+
+import os
+import sys
+import unittest
+
+from mininet.node import Host
+
+
+@unittest.skipUnless( sys.version_info[ 0 ] == 3, 'requires Python 3' )
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+class testAio( unittest.TestCase ):
+    "Test Node.acmd() and Node.apexec()"
+
+    def setUp( self ):
+        self.nodes = [ Host( 'h%d' % i ) for i in ( 1, 2 ) ]
+
+    def tearDown( self ):
+        for node in self.nodes:
+            node.terminate()
+
+    @staticmethod
+    def gather( *coroutines ):
+        "Run coroutines concurrently and return their results"
+        import asyncio
+
+        async def main():
+            "Gather results"
+            return await asyncio.gather( *coroutines )
+        return asyncio.run( main() )
+
+    def testAcmd( self ):
+        "acmd() returns each node's output"
+        h1, h2 = self.nodes
+        out1, out2 = self.gather(
+            h1.acmd( 'sleep .2; echo one; echo $((1+1))' ),
+            h2.acmd( 'echo two' ) )
+        self.assertEqual( 'one\r\n2\r\n', out1 )
+        self.assertEqual( 'two\r\n', out2 )
+        # The nodes are ready for synchronous commands again
+        self.assertFalse( h1.waiting )
+        self.assertEqual( 'three\r\n', h1.cmd( 'echo three' ) )
+
+    def testApexec( self ):
+        "apexec() returns output, error output and exit code"
+        h1, h2 = self.nodes
+        result1, result2 = self.gather(
+            h1.apexec( 'sh', '-c', 'echo out; echo err >&2; exit 3' ),
+            h2.apexec( 'true' ) )
+        self.assertEqual( ( 'out\n', 'err\n', 3 ), tuple( result1 ) )
+        self.assertEqual( ( '', '', 0 ), tuple( result2 ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
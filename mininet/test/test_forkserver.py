@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test fork server used by Node.popen()."""
+
+import gc
+import os
+import resource
+import signal
+import sys
+import unittest
+from subprocess import Popen, PIPE, STDOUT
+from threading import Thread
+
+
+class LocalNode( object ):
+    "Stand-in for a Node whose popen() runs commands locally"
+
+    pid = os.getpid()
+
+    @staticmethod
+    def popen( cmd, mncmd=None, **kwargs ):
+        "Run cmd locally, ignoring mncmd"
+        return Popen( cmd, **kwargs )
+
+    def __str__( self ):
+        return 'local'
+
+
+if sys.version_info[ 0 ] == 3:
+    from mininet.forkserver import ForkServer
+
+
+@unittest.skipUnless( sys.version_info[ 0 ] == 3, 'requires Python 3' )
+class testForkServer( unittest.TestCase ):
+    "Test ForkServer and ForkPopen"
+
+    def setUp( self ):
+        self.server = ForkServer( LocalNode() )
+
+    def tearDown( self ):
+        self.server.stop()
+
+    def testCommunicate( self ):
+        "Run a command and collect its output and exit status"
+        popen = self.server.popen( [ 'sh', '-c', 'echo out; echo err >&2;'
+                                     'exit 3' ], stdout=PIPE, stderr=PIPE )
+        out, err = popen.communicate()
+        self.assertEqual( ( b'out\n', b'err\n', 3 ),
+                          ( out, err, popen.returncode ) )
+
+    def testInputAndMergedOutput( self ):
+        "Send input to a command and merge its stderr with stdout"
+        popen = self.server.popen( [ 'sh', '-c', 'cat; echo err >&2' ],
+                                   stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+        out, err = popen.communicate( b'in\n' )
+        self.assertEqual( ( b'in\nerr\n', None ), ( out, err ) )
+        self.assertEqual( 0, popen.returncode )
+
+    def testCwdAndEnv( self ):
+        "Run a command in a given directory with a given environment"
+        popen = self.server.popen( [ 'sh', '-c', 'echo $FOO; pwd' ],
+                                   stdout=PIPE, cwd='/',
+                                   env={ 'FOO': 'bar', 'PATH':
+                                         os.environ[ 'PATH' ] } )
+        self.assertEqual( b'bar\n/\n', popen.communicate()[ 0 ] )
+
+    def testSignal( self ):
+        "Kill a running command and collect its exit status"
+        popen = self.server.popen( [ 'sleep', '100' ] )
+        self.assertEqual( None, popen.poll() )
+        popen.kill()
+        self.assertEqual( -signal.SIGKILL, popen.wait() )
+
+    def testBlockingWait( self ):
+        "A blocking wait() doesn't hold up spawn() or poll()"
+        sleeper = self.server.popen( [ 'sleep', '100' ] )
+        waiter = Thread( target=sleeper.wait )
+        waiter.start()
+        try:
+            popen = self.server.popen( [ 'true' ] )
+            self.assertEqual( 0, popen.wait() )
+            self.assertEqual( None, sleeper.poll() )
+        finally:
+            sleeper.kill()
+            waiter.join()
+        self.assertEqual( -signal.SIGKILL, sleeper.returncode )
+
+    def testForgottenCommands( self ):
+        "We don't keep exit status nobody can wait for"
+        for _ in range( 10 ):
+            self.server.popen( [ 'true' ] )
+        gc.collect()
+        self.assertEqual( 0, self.server.popen( [ 'true' ] ).wait() )
+        self.assertEqual( [], list( self.server.running ) )
+
+    def testHighFd( self ):
+        "poll() works when our socket's fd is above select()'s limit"
+        soft, hard = resource.getrlimit( resource.RLIMIT_NOFILE )
+        if hard != resource.RLIM_INFINITY and hard < 2048:
+            self.skipTest( 'fd limit is too low' )
+        resource.setrlimit( resource.RLIMIT_NOFILE, ( 2048, hard ) )
+        fds = [ os.open( os.devnull, os.O_RDONLY ) for _ in range( 1100 ) ]
+        server = ForkServer( LocalNode() )
+        try:
+            self.assertGreater( server.sock.fileno(), 1024 )
+            popen = server.popen( [ 'sleep', '100' ] )
+            self.assertEqual( None, popen.poll() )
+            popen.kill()
+            self.assertEqual( -signal.SIGKILL, popen.wait() )
+        finally:
+            server.stop()
+            for fd in fds:
+                os.close( fd )
+            resource.setrlimit( resource.RLIMIT_NOFILE, ( soft, hard ) )
+
+    def testMnexecOptions( self ):
+        "Commands needing other mnexec options are left to mnexec"
+        mncmd = [ 'mnexec', '-da', str( os.getpid() ) ]
+        self.assertTrue( self.server.canSpawn( { 'mncmd': mncmd } ) )
+        self.assertFalse( self.server.canSpawn(
+            { 'mncmd': [ 'mnexec', '-g', 'h1' ] + mncmd[ 1: ] } ) )
+        self.assertFalse( self.server.canSpawn(
+            { 'mncmd': mncmd + [ '-r', '20' ] } ) )
+        self.assertFalse( self.server.canSpawn( { 'shell': True } ) )
+
+    def testNoSuchCommand( self ):
+        "Spawning a nonexistent command raises OSError"
+        self.assertRaises( OSError, self.server.popen,
+                           [ 'mininet-no-such-command' ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test recording and replaying resource journals."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from subprocess import Popen
+
+from mininet.journal import ( Journal, journals, readJournals, replay,
+                              pidResource, startTime )
+
+
+class testJournal( unittest.TestCase ):
+    "Test Journal and replay() on processes and files"
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.directory )
+
+    def testRecord( self ):
+        "Resources are recorded once, and close() removes the journal"
+        journal = Journal( self.directory )
+        journal.record( [ ( 'bridge', 's1' ), ( 'intf', 's1-eth1' ) ] )
+        journal.record( [ ( 'bridge', 's1' ), ( 'file', '/tmp/c0.log' ) ] )
+        paths = journals( self.directory )
+        self.assertEqual( [ journal.path ], paths )
+        self.assertEqual( { 'bridge': [ [ 's1' ] ],
+                            'intf': [ [ 's1-eth1' ] ],
+                            'file': [ [ '/tmp/c0.log' ] ] },
+                          readJournals( paths ) )
+        journal.close()
+        self.assertEqual( [], journals( self.directory ) )
+
+    def testReplay( self ):
+        """Recorded processes and files are removed, reused pids are not,
+           and running Mininets' journals are left alone"""
+        victim = Popen( [ 'sleep', '100' ] )
+        survivor = Popen( [ 'sleep', '100' ] )
+        filename = os.path.join( self.directory, 'h1.log' )
+        open( filename, 'w' ).close()
+        journal = Journal( self.directory )
+        journal.record( [ pidResource( victim.pid ),
+                          ( 'pid', survivor.pid,
+                            startTime( survivor.pid ) + 1 ),
+                          ( 'file', filename ) ] )
+        # Simulate a crash: the journal is left behind
+        journal.fd = None
+        try:
+            # We wrote it, so it's only replayed if forced
+            self.assertEqual( [], replay( journals( self.directory ) ) )
+            self.assertIsNone( victim.poll() )
+            self.assertTrue( os.path.exists( filename ) )
+            replay( journals( self.directory ), force=True )
+            self.assertEqual( -9, victim.wait() )
+            self.assertIsNone( survivor.poll() )
+            self.assertFalse( os.path.exists( filename ) )
+            self.assertEqual( [], journals( self.directory ) )
+        finally:
+            for proc in victim, survivor:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test trace parsing and scheduling for LinkTraceScheduler."""
+
+import unittest
+
+from mininet.link import TCIntf
+from mininet.linktrace import LinkTraceScheduler, parseTrace
+
+
+def fakeIntf( name, node, **params ):
+    "Return a TCIntf which has no interface behind it"
+    intf = TCIntf.__new__( TCIntf )
+    intf.name, intf.node, intf.params = name, node, params
+    intf.tcCmds = []
+    return intf
+
+
+class RecordingScheduler( LinkTraceScheduler ):
+    "Scheduler which records tc lines rather than running tc"
+
+    def __init__( self, *args, **kwargs ):
+        LinkTraceScheduler.__init__( self, *args, **kwargs )
+        self.applied = []
+
+    def startTC( self, nodes ):
+        pass
+
+    def stopTC( self ):
+        pass
+
+    def apply( self, lines ):
+        self.applied.append( lines )
+
+
+class testLinkTrace( unittest.TestCase ):
+    "Test LinkTraceScheduler without running tc"
+
+    def testParse( self ):
+        "Traces are parsed, sorted and checked"
+        trace = parseTrace( [ '# time params', '',
+                              '0.02 bw=12 delay=25ms',
+                              '0 bw=10 loss=0.5 enable_ecn=True  # start' ] )
+        self.assertEqual( [ ( 0, { 'bw': 10, 'loss': 0.5,
+                                   'enable_ecn': True } ),
+                            ( 0.02, { 'bw': 12, 'delay': '25ms' } ) ],
+                          trace )
+        self.assertRaises( ValueError, parseTrace, [ '0 color=red' ] )
+        self.assertRaises( ValueError, parseTrace, [ 'now bw=1' ] )
+
+    def testSchedule( self ):
+        "Changes are merged by time and become tc change commands"
+        scheduler = RecordingScheduler()
+        intf1 = fakeIntf( 'h1-eth0', 'h1', bw=10 )
+        intf2 = fakeIntf( 'h2-eth0', 'h2' )
+        scheduler.add( intf1, [ ( 0, {} ), ( .01, { 'bw': 5 } ) ] )
+        scheduler.add( intf2, [ ( .01, { 'bw': 20 } ),
+                                ( .02, { 'bw': 20 } ) ] )
+        events = scheduler.schedule()
+        self.assertEqual( [ 0, .01, .02 ], [ e[ 0 ] for e in events ] )
+        lines = events[ 1 ][ 1 ]
+        self.assertEqual( [ 'class change dev h1-eth0 parent 5:0 classid 5:1'
+                            ' htb rate 5.000000Mbit burst 15k' ],
+                          lines[ 'h1' ] )
+        self.assertTrue( lines[ 'h2' ][ 0 ].startswith(
+            'qdisc add dev h2-eth0 root handle 5:0 htb' ) )
+        # Nothing changes at .02
+        self.assertEqual( {}, events[ 2 ][ 1 ] )
+
+    def testRun( self ):
+        "Changes are applied in order and drift is recorded"
+        scheduler = RecordingScheduler()
+        intf = fakeIntf( 'h1-eth0', 'h1' )
+        scheduler.add( intf, [ ( t / 1000.0, { 'bw': t + 1 } )
+                               for t in range( 0, 50, 10 ) ] )
+        scheduler.run()
+        self.assertEqual( 5, len( scheduler.applied ) )
+        stats = scheduler.stats()
+        self.assertEqual( 5, stats[ 'count' ] )
+        self.assertTrue( 0 <= stats[ 'mean' ] <= stats[ 'max' ] )
+        self.assertEqual( 41, intf.params[ 'bw' ] )
+        self.assertIn( 'rate 41.000000Mbit', intf.tcCmds[ 1 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test mnexec's bulk namespace holders."""
+
+import os
+import resource
+import shutil
+import signal
+import tempfile
+import unittest
+from subprocess import Popen, PIPE, check_call
+
+from mininet.util import quietRun
+
+
+SOURCE = os.path.join( os.path.dirname( __file__ ), '..', '..', 'mnexec.c' )
+
+
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+@unittest.skipUnless( quietRun( 'which cc' ), 'requires a C compiler' )
+class testMnexec( unittest.TestCase ):
+    "Test mnexec built from this tree's source"
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.mnexec = os.path.join( self.directory, 'mnexec' )
+        check_call( [ 'cc', '-DVERSION="test"', SOURCE, '-o', self.mnexec ] )
+
+    def tearDown( self ):
+        shutil.rmtree( self.directory )
+
+    def testBulkPastFdLimit( self ):
+        "mnexec -b creates more holders than it may open fds"
+        count, limit = 200, 64
+
+        def lowerLimit():
+            "Lower the child's fd limit"
+            resource.setrlimit( resource.RLIMIT_NOFILE, ( limit, limit ) )
+        popen = Popen( [ self.mnexec, '-b', str( count ) ], stdout=PIPE,
+                       preexec_fn=lowerLimit )
+        out, _err = popen.communicate()
+        pids = [ int( line.strip( b'\x01' ) ) for line in out.split() ]
+        for pid in pids:
+            os.kill( pid, signal.SIGKILL )
+        self.assertEqual( 0, popen.returncode )
+        self.assertEqual( count, len( set( pids ) ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
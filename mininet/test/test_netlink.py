@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test rtnetlink client used by NetlinkIntf and NetlinkLink."""
+
+import os
+import unittest
+from subprocess import Popen, PIPE
+from time import sleep
+
+from mininet.netlink import ( Netlink, NetlinkError, LinkCache, attr,
+                              nestAttr, parseAttrs, macBytes, macStr )
+
+
+class testNetlinkAttrs( unittest.TestCase ):
+    "Test attribute encoding and decoding"
+
+    def testRoundTrip( self ):
+        "Attributes are padded and decoded correctly"
+        data = attr( 1, b'abc' ) + nestAttr( 2, attr( 3, b'' ) )
+        self.assertEqual( 0, len( data ) % 4 )
+        attrs = parseAttrs( data )
+        self.assertEqual( b'abc', attrs[ 1 ] )
+        self.assertEqual( { 3: b'' }, parseAttrs( attrs[ 2 ] ) )
+
+    def testMAC( self ):
+        "MAC addresses convert to bytes and back"
+        mac = '00:01:0a:ff:10:20'
+        self.assertEqual( mac, macStr( macBytes( mac ) ) )
+
+
+@unittest.skipUnless( os.geteuid() == 0, 'requires root' )
+class testNetlinkNamespace( unittest.TestCase ):
+    "Test link, address and route operations in a scratch namespace"
+
+    def setUp( self ):
+        # A namespace held open by sleep
+        self.holder = Popen( [ 'mnexec', '-n', 'sleep', '100' ] )
+        # Wait until it has left our namespace
+        while ( os.readlink( '/proc/%d/ns/net' % self.holder.pid ) ==
+                os.readlink( '/proc/self/ns/net' ) ):
+            sleep( .01 )
+        self.nl = Netlink( self.holder.pid )
+
+    def tearDown( self ):
+        self.nl.close()
+        self.holder.kill()
+        self.holder.wait()
+
+    def ipShow( self, *args ):
+        "Return output of ip in namespace"
+        return Popen( [ 'mnexec', '-a', str( self.holder.pid ), 'ip' ] +
+                      list( args ), stdout=PIPE ).communicate()[ 0 ].decode()
+
+    def testVethAddrRoute( self ):
+        "Create a veth pair, configure it and delete it"
+        self.nl.addVeth( 'test-eth0', 'test-eth1', addr1='00:00:00:00:00:01' )
+        self.nl.setAddr( 'test-eth0', '10.9.0.1', 24 )
+        self.nl.setLink( 'test-eth0', up=True )
+        self.nl.addRoute( '10.8.0.1', 32, 'test-eth0' )
+        link = self.nl.getLink( 'test-eth0' )
+        self.assertEqual( '00:00:00:00:00:01', link[ 'mac' ] )
+        self.assertEqual( [ ( link[ 'index' ], '10.9.0.1', 24 ) ],
+                          self.nl.addrs( 'test-eth0' ) )
+        self.assertIn( '10.9.0.255', self.ipShow( 'addr', 'show',
+                                                  'test-eth0' ) )
+        self.assertIn( '10.8.0.1 dev test-eth0', self.ipShow( 'route' ) )
+        names = [ l[ 'name' ] for l in self.nl.links() ]
+        self.assertIn( 'test-eth1', names )
+        self.nl.delLink( 'test-eth0' )
+        self.assertRaises( NetlinkError, self.nl.getLink, 'test-eth1' )
+
+    def testLinkCache( self ):
+        "LinkCache follows changes made after it was created"
+        self.nl.addVeth( 'test-eth0', 'test-eth1' )
+        cache = LinkCache( self.holder.pid )
+        try:
+            self.assertFalse( cache.link( 'test-eth0' )[ 'up' ] )
+            self.nl.setLink( 'test-eth0', up=True, mac='00:00:00:00:00:02' )
+            self.nl.setAddr( 'test-eth0', '10.9.0.1', 24 )
+            self.assertTrue( cache.link( 'test-eth0' )[ 'up' ] )
+            self.assertEqual( '00:00:00:00:00:02',
+                              cache.link( 'test-eth0' )[ 'mac' ] )
+            self.assertEqual( [ ( '10.9.0.1', 24 ) ],
+                              cache.addrs( 'test-eth0' ) )
+            self.nl.setLink( 'test-eth0', up=False )
+            self.nl.setLink( 'test-eth0', newName='test-eth2' )
+            self.assertEqual( None, cache.link( 'test-eth0' ) )
+            self.assertEqual( [ ( '10.9.0.1', 24 ) ],
+                              cache.addrs( 'test-eth2' ) )
+            self.nl.delLink( 'test-eth2' )
+            self.assertEqual( [ 'lo' ], [ l[ 'name' ]
+                                          for l in cache.links() ] )
+        finally:
+            cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test ways of running commands on nodes."""
+
+import os
+import unittest
+from threading import Thread
+
+from mininet.node import Host, NamespaceHost
+from mininet.util import monotonic
+
+
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+class testQueue( unittest.TestCase ):
+    "Test Node.queueCmd() and Node.waitQueue()"
+
+    def queue( self, cls ):
+        "Queue commands on a cls node and check their results"
+        node = cls( 'h1' )
+        try:
+            # Framed commands report their exit status
+            futures = [ node.queueCmd( node.frameCmd(
+                'sleep .%d; echo %d; ( exit %d )' % ( 3 - i, i, i )
+                if i % 2 else 'echo %d' % i ) ) for i in range( 3 ) ]
+            # A future waits for its own command and earlier ones only
+            self.assertEqual(
+                1, node.parseResult( futures[ 1 ].result() ).status )
+            self.assertTrue( futures[ 0 ].done() )
+            node.waitQueue()
+            results = [ node.parseResult( future.result() )
+                        for future in futures ]
+            self.assertEqual( [ '0', '1', '2' ],
+                              [ r.stdout.strip() for r in results ] )
+            self.assertEqual( [ 0, 1, 0 ], [ r.status for r in results ] )
+            self.assertFalse( node.waiting )
+            self.assertEqual( 'done', node.cmd( 'echo done' ).strip() )
+        finally:
+            node.terminate()
+
+    def testHost( self ):
+        "Queued commands on a Host complete in order"
+        self.queue( Host )
+
+    def testNamespaceHost( self ):
+        "Queued commands on a NamespaceHost complete in order"
+        self.queue( NamespaceHost )
+
+    def testThreads( self ):
+        "Threads may queue commands on one node at once"
+        node = Host( 'h1' )
+        futures = {}
+
+        def queue( n ):
+            "Queue commands for thread n"
+            futures[ n ] = [ node.queueCmd( 'echo %d-%d' % ( n, i ) )
+                             for i in range( 20 ) ]
+        try:
+            threads = [ Thread( target=queue, args=( n, ) )
+                        for n in range( 4 ) ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            node.waitQueue()
+            for n, queued in futures.items():
+                self.assertEqual( [ '%d-%d' % ( n, i ) for i in range( 20 ) ],
+                                  [ f.result().strip() for f in queued ] )
+        finally:
+            node.terminate()
+
+
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+class testStream( unittest.TestCase ):
+    "Test Node.stream(), Node.pexecIter() and spooled pexec()"
+
+    cmd = 'echo one; sleep 1; echo two; echo err >&2; exit 3'
+
+    def setUp( self ):
+        self.node = Host( 'h1' )
+
+    def tearDown( self ):
+        self.node.terminate()
+
+    def testStream( self ):
+        "stream() yields lines as they arrive"
+        start = monotonic()
+        lines = []
+        for line in self.node.stream( self.cmd.replace( 'exit 3', 'true' ) ):
+            lines.append( ( line, monotonic() - start ) )
+        self.assertEqual( [ 'one\r\n', 'two\r\n', 'err\r\n' ],
+                          [ line for line, _time in lines ] )
+        self.assertLess( lines[ 0 ][ 1 ], .5 )
+        self.assertGreater( lines[ 1 ][ 1 ], .9 )
+        self.assertFalse( self.node.waiting )
+
+    def testPexecIter( self ):
+        "pexecIter() yields lines as they arrive, then the exit code"
+        start = monotonic()
+        results = []
+        for name, data in self.node.pexecIter( 'sh', '-c', self.cmd ):
+            results.append( ( name, data, monotonic() - start ) )
+        self.assertEqual( [ ( 'stdout', 'one\n' ), ( 'stdout', 'two\n' ),
+                            ( 'stderr', 'err\n' ), ( 'exitcode', 3 ) ],
+                          [ ( name, data ) for name, data, _ in results ] )
+        self.assertLess( results[ 0 ][ 2 ], .5 )
+        self.assertGreater( results[ 1 ][ 2 ], .9 )
+
+    def testSpool( self ):
+        "pexec( spool=True ) output round-trips via a file"
+        self.node.spoolSize = 1000
+        out, err, code = self.node.pexec(
+            'sh', '-c', 'seq 100000; echo err >&2', spool=True )
+        try:
+            expected = ''.join( '%d\n' % i for i in range( 1, 100001 ) )
+            self.assertEqual( expected.encode(), out.read() )
+            self.assertEqual( b'err\n', err.read() )
+            self.assertEqual( 0, code )
+        finally:
+            out.close()
+            err.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
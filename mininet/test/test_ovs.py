@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test OVSSwitch and OVSInternalLink."""
+
+import json
+import os
+import unittest
+from functools import partial
+
+import mininet.node
+from mininet.link import OVSInternalLink
+from mininet.net import Mininet
+from mininet.node import OVSSwitch
+from mininet.topo import SingleSwitchTopo
+from mininet.util import quietRun
+
+
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+@unittest.skipUnless( quietRun( 'which ovs-vsctl' ),
+                      'requires Open vSwitch' )
+class testOVSInternalLink( unittest.TestCase ):
+    "Test OVSInternalLink with a running OVSSwitch"
+
+    def testHostIntf( self ):
+        "Host intfs are OVS internal ports with the host's name, MAC and IP"
+        net = Mininet( topo=SingleSwitchTopo( 2 ), link=OVSInternalLink,
+                       switch=partial( OVSSwitch, failMode='standalone' ),
+                       controller=None,
+                       waitConnected=False )
+        net.start()
+        try:
+            for host in net.hosts:
+                intf = host.defaultIntf()
+                self.assertEqual( 'OVSInternalIntf',
+                                  type( intf ).__name__ )
+                # The port is an internal port on its switch...
+                self.assertEqual( 'internal', quietRun(
+                    'ovs-vsctl get Interface %s type' % intf ).strip() )
+                # ...which is now in the host's namespace
+                self.assertNotIn( intf.name, quietRun( 'ip -o link show' ) )
+                show = host.cmd( 'ip -o addr show dev', intf )
+                self.assertIn( 'link/ether %s' % intf.MAC(),
+                               host.cmd( 'ip -o link show dev', intf ) )
+                self.assertIn( 'inet %s/8' % host.IP(), show )
+                self.assertEqual( ( host.IP(), intf.MAC() ),
+                                  intf.updateAddr() )
+                self.assertTrue( intf.isUp() )
+            self.assertEqual( 0, net.pingAll() )
+        finally:
+            net.stop()
+
+
+class Switch( object ):
+    "Stand-in for a switch, with what batchConnected() looks at"
+
+    def __init__( self, name, failMode='secure' ):
+        self.name = name
+        self.failMode = failMode
+
+
+# Bridge s1 has one controller, which is connected; s2 has two, of
+# which one is connected; s3's controller is not connected; s4 has
+# none, but is standalone; s5 has none
+bridges = [ [ 's1', [ 'uuid', 'c1' ] ],
+            [ 's2', [ 'set', [ [ 'uuid', 'c2' ], [ 'uuid', 'c3' ] ] ] ],
+            [ 's3', [ 'uuid', 'c4' ] ],
+            [ 's4', [ 'set', [] ] ],
+            [ 's5', [ 'set', [] ] ] ]
+controllers = [ [ [ 'uuid', 'c1' ], True ], [ [ 'uuid', 'c2' ], False ],
+                [ [ 'uuid', 'c3' ], True ], [ [ 'uuid', 'c4' ], False ] ]
+
+
+class VsctlSwitch( OVSSwitch ):
+    "OVSSwitch which uses ovs-vsctl rather than OVSDB"
+    useOVSDB = False
+
+
+class testBatchConnected( unittest.TestCase ):
+    "Test OVSSwitch.batchConnected()"
+
+    switches = [ Switch( 's1' ), Switch( 's2' ), Switch( 's3' ),
+                 Switch( 's4', failMode='standalone' ), Switch( 's5' ) ]
+    connected = [ 's1', 's2', 's4' ]
+
+    def testVsctl( self ):
+        "Parse the JSON tables from a single ovs-vsctl"
+        cmds = []
+
+        def run( cmd ):
+            "Return ovs-vsctl --format=json output for our tables"
+            cmds.append( cmd )
+            return ( json.dumps( { 'data': bridges,
+                                   'headings': [ 'name', 'controller' ] } )
+                     + '\n' +
+                     json.dumps( { 'data': controllers,
+                                   'headings': [ '_uuid', 'is_connected' ] } )
+                     + '\n', '', 0 )
+
+        result = VsctlSwitch.batchConnected( self.switches, run=run )
+        self.assertEqual( self.connected, [ s.name for s in result ] )
+        self.assertEqual( 1, len( cmds ) )
+
+    def testVsctlFailed( self ):
+        "If ovs-vsctl fails, only standalone switches are connected"
+        result = VsctlSwitch.batchConnected(
+            self.switches, run=lambda cmd: ( '', 'error', 1 ) )
+        self.assertEqual( [ 's4' ], [ s.name for s in result ] )
+
+    def testOVSDB( self ):
+        "Read both tables in one OVSDB transaction"
+        transactions = []
+
+        class DB( object ):
+            "Stand-in for an OVSDB connection"
+
+            @staticmethod
+            def transact( *ops ):
+                "Return our rows"
+                transactions.append( ops )
+                return [ { 'rows': [ { 'name': name, 'controller': uuids }
+                                     for name, uuids in bridges ] },
+                         { 'rows': [ { '_uuid': uuid, 'is_connected': status }
+                                     for uuid, status in controllers ] } ]
+
+        class DBSwitch( OVSSwitch ):
+            "OVSSwitch which uses our DB"
+
+            @classmethod
+            def ovsdb( cls ):
+                "Return our DB"
+                return DB()
+
+        result = DBSwitch.batchConnected( self.switches )
+        self.assertEqual( self.connected, [ s.name for s in result ] )
+        self.assertEqual( 1, len( transactions ) )
+        self.assertEqual( [ 'Bridge', 'Controller' ],
+                          [ op[ 'table' ] for op in transactions[ 0 ] ] )
+
+
+class FakePopen( object ):
+    "Stand-in for Popen() which records commands and their input"
+
+    calls = []
+
+    def __init__( self, args, **_kwargs ):
+        self.args = args
+        self.returncode = None
+
+    def communicate( self, data=None ):
+        "Record our command and input"
+        self.calls.append( ( self.args, data ) )
+        self.returncode = 0
+        return b'', None
+
+
+class testAddFlows( unittest.TestCase ):
+    "Test OVSSwitch.addFlows()"
+
+    flows = [ 'priority=%d,in_port=%d,actions=output:%d' % ( i, i, i + 1 )
+              for i in range( 1, 101 ) ]
+
+    def setUp( self ):
+        self.popen = mininet.node.Popen
+        mininet.node.Popen = FakePopen
+        FakePopen.calls = []
+
+    def tearDown( self ):
+        mininet.node.Popen = self.popen
+
+    @staticmethod
+    def switch( protocols=None ):
+        "Return an OVSSwitch s1 (which we don't start)"
+        switch = OVSSwitch.__new__( OVSSwitch )
+        switch.name, switch.protocols = 's1', protocols
+        return switch
+
+    def addFlows( self, switch, **kwargs ):
+        "Add our flows and return the ovs-ofctl command line"
+        self.assertEqual( '', switch.addFlows( self.flows, **kwargs ) )
+        self.assertEqual( 1, len( FakePopen.calls ) )
+        args, data = FakePopen.calls.pop()
+        self.assertEqual( ''.join( flow + '\n' for flow in self.flows ),
+                          data.decode() )
+        return args
+
+    def testBundle( self ):
+        "OpenFlow 1.4+ switches add all flows in one bundle"
+        self.assertEqual(
+            [ 'ovs-ofctl', '-O', 'OpenFlow13,OpenFlow14', '--bundle',
+              'add-flows', 's1', '-' ],
+            self.addFlows( self.switch( 'OpenFlow13,OpenFlow14' ) ) )
+
+    def testNoBundle( self ):
+        "Other switches add flows without a bundle unless asked to"
+        self.assertEqual( [ 'ovs-ofctl', '-O', 'OpenFlow13', 'add-flows',
+                            's1', '-' ],
+                          self.addFlows( self.switch( 'OpenFlow13' ) ) )
+        self.assertEqual( [ 'ovs-ofctl', 'add-flows', 's1', '-' ],
+                          self.addFlows( self.switch() ) )
+        self.assertEqual( [ 'ovs-ofctl', '--bundle', 'add-flows', 's1', '-' ],
+                          self.addFlows( self.switch(), bundle=True ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test OVSDB JSON-RPC client used by OVSSwitch."""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from subprocess import check_call
+from threading import Thread
+from time import sleep
+
+import mininet.ovsdb
+from mininet.ovsdb import ( OVSDB, OVSDBError, namedUUID, ovsSet, ovsMap,
+                            setMembers, mapDict, localOVSDB )
+from mininet.util import quietRun
+
+
+class FakeServer( object ):
+    """Minimal ovsdb-server on one end of a socketpair: it answers
+       each request with handler( request ), after sending an echo
+       request and an update notification"""
+
+    def __init__( self, handler ):
+        self.sock, client = socket.socketpair()
+        self.handler = handler
+        self.requests = []
+        self.thread = Thread( target=self.serve )
+        self.thread.daemon = True
+        self.thread.start()
+        self.client = OVSDB( sock=client, timeout=5 )
+
+    def serve( self ):
+        "Answer requests until our client closes"
+        decoder, buf = json.JSONDecoder(), ''
+        while True:
+            data = self.sock.recv( 65536 )
+            if not data:
+                return
+            buf += data.decode()
+            while buf.strip():
+                try:
+                    msg, end = decoder.raw_decode( buf.lstrip() )
+                except ValueError:
+                    break
+                buf = buf.lstrip()[ end: ]
+                self.requests.append( msg )
+                if msg.get( 'method' ) is None:
+                    # Reply to our echo
+                    continue
+                # Split messages across sends to test reassembly
+                out = json.dumps( { 'method': 'echo', 'params': [],
+                                    'id': 'echo' } ) + json.dumps(
+                    { 'method': 'update', 'params': [ 'mon', { 'T': {} } ],
+                      'id': None } ) + json.dumps(
+                    { 'id': msg[ 'id' ], 'error': None,
+                      'result': self.handler( msg ) } )
+                half = len( out ) // 2
+                self.sock.sendall( out[ :half ].encode() )
+                sleep( .01 )
+                self.sock.sendall( out[ half: ].encode() )
+
+    def close( self ):
+        "Close both ends"
+        self.client.close()
+        self.sock.close()
+
+
+class testOVSDBClient( unittest.TestCase ):
+    "Test OVSDB against a fake server"
+
+    def testNotation( self ):
+        "Values convert to OVSDB notation and back"
+        self.assertEqual( [ 'named-uuid', 'br0' ], namedUUID( 'br0' ) )
+        self.assertEqual( [ 'a' ], setMembers( 'a' ) )
+        self.assertEqual( [ 1, 2 ], setMembers( ovsSet( [ 1, 2 ] ) ) )
+        self.assertEqual( { 'peer': 's2-eth1' },
+                          mapDict( ovsMap( { 'peer': 's2-eth1' } ) ) )
+
+    def testTransact( self ):
+        "Transactions are sent, and echo and updates are handled"
+        server = FakeServer( lambda msg: [ { 'rows': [ { 'name': 's1' } ] } ] )
+        try:
+            rows = server.client.select( 'Bridge', [ 'name' ] )
+            self.assertEqual( [ { 'name': 's1' } ], rows )
+            request = server.requests[ 0 ]
+            self.assertEqual( 'transact', request[ 'method' ] )
+            self.assertEqual( 'Open_vSwitch', request[ 'params' ][ 0 ] )
+            # We answer echo requests
+            for _ in range( 100 ):
+                if len( server.requests ) > 1:
+                    break
+                sleep( .01 )
+            self.assertEqual( 'echo', server.requests[ 1 ][ 'id' ] )
+            self.assertEqual( [ ( 'mon', { 'T': {} } ) ],
+                              server.client.waitUpdates( 0, 'mon' ) )
+        finally:
+            server.close()
+
+    def testErrors( self ):
+        "Failed operations raise OVSDBError"
+        server = FakeServer( lambda msg: [
+            {}, { 'error': 'constraint violation', 'details': 'no' } ] )
+        try:
+            ops = [ { 'op': 'comment', 'comment': 'x' },
+                    { 'op': 'insert', 'table': 'Bridge', 'row': {} } ]
+            self.assertRaises( OVSDBError, server.client.transact, *ops )
+        finally:
+            server.close()
+
+    def testLocalRetry( self ):
+        "localOVSDB() connects once ovsdb-server's socket appears"
+        rundir = tempfile.mkdtemp()
+        saved = os.environ.get( 'OVS_RUNDIR' )
+        os.environ[ 'OVS_RUNDIR' ] = rundir
+        listener = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        try:
+            mininet.ovsdb._localOVSDB = None
+            self.assertIsNone( localOVSDB() )
+            listener.bind( os.path.join( rundir, 'db.sock' ) )
+            listener.listen( 1 )
+            db = localOVSDB()
+            self.assertIsNotNone( db )
+            self.assertIs( db, localOVSDB() )
+            db.close()
+        finally:
+            mininet.ovsdb._localOVSDB = None
+            listener.close()
+            if saved is None:
+                del os.environ[ 'OVS_RUNDIR' ]
+            else:
+                os.environ[ 'OVS_RUNDIR' ] = saved
+            shutil.rmtree( rundir )
+
+
+schema = {
+    'name': 'Test', 'version': '1.0.0',
+    'tables': { 'Item': { 'columns': {
+        'name': { 'type': 'string' },
+        'count': { 'type': 'integer' } } } } }
+
+
+@unittest.skipUnless( len( quietRun(
+    'which ovsdb-server ovsdb-tool' ).split() ) == 2,
+    'requires ovsdb-server and ovsdb-tool' )
+class testOVSDBServer( unittest.TestCase ):
+    "Test OVSDB against an ovsdb-server with a scratch database"
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp()
+        path = lambda name: os.path.join( self.dir, name )
+        with open( path( 'test.ovsschema' ), 'w' ) as f:
+            json.dump( schema, f )
+        check_call( [ 'ovsdb-tool', 'create', path( 'test.db' ),
+                      path( 'test.ovsschema' ) ] )
+        self.sockPath = path( 'db.sock' )
+        check_call( [ 'ovsdb-server', '--detach', '--no-chdir',
+                      '--pidfile=' + path( 'pid' ),
+                      '--remote=punix:' + self.sockPath,
+                      '--unixctl=' + path( 'ctl' ), path( 'test.db' ) ] )
+        self.db = OVSDB( 'unix:' + self.sockPath, db='Test' )
+
+    def tearDown( self ):
+        self.db.close()
+        with open( os.path.join( self.dir, 'pid' ) ) as f:
+            os.kill( int( f.read() ), 15 )
+        shutil.rmtree( self.dir )
+
+    def testTransactMonitor( self ):
+        "Insert rows in one transaction and see monitor updates"
+        initial = self.db.monitor( { 'Item': [ 'name', 'count' ] }, 'items' )
+        self.assertEqual( {}, initial )
+        self.db.transact( *[ { 'op': 'insert', 'table': 'Item',
+                               'row': { 'name': 'i%d' % i, 'count': i } }
+                             for i in range( 100 ) ] )
+        names = set()
+        while len( names ) < 100:
+            updates = self.db.waitUpdates( 5, 'items' )
+            self.assertTrue( updates )
+            for _mid, tableUpdates in updates:
+                names.update( row[ 'new' ][ 'name' ] for row in
+                              tableUpdates[ 'Item' ].values() )
+        rows = self.db.select( 'Item', [ 'count' ],
+                               [ [ 'name', '==', 'i42' ] ] )
+        self.assertEqual( [ { 'count': 42 } ], rows )
+        self.assertRaises( OVSDBError, self.db.transact,
+                           { 'op': 'insert', 'table': 'Nope', 'row': {} } )
+
+
+if __name__ == '__main__':
+    unittest.main()
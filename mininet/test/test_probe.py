@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test readiness probes."""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from threading import Timer
+
+from mininet.probe import FuncProbe, TCPProbe, FileProbe, ProbeFailed
+from mininet.util import monotonic
+
+
+class testProbe( unittest.TestCase ):
+    "Test probes' backoff, deadlines and wakeups"
+
+    def testBackoff( self ):
+        "Checks back off exponentially and stop at the deadline"
+        times = []
+
+        def check():
+            "Record when we were called"
+            times.append( monotonic() )
+            return False
+        start = monotonic()
+        probe = FuncProbe( check, initial=.01, maximum=.08 )
+        self.assertFalse( probe.wait( timeout=.5 ) )
+        self.assertLess( monotonic() - start, .7 )
+        gaps = [ b - a for a, b in zip( times, times[ 1: ] ) ]
+        self.assertLess( gaps[ 0 ], gaps[ 3 ] )
+        self.assertLess( max( gaps ), .2 )
+        # We check once more at the deadline
+        self.assertGreaterEqual( times[ -1 ] - start, .5 )
+
+    def testFailed( self ):
+        "ProbeFailed stops waiting"
+
+        def fail():
+            "Give up"
+            raise ProbeFailed( 'nope' )
+        probe = FuncProbe( fail )
+        self.assertFalse( probe.wait( timeout=10 ) )
+        self.assertEqual( 'nope', str( probe.failure ) )
+
+    def testTCP( self ):
+        "TCPProbe connects once the server listens"
+        server = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        server.bind( ( '127.0.0.1', 0 ) )
+        port = server.getsockname()[ 1 ]
+        try:
+            self.assertFalse(
+                TCPProbe( '127.0.0.1', port ).wait( timeout=.1 ) )
+            Timer( .2, server.listen, [ 1 ] ).start()
+            self.assertTrue( TCPProbe( '127.0.0.1', port ).wait( timeout=5 ) )
+        finally:
+            server.close()
+
+    def testNodeHook( self ):
+        "TCPProbe asks its node whether it can connect"
+        calls = []
+
+        class Node( object ):
+            "Node which can connect on its third try"
+
+            @staticmethod
+            def canConnect( ip, port, timeout ):
+                "Record our arguments"
+                calls.append( ( ip, port, timeout ) )
+                return len( calls ) == 3
+
+        probe = TCPProbe( '10.0.0.1', 80, node=Node(), connectTimeout=2,
+                          initial=.01 )
+        self.assertTrue( probe.wait( timeout=5 ) )
+        self.assertEqual( [ ( '10.0.0.1', 80, 2 ) ] * 3, calls )
+
+    def testFile( self ):
+        "FileProbe wakes up when its file is created"
+        directory = tempfile.mkdtemp()
+        path = os.path.join( directory, 's1' )
+        try:
+            Timer( .3, lambda: open( path, 'w' ).close() ).start()
+            start = monotonic()
+            # With inotify, we don't wait for our (slow) next check
+            probe = FileProbe( path, initial=2, maximum=2 )
+            self.assertTrue( probe.wait( timeout=5 ) )
+            self.assertLess( monotonic() - start, 1.5 )
+            self.assertIsNone( probe.fd )
+        finally:
+            shutil.rmtree( directory )
+
+
+if __name__ == '__main__':
+    unittest.main()
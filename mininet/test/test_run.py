@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test Node.run() on hosts with and without a shell."""
+
+import os
+import signal
+import unittest
+
+from mininet.node import Host, NamespaceHost
+from mininet.probe import waitFor
+
+
+@unittest.skipUnless( os.getuid() == 0, 'requires root' )
+class testRun( unittest.TestCase ):
+    "Test that run() reports a background command's own pid"
+
+    def runBackground( self, cls ):
+        "Run a background command on a cls node and check its pid"
+        node = cls( 'h1' )
+        try:
+            result = node.run( 'sleep 37 &' )
+            self.assertEqual( 0, result.status )
+            os.kill( result.pid, 0 )
+
+            def cmdline():
+                "Return the background command's args"
+                with open( '/proc/%d/cmdline' % result.pid ) as f:
+                    return f.read().split( '\0' )[ :2 ]
+            # Its shell may not have exec()ed sleep yet
+            waitFor( lambda: cmdline() == [ 'sleep', '37' ], timeout=5 )
+            self.assertEqual( [ 'sleep', '37' ], cmdline() )
+            os.kill( result.pid, signal.SIGKILL )
+        finally:
+            node.terminate()
+
+    def testHost( self ):
+        "Host.run() returns the pid of a background command"
+        self.runBackground( Host )
+
+    def testNamespaceHost( self ):
+        "NamespaceHost.run() returns the pid of a background command"
+        self.runBackground( NamespaceHost )
+
+
+if __name__ == '__main__':
+    unittest.main()
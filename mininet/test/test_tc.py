@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test TCIntf's tracking of the tc configuration it installs."""
+
+import json
+import re
+import unittest
+
+from mininet.link import TCIntf, tcQdiscs, overwrittenTC
+
+
+class QdiscNode( object ):
+    "Node whose namespace has the given qdiscs"
+
+    inNamespace = True
+
+    def __init__( self, pid, qdiscs ):
+        self.pid = pid
+        self.qdiscs = qdiscs
+        self.cmds = []
+
+    def netnsKey( self ):
+        "Our namespace"
+        return self.pid
+
+    def cmd( self, cmd ):
+        "Return our qdiscs as tc -j qdisc show would"
+        self.cmds.append( cmd )
+        return json.dumps( self.qdiscs )
+
+
+def shapedIntf( name, node, **params ):
+    "Return a TCIntf which has installed params' tc configuration"
+    intf = TCIntf.__new__( TCIntf )
+    intf.name, intf.node, intf.params = name, node, params
+    intf.tcCmds, _parent = intf.shapeCmds( **params )
+    return intf
+
+
+# What tc -j qdisc show reports for an htb rate limit and netem delay
+# on h1-eth0 (see TCIntf.bwCmds() and delayCmds())
+shaped = [
+    { 'kind': 'htb', 'handle': '5:', 'dev': 'h1-eth0', 'root': True,
+      'refcnt': 2, 'options': { 'r2q': 10, 'default': '0x1' } },
+    { 'kind': 'netem', 'handle': '10:', 'dev': 'h1-eth0',
+      'parent': '5:1', 'options': { 'limit': 1000,
+                                    'delay': { 'delay': 0.005 } } },
+    { 'kind': 'noqueue', 'handle': '0:', 'dev': 'lo', 'root': True,
+      'refcnt': 2, 'options': {} } ]
+
+# ... and after a switch has replaced them with its own
+overwritten = [
+    { 'kind': 'mq', 'handle': '0:', 'dev': 'h1-eth0', 'root': True,
+      'options': {} },
+    { 'kind': 'fq_codel', 'handle': '0:', 'dev': 'h1-eth0',
+      'parent': ':1', 'options': { 'limit': 10240 } } ]
+
+
+class testTCIntact( unittest.TestCase ):
+    "Test TCIntf.tcIntact() and overwrittenTC()"
+
+    params = { 'bw': 10, 'delay': '5ms' }
+
+    def testIntact( self ):
+        "Our qdiscs are in place"
+        node = QdiscNode( 1, shaped )
+        intf = shapedIntf( 'h1-eth0', node, **self.params )
+        self.assertTrue( intf.tcIntact( tcQdiscs( node ) ) )
+
+    def testOverwritten( self ):
+        "Our qdiscs have been replaced or have gone"
+        node = QdiscNode( 1, overwritten )
+        intf = shapedIntf( 'h1-eth0', node, **self.params )
+        self.assertFalse( intf.tcIntact( tcQdiscs( node ) ) )
+        self.assertFalse( intf.tcIntact( {} ) )
+        # Without JSON output we can't tell
+        self.assertFalse( intf.tcIntact( None ) )
+
+    def testUnshaped( self ):
+        "Unshaped interfaces are left alone, so they are always intact"
+        node = QdiscNode( 1, overwritten )
+        intf = shapedIntf( 'h1-eth0', node )
+        self.assertTrue( intf.tcIntact( tcQdiscs( node ) ) )
+
+    def testOverwrittenTC( self ):
+        "We run tc once per namespace and return overwritten intfs"
+        node1, node2 = QdiscNode( 1, shaped ), QdiscNode( 2, overwritten )
+        intfs = [ shapedIntf( 'h1-eth0', node1, **self.params ),
+                  shapedIntf( 'h1-eth0', node2, **self.params ),
+                  shapedIntf( 'h1-eth1', node2 ) ]
+        self.assertEqual( [ intfs[ 1 ] ], overwrittenTC( intfs ) )
+        self.assertEqual( [ 'tc -j qdisc show' ], node1.cmds )
+        self.assertEqual( [ 'tc -j qdisc show' ], node2.cmds )
+
+
+class testTCChanges( unittest.TestCase ):
+    "Test TCIntf.tcChanges()"
+
+    @staticmethod
+    def changes( old, new ):
+        "Return tc commands to get from old params to new params"
+        intf = shapedIntf( 'h1-eth0', None, **old )
+        cmds, _parent = intf.shapeCmds( **new )
+        return intf.tcChanges( cmds )
+
+    def testChange( self ):
+        "Changing bw or delay changes just those qdiscs and classes"
+        cmds = self.changes( { 'bw': 10, 'delay': '5ms' },
+                             { 'bw': 20, 'delay': '5ms' } )
+        self.assertEqual( 1, len( cmds ) )
+        self.assertTrue( re.match( r'%s class change dev %s parent 5:0 '
+                                   r'classid 5:1 htb rate 20', cmds[ 0 ] ) )
+        cmds = self.changes( { 'bw': 10, 'delay': '5ms' },
+                             { 'bw': 10, 'delay': '10ms' } )
+        self.assertEqual( 1, len( cmds ) )
+        self.assertTrue( re.match( r'%s qdisc change dev %s +parent 5:1 +'
+                                   r'handle 10: netem delay 10ms',
+                                   cmds[ 0 ] ) )
+        self.assertEqual( [], self.changes( { 'bw': 10 }, { 'bw': 10 } ) )
+
+    def testReinstall( self ):
+        "Changing qdiscs deletes the old ones and adds the new ones"
+        new = { 'bw': 10, 'delay': '5ms' }
+        cmds = self.changes( { 'bw': 10 }, new )
+        self.assertEqual( '%s qdisc del dev %s root', cmds[ 0 ] )
+        self.assertEqual( shapedIntf( 'h1-eth0', None, **new ).tcCmds,
+                          cmds[ 1: ] )
+        self.assertTrue( all( ' add ' in cmd for cmd in cmds[ 1: ] ) )
+        cmds = self.changes( { 'bw': 10 }, { 'bw': 10, 'use_tbf': True } )
+        self.assertEqual( '%s qdisc del dev %s root', cmds[ 0 ] )
+        self.assertIn( 'tbf', cmds[ 1 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,13 @@
 """Package: mininet
    Test functions defined in mininet.util."""
 
+import os
 import unittest
+from subprocess import Popen
+from time import sleep, time
 
-from mininet.util import quietRun
+from mininet.util import ( quietRun, ReadBuffer, runBatches, IndexedList,
+                           waitAll, runParallel )
 
 class testQuietRun( unittest.TestCase ):
     """Test quietRun that runs a command and returns its merged output from
@@ -35,5 +39,109 @@ def testMultipleReads( self ):
             output = quietRun(testQuietRun.getEchoCmd( n ) )
             self.assertEqual( n, len( output ) )
 
+class testReadBuffer( unittest.TestCase ):
+    "Test ReadBuffer that buffers raw output read from a file descriptor"
+
+    def testFill( self ):
+        "Fill buffer from a pipe, then consume it in pieces"
+        rfd, wfd = os.pipe()
+        os.write( wfd, b'hello\nworld' )
+        os.close( wfd )
+        buf = ReadBuffer()
+        self.assertEqual( 11, buf.fill( rfd ) )
+        self.assertEqual( 0, buf.fill( rfd ) )
+        os.close( rfd )
+        self.assertEqual( 5, buf.find( b'\n' ) )
+        self.assertEqual( b'hello\n', buf.take( 6 ) )
+        self.assertEqual( -1, buf.find( b'\n' ) )
+        self.assertEqual( 5, len( buf ) )
+        self.assertEqual( b'world', buf.take() )
+        self.assertFalse( buf )
+
+    def testFindOffsets( self ):
+        "Offsets passed to and returned by find() skip consumed data"
+        buf = ReadBuffer()
+        buf.append( b'a\x01b\x01c\x7f' )
+        buf.skip( 2 )
+        self.assertEqual( 1, buf.find( b'\x01' ) )
+        self.assertEqual( -1, buf.find( b'\x01', 0, 1 ) )
+        self.assertEqual( 3, buf.find( b'\x7f', 2 ) )
+        self.assertEqual( 1, buf.count( b'\x01' ) )
+
+    def testCompact( self ):
+        "Consuming most of a large buffer reclaims the consumed space"
+        buf = ReadBuffer()
+        chunk = b'x' * 1000
+        for _ in range( 200 ):
+            buf.append( chunk )
+        total = 0
+        while len( buf ) > 500:
+            total += len( buf.take( 700 ) )
+            self.assertTrue( buf.offset < ReadBuffer.compactSize * 2 )
+        self.assertEqual( 200 * 1000, total + len( buf.take() ) )
+
+
+class testRunBatches( unittest.TestCase ):
+    "Test runBatches, which feeds lines to commands like ip -batch"
+
+    def testInputAndOutput( self ):
+        "Each batch is sent to stdin; only error output is returned"
+        outputs = runBatches( [ 'sh', '-c', 'echo out; cat >&2' ],
+                              { None: [ 'a', 'b' ], 'skipped': [] } )
+        self.assertEqual( { None: 'a\nb\n' }, outputs )
+
+
+
+class testWaitAll( unittest.TestCase ):
+    "Test waitAll, which reaps processes concurrently"
+
+    def testWaitAll( self ):
+        "All processes are reaped, in whatever order they exit"
+        popens = [ Popen( [ 'sleep', str( delay ) ] )
+                   for delay in ( .2, 0, .1 ) ]
+        popens[ 0 ].wait()
+        waitAll( popens )
+        self.assertEqual( [ 0, 0, 0 ], [ p.returncode for p in popens ] )
+
+
+class testRunParallel( unittest.TestCase ):
+    "Test runParallel, used to run commands for many nodes at once"
+
+    def testRunParallel( self ):
+        "Results are in order, work overlaps, and errors are raised"
+        start = time()
+        results = runParallel( lambda t: sleep( t ) or t, [ .2 ] * 4 +
+                               [ 0 ], workers=4 )
+        self.assertEqual( [ .2 ] * 4 + [ 0 ], results )
+        self.assertTrue( time() - start < .6 )
+        self.assertRaises( ZeroDivisionError, runParallel,
+                           lambda x: 1 // x, [ 1, 0, 2 ] )
+
+
+class testIndexedList( unittest.TestCase ):
+    "Test IndexedList, used for Mininet's nodes and links"
+
+    def testListBehavior( self ):
+        "IndexedList keeps order and acts like a list"
+        items = IndexedList( [ 'a', 'b', 'c' ] )
+        items.append( 'd' )
+        items.remove( 'b' )
+        self.assertEqual( [ 'a', 'c', 'd' ], items )
+        self.assertEqual( ( 3, 'a', 'd', [ 'c', 'd' ] ),
+                          ( len( items ), items[ 0 ], items[ -1 ],
+                            items[ 1: ] ) )
+        self.assertEqual( [ 'a', 'c', 'd', 'e' ], items + [ 'e' ] )
+        self.assertTrue( 'c' in items and 'b' not in items )
+        self.assertRaises( ValueError, items.remove, 'b' )
+
+    def testRemoveWhileIterating( self ):
+        "Items may be removed while iterating"
+        items = IndexedList( range( 5 ) )
+        for item in items:
+            items.remove( item )
+        self.assertEqual( [], items )
+        self.assertFalse( items )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -3,15 +3,19 @@
 
 from mininet.log import output, info, error, warn, debug
 
-from time import sleep
+from time import sleep, time
+import time as _time
 from resource import getrlimit, setrlimit, RLIMIT_NPROC, RLIMIT_NOFILE
 from select import poll, POLLIN, POLLHUP
+import select
+from threading import Lock, Thread
+from collections import OrderedDict, deque
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 import re
 from fcntl import fcntl, F_GETFL, F_SETFL
 from os import O_NONBLOCK
 import os
-from functools import partial
+from signal import SIGKILL
 import sys
 import codecs
 
@@ -20,6 +24,8 @@
 Python3 = sys.version_info[0] == 3
 BaseString = str if Python3 else getattr( str, '__base__' )
 Encoding = 'utf-8' if Python3 else None
+# Prefer a clock which can't go backwards
+monotonic = getattr( _time, 'monotonic', time )
 class NullCodec( object ):
     "Null codec for Python 2"
     @staticmethod
@@ -141,7 +147,7 @@ def errRun( *cmd, **kwargs ):
     popen = Popen( cmd, stdout=PIPE, stderr=stderr, shell=shell )
     # We use poll() because select() doesn't work with large fd numbers,
     # and thus communicate() doesn't work either
-    out, err = '', ''
+    out, err = [], []
     poller = poll()
     poller.register( popen.stdout, POLLIN )
     fdToFile = { popen.stdout.fileno(): popen.stdout }
@@ -158,16 +164,17 @@ def errRun( *cmd, **kwargs ):
             f = fdToFile[ fd ]
             decoder = fdToDecoder[ fd ]
             if event & ( POLLIN | POLLHUP ):
-                data = decoder.decode( f.read( 1024 ) )
+                raw = os.read( fd, ReadBuffer.readSize )
+                data = decoder.decode( raw )
                 if echo:
                     output( data )
                 if f == popen.stdout:
-                    out += data
-                    if data == '':
+                    out.append( data )
+                    if not raw:
                         outDone = True
                 elif f == popen.stderr:
-                    err += data
-                    if data == '':
+                    err.append( data )
+                    if not raw:
                         errDone = True
             else:  # something unexpected
                 if f == popen.stdout:
@@ -181,6 +188,7 @@ def errRun( *cmd, **kwargs ):
     popen.stdout.close()
     if stderr == PIPE:
         popen.stderr.close()
+    out, err = ''.join( out ), ''.join( err )
     debug( out, err, returncode )
     return out, err, returncode
 # pylint: enable=too-many-branches
@@ -202,6 +210,41 @@ def which(cmd, **kwargs ):
     out, _, ret = errRun( ["which", cmd], stderr=STDOUT, **kwargs )
     return out.rstrip() if ret == 0 else None
 
+def runBatches( cmd, batches ):
+    """Run a command which reads commands from stdin (e.g. ip -batch -)
+       once for each of a set of nodes; the commands start concurrently
+       cmd: command and arguments (list)
+       batches: dict of node (or None for our namespace) to input lines
+       returns: dict of node to error output (stderr; stdout is
+           discarded)"""
+    popens = {}
+    for node, lines in batches.items():
+        if lines:
+            run = node.popen if node else Popen
+            popens[ node ] = run( cmd, stdin=PIPE, stdout=PIPE,
+                                  stderr=PIPE )
+    return dict( ( node, decode( popen.communicate(
+        encode( '\n'.join( batches[ node ] ) + '\n' ) )[ 1 ] ) )
+                 for node, popen in popens.items() )
+
+def ipBatch( lines, node=None ):
+    """Run ip commands (without the leading 'ip') using a single
+       ip -batch, continuing after errors
+       lines: ip commands (list of strings)
+       node: node to run ip in (our namespace if None)
+       returns: error output, or '' if all commands succeeded"""
+    return runBatches( [ 'ip', '-force', '-batch', '-' ],
+                       { node: lines } ).get( node, '' )
+
+def tcBatch( lines, node=None ):
+    """Run tc commands (without the leading 'tc') using a single
+       tc -batch, continuing after errors
+       lines: tc commands (list of strings)
+       node: node to run tc in (our namespace if None)
+       returns: error output, or '' if all commands succeeded"""
+    return runBatches( [ 'tc', '-force', '-batch', '-' ],
+                       { node: lines } ).get( node, '' )
+
 # pylint: enable=maybe-no-member
 
 def isShellBuiltin( cmd ):
@@ -217,6 +260,27 @@ def isShellBuiltin( cmd ):
 isShellBuiltin.builtIns = None
 
 
+# Namespace management
+
+def makeNamespaces( count, pinDir=None ):
+    """Create network and mount namespaces in bulk, each held open by
+       an idle mnexec process, for nodes to adopt (see Node nsPid)
+       count: number of namespaces
+       pinDir: also pin network namespaces as pinDir/pid (optional)
+       returns: list of holder pids"""
+    cmd = [ 'mnexec', '-b', str( count ) ]
+    if pinDir:
+        cmd += [ '-P', pinDir ]
+    out, err, exitcode = errRun( cmd )
+    pids = [ int( line[ 1: ] ) for line in out.split()
+             if line.startswith( chr( 1 ) ) ]
+    if exitcode or len( pids ) != count:
+        for pid in pids:
+            os.kill( pid, SIGKILL )
+        raise Exception( 'makeNamespaces: %s failed: %s' % ( cmd, err ) )
+    return pids
+
+
 # Interface management
 #
 # Interfaces are managed as strings which are simply the
@@ -436,6 +500,172 @@ def makeNumeric( s ):
 
 # Popen support
 
+class ReadBuffer( object ):
+    """Byte buffer for output read from a file descriptor.
+       Data is appended to a bytearray and consumed from the front
+       by advancing an offset; consumed space is only reclaimed once
+       it makes up most of the buffer, so draining a large amount of
+       output takes linear rather than quadratic time."""
+
+    readSize = 65536  # bytes per os.read()
+    compactSize = 65536  # minimum consumed bytes before compacting
+
+    def __init__( self ):
+        self.buf = bytearray()
+        self.offset = 0
+
+    def __len__( self ):
+        return len( self.buf ) - self.offset
+
+    def clear( self ):
+        "Discard all buffered data"
+        self.buf = bytearray()
+        self.offset = 0
+
+    def append( self, data ):
+        "Append data (bytes) to buffer"
+        self.buf += data
+
+    def fill( self, fd, size=None ):
+        """Read once from fd into buffer, potentially blocking.
+           fd: file descriptor
+           size: maximum bytes to read (readSize)
+           returns: number of bytes read, 0 at EOF"""
+        data = os.read( fd, size or self.readSize )
+        self.buf += data
+        return len( data )
+
+    def find( self, sub, start=0, end=None ):
+        """Find bytes in unconsumed data.
+           sub: bytes to look for
+           start: offset to start looking at
+           end: offset to stop looking at (end of data)
+           returns: offset of sub, or -1 if not found"""
+        end = len( self.buf ) if end is None else self.offset + end
+        pos = self.buf.find( sub, self.offset + start, end )
+        return pos - self.offset if pos >= 0 else pos
+
+    def count( self, sub ):
+        "Return number of occurrences of sub in unconsumed data"
+        return self.buf.count( sub, self.offset )
+
+    def take( self, size=None ):
+        """Consume data from front of buffer.
+           size: maximum number of bytes to return (all)
+           returns: bytes"""
+        end = len( self.buf )
+        if size is not None:
+            end = min( end, self.offset + size )
+        data = bytes( self.buf[ self.offset:end ] )
+        self.skip( len( data ) )
+        return data
+
+    def skip( self, size ):
+        "Discard up to size bytes from front of buffer"
+        self.offset = min( self.offset + size, len( self.buf ) )
+        if self.offset == len( self.buf ):
+            self.clear()
+        elif ( self.offset >= self.compactSize and
+               self.offset * 2 >= len( self.buf ) ):
+            del self.buf[ :self.offset ]
+            self.offset = 0
+
+
+class Reactor( object ):
+    """Process-wide epoll reactor for node ptys and popen pipes.
+       Fds are registered once, when they are opened, rather than
+       every time we want to wait for them. Each fd is armed with
+       EPOLLONESHOT: once poll() sees that it is readable, it is moved
+       to the ready dict and not reported again until its reader calls
+       consume(), so finding readable fds among thousands of nodes
+       costs O(active fds).
+       The reactor is for a single thread monitoring many fds at once
+       (e.g. Mininet.monitor(), pmonitor() and the CLI); waiting for
+       a single node uses Node.waitReadable()."""
+
+    def __init__( self ):
+        self.epoll = select.epoll()
+        self.owners = {}  # fd -> owner (e.g. node)
+        self.ready = {}  # fd -> events, for fds which have fired
+        self.lock = Lock()
+
+    def register( self, fd, owner=None ):
+        """Register an fd to watch for input.
+           fd: file descriptor
+           owner: object which owns fd (e.g. node)"""
+        with self.lock:
+            self.owners[ fd ] = owner
+            self.ready.pop( fd, None )
+            try:
+                self.epoll.register( fd, select.EPOLLIN |
+                                     select.EPOLLONESHOT )
+            except ( IOError, OSError ):
+                # fd number was reused before it was unregistered
+                self.epoll.modify( fd, select.EPOLLIN |
+                                   select.EPOLLONESHOT )
+
+    def unregister( self, fd ):
+        """Stop watching an fd; call before closing it
+           fd: file descriptor"""
+        with self.lock:
+            if fd not in self.owners:
+                return
+            del self.owners[ fd ]
+            self.ready.pop( fd, None )
+            try:
+                self.epoll.unregister( fd )
+            except ( IOError, OSError ):
+                pass
+
+    def owner( self, fd ):
+        "Return owner of fd, or None"
+        return self.owners.get( fd )
+
+    def consume( self, fd ):
+        """Note that fd's reader has read from it, so we should
+           report it again when it is readable
+           fd: file descriptor"""
+        if fd in self.ready:
+            with self.lock:
+                if self.ready.pop( fd, None ) is not None:
+                    self.epoll.modify( fd, select.EPOLLIN |
+                                       select.EPOLLONESHOT )
+
+    def poll( self, timeoutms=None ):
+        """Wait for registered fds to become readable, and move them
+           to ready
+           timeoutms: timeout in ms or None to wait indefinitely
+           returns: list of fd, events"""
+        timeout = -1 if timeoutms is None or timeoutms < 0 else (
+            timeoutms / 1000.0 )
+        events = self.epoll.poll( timeout )
+        with self.lock:
+            for fd, event in events:
+                self.ready[ fd ] = event
+        return events
+
+    def wait( self, fds, timeoutms=None ):
+        """Wait until some of a set of registered fds are ready.
+           fds: set or dict of file descriptors
+           timeoutms: timeout in ms or None to wait indefinitely
+           returns: list of fd, events for ready fds in fds"""
+        end = None if timeoutms is None or timeoutms < 0 else (
+            time() + timeoutms / 1000.0 )
+        while True:
+            found = [ ( fd, event ) for fd, event in
+                      list( self.ready.items() ) if fd in fds ]
+            if found:
+                return found
+            remaining = None if end is None else (
+                max( 0, end - time() ) * 1000 )
+            if not self.poll( remaining ) and end is not None and (
+                    time() >= end ):
+                return found
+
+
+reactor = Reactor()
+
+
 def pmonitor(popens, timeoutms=500, readline=True,
              readmax=1024 ):
     """Monitor dict of hosts to popen objects
@@ -444,39 +674,118 @@ def pmonitor(popens, timeoutms=500, readline=True,
        readline: return single line of output
        yields: host, line/output (if any)
        terminates: when all EOFs received"""
-    poller = poll()
     fdToHost = {}
     fdToDecoder = {}
     for host, popen in popens.items():
         fd = popen.stdout.fileno()
         fdToHost[ fd ] = host
         fdToDecoder[ fd ] = getincrementaldecoder()
-        poller.register( fd, POLLIN )
+        reactor.register( fd, owner=host )
         flags = fcntl( fd, F_GETFL )
         fcntl( fd, F_SETFL, flags | O_NONBLOCK )
-    while popens:
-        fds = poller.poll( timeoutms )
-        if fds:
-            for fd, event in fds:
-                host = fdToHost[ fd ]
-                decoder = fdToDecoder[ fd ]
-                popen = popens[ host ]
-                if event & ( POLLIN | POLLHUP ):
-                    while True:
-                        try:
-                            f = popen.stdout
-                            line = decoder.decode( f.readline() if readline
-                                                   else f.read( readmax ) )
-                        except IOError:
-                            line = ''
-                        if line == '':
-                            break
-                        yield host, line
-                if event & POLLHUP:
-                    poller.unregister( fd )
-                    del popens[ host ]
-        else:
-            yield None, ''
+    try:
+        while popens:
+            fds = reactor.wait( fdToHost, timeoutms )
+            if fds:
+                for fd, event in fds:
+                    host = fdToHost[ fd ]
+                    decoder = fdToDecoder[ fd ]
+                    popen = popens[ host ]
+                    if event & ( POLLIN | POLLHUP ):
+                        while True:
+                            try:
+                                f = popen.stdout
+                                line = decoder.decode(
+                                    f.readline() if readline
+                                    else f.read( readmax ) )
+                            except IOError:
+                                line = ''
+                            if line == '':
+                                break
+                            yield host, line
+                    if event & POLLHUP:
+                        reactor.unregister( fd )
+                        del fdToHost[ fd ]
+                        del popens[ host ]
+                    else:
+                        reactor.consume( fd )
+            else:
+                yield None, ''
+    finally:
+        for fd in fdToHost:
+            reactor.unregister( fd )
+
+def waitAll( popens ):
+    """Wait for processes concurrently, reaping each as soon as it
+       exits; uses pidfds where available (Python 3.9+, Linux 5.3+),
+       otherwise waits for each in turn
+       popens: Popen objects"""
+    pidfdOpen = getattr( os, 'pidfd_open', None )
+    fds, rest = {}, []
+    for popen in popens:
+        try:
+            fds[ pidfdOpen( popen.pid ) ] = popen
+        except ( TypeError, OSError ):
+            # No pidfds, or process already reaped
+            rest.append( popen )
+    poller = poll()
+    for fd in fds:
+        poller.register( fd, POLLIN )
+    while fds:
+        for fd, _event in poller.poll():
+            poller.unregister( fd )
+            os.close( fd )
+            fds.pop( fd ).wait()
+    for popen in rest:
+        popen.wait()
+
+def runParallel( fn, items, workers=16 ):
+    """Call fn( item ) for each item, using a pool of threads
+       (e.g. to run commands for many nodes at once)
+       fn: function to call; if it raises an exception, the first
+           one is re-raised once all items are done
+       items: list of arguments for fn
+       workers: maximum number of threads
+       returns: list of results, in the order of items"""
+    jobs = deque( enumerate( items ) )
+    results, errors = [ None ] * len( jobs ), []
+
+    def worker():
+        "Run jobs until there are none left"
+        while True:
+            try:
+                i, item = jobs.popleft()
+            except IndexError:
+                return
+            try:
+                results[ i ] = fn( item )
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append( e )
+    threads = [ Thread( target=worker )
+                for _ in range( min( workers, len( jobs ) ) ) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[ 0 ]
+    return results
+
+def netnsPids():
+    """Return pids of all processes by network namespace, reading
+       /proc once (vs. once per namespace)
+       returns: { namespace (e.g. 'net:[4026531992]'): [ pid ] }"""
+    pids = {}
+    for entry in os.listdir( '/proc' ):
+        if not entry.isdigit():
+            continue
+        try:
+            ns = os.readlink( '/proc/%s/ns/net' % entry )
+        except OSError:
+            # Process has exited or isn't ours to look at
+            continue
+        pids.setdefault( ns, [] ).append( int( entry ) )
+    return pids
 
 # Other stuff we use
 def sysctlTestAndSet( name, limit ):
@@ -556,6 +865,80 @@ def naturalSeq( t ):
     "Natural sort key function for sequences"
     return [ natural( x ) for x in t ]
 
+class IndexedList( object ):
+    """List of distinct, hashable items (e.g. nodes or links) with
+       O(1) append, membership tests and removal, which otherwise
+       behaves like a list: it preserves insertion order and
+       supports indexing, slicing, len(), + and iteration (over a
+       snapshot, so the list may be changed while iterating)"""
+
+    def __init__( self, items=() ):
+        self.items = OrderedDict()
+        self.snapshot = None  # list of items, rebuilt after changes
+        self.extend( items )
+
+    def append( self, item ):
+        "Append item (if it isn't already present)"
+        self.items[ item ] = True
+        self.snapshot = None
+
+    def extend( self, items ):
+        "Append items"
+        for item in items:
+            self.append( item )
+
+    def remove( self, item ):
+        "Remove item; raises ValueError if not present"
+        try:
+            del self.items[ item ]
+        except KeyError:
+            raise ValueError( '%r is not in list' % ( item, ) )
+        self.snapshot = None
+
+    def list( self ):
+        "Return items as a list"
+        if self.snapshot is None:
+            self.snapshot = list( self.items )
+        return self.snapshot
+
+    def index( self, item ):
+        "Return index of item"
+        return self.list().index( item )
+
+    def __contains__( self, item ):
+        return item in self.items
+
+    def __getitem__( self, index ):
+        return self.list()[ index ]
+
+    def __iter__( self ):
+        return iter( self.list() )
+
+    def __reversed__( self ):
+        return reversed( self.list() )
+
+    def __len__( self ):
+        return len( self.items )
+
+    def __add__( self, other ):
+        return self.list() + list( other )
+
+    def __radd__( self, other ):
+        return list( other ) + self.list()
+
+    def __eq__( self, other ):
+        return ( isinstance( other, ( list, IndexedList ) ) and
+                 self.list() == list( other ) )
+
+    def __ne__( self, other ):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__( self ):
+        return repr( self.list() )
+
+
 def numCores():
     "Returns number of CPU cores based on /proc/cpuinfo"
     if hasattr( numCores, 'ncores' ):
@@ -669,27 +1052,22 @@ def ensureRoot():
 
 def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
     """Wait until server is listening on port.
+       client: node to connect from (default: root namespace)
+       server: server node or IP address
+       port: TCP port
+       timeout: seconds to wait, or None to wait indefinitely
        returns True if server is listening"""
-    runCmd = ( client.cmd if client else
-               partial( quietRun, shell=True ) )
-    if not runCmd( 'which telnet' ):
-        raise Exception('Could not find telnet' )
+    from mininet.probe import TCPProbe
     # pylint: disable=maybe-no-member
     serverIP = server if isinstance( server, BaseString ) else server.IP()
-    cmd = ( 'echo A | telnet -e A %s %s' % ( serverIP, port ) )
-    time = 0
-    result = runCmd( cmd )
-    while 'Connected' not in result:
-        if 'No route' in result:
-            rtable = runCmd( 'route' )
-            error( 'no route to %s:\n%s' % ( server, rtable ) )
-            return False
-        if timeout and time >= timeout:
-            error( 'could not connect to %s on port %d\n' % ( server, port ) )
-            return False
-        debug( 'waiting for', server, 'to listen on port', port, '\n' )
-        info( '.' )
-        sleep( .5 )
-        time += .5
-        result = runCmd( cmd )
-    return True
+    debug( 'waiting for', server, 'to listen on port', port, '\n' )
+    probe = TCPProbe( serverIP, port, node=client )
+    if probe.wait( timeout ):
+        return True
+    if probe.failure:
+        rtable = ( client.cmd( 'route' ) if client else
+                   quietRun( 'route' ) )
+        error( 'no route to %s:\n%s' % ( server, rtable ) )
+    else:
+        error( 'could not connect to %s on port %d\n' % ( server, port ) )
+    return False
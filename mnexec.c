@@ -9,12 +9,15 @@
  *  - printing out the pid of a process so we can identify it later
  *  - attaching to a namespace and cgroup
  *  - setting RT scheduling
+ *  - holding namespaces open without running a command
+ *  - creating many namespaces at once
  *
  * Partially based on public domain setsid(1)
 */
 
 #define _GNU_SOURCE
 #include <stdio.h>
+#include <signal.h>
 #include <linux/sched.h>
 #include <unistd.h>
 #include <limits.h>
@@ -32,7 +35,8 @@
 void usage(char *name)
 {
     printf("Execution utility for Mininet\n\n"
-           "Usage: %s [-cdnp] [-a pid] [-g group] [-r rtprio] cmd args...\n\n"
+           "Usage: %s [-cdnpw] [-a pid] [-g group] [-r rtprio] cmd args...\n"
+           "       %s -b count [-P dir]\n\n"
            "Options:\n"
            "  -c: close all file descriptors except stdin/out/error\n"
            "  -d: detach from tty by calling setsid()\n"
@@ -41,8 +45,14 @@ void usage(char *name)
            "  -a pid: attach to pid's network and mount namespaces\n"
            "  -g group: add to cgroup\n"
            "  -r rtprio: run with SCHED_RR (usually requires -g)\n"
+           "  -w: wait until killed instead of running cmd; cmd args\n"
+           "      are ignored but show up in ps\n"
+           "  -b count: start count processes in new network and mount\n"
+           "      namespaces which wait until killed; print ^A + pid\n"
+           "      for each once it is ready\n"
+           "  -P dir: with -b, also pin each network namespace as dir/pid\n"
            "  -v: print version\n",
-           name);
+           name, name);
 }
 
 
@@ -51,6 +61,130 @@ int setns(int fd, int nstype)
     return syscall(__NR_setns, fd, nstype);
 }
 
+/* Move into new network and mount namespaces */
+int newns(void)
+{
+    if (unshare(CLONE_NEWNET|CLONE_NEWNS) == -1) {
+        perror("unshare");
+        return 1;
+    }
+
+    /* Mark our whole hierarchy recursively as private, so that our
+     * mounts do not propagate to other processes.
+     */
+
+    if (mount("none", "/", NULL, MS_REC|MS_PRIVATE, NULL) == -1) {
+        perror("remount");
+        return 1;
+    }
+
+    /* mount sysfs to pick up the new network namespace */
+    if (mount("sysfs", "/sys", "sysfs", MS_MGC_VAL, NULL) == -1) {
+        perror("mount");
+        return 1;
+    }
+    return 0;
+}
+
+/* Pin pid's network namespace as dir/pid, like ip netns add */
+int pin(int pid, char *dir)
+{
+    char path[PATH_MAX], target[PATH_MAX];
+    int fd;
+    snprintf(path, PATH_MAX, "/proc/%d/ns/net", pid);
+    snprintf(target, PATH_MAX, "%s/%d", dir, pid);
+    fd = open(target, O_RDONLY|O_CREAT|O_EXCL, 0);
+    if (fd < 0) {
+        perror(target);
+        return 1;
+    }
+    close(fd);
+    if (mount(path, target, "none", MS_BIND, NULL) == -1) {
+        perror(target);
+        unlink(target);
+        return 1;
+    }
+    return 0;
+}
+
+/* Kill the namespace holders forked so far, after an error */
+void killholders(int *pids, int count)
+{
+    int i;
+    for (i = 0; i < count; i++)
+        kill(pids[i], SIGKILL);
+}
+
+/* Start count namespace holders, each detached and in new network
+ * and mount namespaces, and print ^A + pid for each once it is ready.
+ * We start them all before waiting for any, so that namespace setup
+ * can proceed in parallel.
+ */
+int bulk(int count, char *pindir)
+{
+    int *pids = calloc(count, sizeof(int));
+    int i, n, fd, pid, status = 0;
+    int p[2];
+
+    if (!pids) {
+        perror("calloc");
+        return 1;
+    }
+    /* One pipe for everyone, so we need a constant number of fds:
+       each holder writes its pid once it is ready */
+    if (pipe(p) == -1) {
+        perror("pipe");
+        return 1;
+    }
+    for (i = 0; i < count; i++) {
+        pids[i] = fork();
+        if (pids[i] == -1) {
+            perror("fork");
+            killholders(pids, i);
+            return 1;
+        }
+        if (pids[i] == 0) {
+            /* child: detach, unshare and signal readiness */
+            close(p[0]);
+            setsid();
+            if (newns() != 0)
+                exit(1);
+            pid = getpid();
+            /* Writes this small are atomic */
+            if (write(p[1], &pid, sizeof(pid)) != sizeof(pid))
+                exit(1);
+            /* Don't hold on to anyone's pipes or tty */
+            fd = open("/dev/null", O_RDWR);
+            dup2(fd, 0);
+            dup2(fd, 1);
+            dup2(fd, 2);
+            for (fd = getdtablesize(); fd > 2; fd--)
+                close(fd);
+            for (;;)
+                pause();
+        }
+    }
+    /* Once every holder is ready (or dead), we will read EOF */
+    close(p[1]);
+    for (n = 0; n < count; n++) {
+        if (read(p[0], &pid, sizeof(pid)) != sizeof(pid))
+            break;
+        if (pindir && pin(pid, pindir) != 0) {
+            kill(pid, SIGKILL);
+            status = 1;
+        }
+        else
+            printf("\001%d\n", pid);
+    }
+    if (n < count) {
+        fprintf(stderr, "%d namespace holders failed\n", count - n);
+        status = 1;
+    }
+    close(p[0]);
+    fflush(stdout);
+    return status;
+}
+
 /* Validate alphanumeric path foo1/bar2/baz */
 void validate(char *path)
 {
@@ -99,10 +233,13 @@ int main(int argc, char *argv[])
     char path[PATH_MAX];
     int nsid;
     int pid;
+    int wait = 0;
+    int count = 0;
+    char *pindir = NULL;
     char *cwd = get_current_dir_name();
 
     static struct sched_param sp;
-    while ((c = getopt(argc, argv, "+cdnpa:g:r:vh")) != -1)
+    while ((c = getopt(argc, argv, "+cdnpa:g:r:wb:P:vh")) != -1)
         switch(c) {
         case 'c':
             /* close file descriptors except stdin/out/error */
@@ -126,25 +263,8 @@ int main(int argc, char *argv[])
             break;
         case 'n':
             /* run in network and mount namespaces */
-            if (unshare(CLONE_NEWNET|CLONE_NEWNS) == -1) {
-                perror("unshare");
+            if (newns() != 0)
                 return 1;
-            }
-
-            /* Mark our whole hierarchy recursively as private, so that our
-             * mounts do not propagate to other processes.
-             */
-
-            if (mount("none", "/", NULL, MS_REC|MS_PRIVATE, NULL) == -1) {
-                perror("remount");
-                return 1;
-            }
-
-            /* mount sysfs to pick up the new network namespace */
-            if (mount("sysfs", "/sys", "sysfs", MS_MGC_VAL, NULL) == -1) {
-                perror("mount");
-                return 1;
-            }
             break;
         case 'p':
             /* print pid */
@@ -193,6 +313,18 @@ int main(int argc, char *argv[])
                 return 1;
             }
             break;
+        case 'w':
+            /* Hold namespaces open rather than running a command */
+            wait = 1;
+            break;
+        case 'b':
+            /* Create namespace holders in bulk */
+            count = atoi(optarg);
+            break;
+        case 'P':
+            /* Pin bulk network namespaces in directory */
+            pindir = optarg;
+            break;
         case 'v':
             printf("%s\n", VERSION);
             exit(0);
@@ -204,6 +336,14 @@ int main(int argc, char *argv[])
             exit(1);
         }
 
+    if (count > 0)
+        return bulk(count, pindir);
+
+    if (wait) {
+        for (;;)
+            pause();
+    }
+
     if (optind < argc) {
         execvp(argv[optind], &argv[optind]);
         perror(argv[optind]);